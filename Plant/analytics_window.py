@@ -1,22 +1,49 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from db.combined_database import PlantDatabase
+from typing import Callable, Optional, Tuple
+from db.combined_database import DEFAULT_DEVICE_ID, PlantDatabase
+from .async_loader import AsyncLoader
+from .chart_panel import CHARTS_AVAILABLE, ChartPanel
+from .readings_pager import ReadingsPager
+from .ring_buffer import ReadingsWindow
 
 
 class AnalyticsWindow:
     """Analytics window with database data"""
     
-    def __init__(self, parent, database: PlantDatabase):
+    # Treeview column -> database column used for sorting
+    SORT_COLUMNS = {
+        'Time': 'ts',
+        'Moisture (%)': 'moisture',
+        'Light (%)': 'light',
+        'Temperature (°C)': 'temperature',
+        'Hour of Day': 'time_of_day'
+    }
+    
+    def __init__(self, parent, database: PlantDatabase,
+                 readings_since: Optional[Callable[[int, float], ReadingsWindow]] = None,
+                 device_id: int = DEFAULT_DEVICE_ID):
         self.database = database
+        self.readings_since = readings_since  # (device id, since) -> in-memory readings for the live chart
+        self.device_id = device_id
+        self.chart_panel = None  # created when the Charts tab is first opened
+        # Only the visible rows (plus a prefetch margin) are fetched from the database
+        self.pager = ReadingsPager(database, visible_rows=15, device_id=device_id)
+        self.visible_rows = self.pager.visible_rows  # rows that fit in the Treeview
+        self._pending_move: Optional[Tuple[Optional[float], int]] = None  # (seek fraction, scroll delta)
         self.window = tk.Toplevel(parent)
         self.setup_window()
         self.create_widgets()
+        # Queries run on a worker thread so the Tk main loop never waits for SQLite
+        self.loader = AsyncLoader(self.window, on_busy_change=self.show_loading)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.load_devices()
         self.load_data()
     
     def setup_window(self):
         """Configures analytics window"""
         self.window.title("Analytics Data - Measurement History")
-        self.window.geometry("800x600")
+        self.window.geometry("850x700")
         self.window.resizable(True, True)
         
         # Center window
@@ -34,10 +61,18 @@ class AnalyticsWindow:
         main_frame.rowconfigure(2, weight=1)
         main_frame.columnconfigure(0, weight=1)
         
-        # Header
-        header = ttk.Label(main_frame, text="Sensor Measurement History", 
+        # Header with the plant selector
+        header_frame = ttk.Frame(main_frame)
+        header_frame.grid(row=0, column=0, pady=(0, 20), sticky="ew")
+        header_frame.columnconfigure(0, weight=1)
+        header = ttk.Label(header_frame, text="Sensor Measurement History", 
                           font=('Arial', 16, 'bold'))
-        header.grid(row=0, column=0, pady=(0, 20), sticky="ew")
+        header.grid(row=0, column=0, sticky="w")
+        ttk.Label(header_frame, text="Plant:", font=('Arial', 10)).grid(row=0, column=1, padx=(10, 5))
+        self.device_var = tk.StringVar(value=f"{self.device_id}: Plant {self.device_id}")
+        self.device_box = ttk.Combobox(header_frame, textvariable=self.device_var, state='readonly', width=24)
+        self.device_box.grid(row=0, column=2)
+        self.device_box.bind('<<ComboboxSelected>>', self.on_device_selected)
         
         # Statistics frame
         stats_frame = ttk.LabelFrame(main_frame, text="Statistics", padding=10)
@@ -47,9 +82,13 @@ class AnalyticsWindow:
                                    font=('Arial', 10))
         self.stats_label.grid(row=0, column=0, sticky="w")
         
+        # Table and chart tabs
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.grid(row=2, column=0, sticky="nsew", pady=(0, 10))
+        
         # Data table frame
-        data_frame = ttk.LabelFrame(main_frame, text="Measurement Data", padding=10)
-        data_frame.grid(row=2, column=0, sticky="nsew", pady=(0, 10))
+        data_frame = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(data_frame, text="Measurement Data")
         data_frame.rowconfigure(0, weight=1)
         data_frame.columnconfigure(0, weight=1)
         
@@ -60,11 +99,11 @@ class AnalyticsWindow:
         # Column configuration with sorting
         self.sort_reverse = {}  # Dictionary to track sorting direction for each column
         
-        self.tree.heading('Time', text='Date and Time ↕', command=lambda: self.sort_column('Time', False))
-        self.tree.heading('Moisture (%)', text='Moisture (%) ↕', command=lambda: self.sort_column('Moisture (%)', True))
-        self.tree.heading('Light (%)', text='Light (%) ↕', command=lambda: self.sort_column('Light (%)', True))
-        self.tree.heading('Temperature (°C)', text='Temperature (°C) ↕', command=lambda: self.sort_column('Temperature (°C)', True))
-        self.tree.heading('Hour of Day', text='Hour of Day ↕', command=lambda: self.sort_column('Hour of Day', True))
+        self.tree.heading('Time', text='Date and Time ↕', command=lambda: self.sort_column('Time'))
+        self.tree.heading('Moisture (%)', text='Moisture (%) ↕', command=lambda: self.sort_column('Moisture (%)'))
+        self.tree.heading('Light (%)', text='Light (%) ↕', command=lambda: self.sort_column('Light (%)'))
+        self.tree.heading('Temperature (°C)', text='Temperature (°C) ↕', command=lambda: self.sort_column('Temperature (°C)'))
+        self.tree.heading('Hour of Day', text='Hour of Day ↕', command=lambda: self.sort_column('Hour of Day'))
         
         # Column widths
         self.tree.column('Time', width=150)
@@ -73,16 +112,39 @@ class AnalyticsWindow:
         self.tree.column('Temperature (°C)', width=140)
         self.tree.column('Hour of Day', width=120)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(data_frame, orient="vertical", command=self.tree.yview)
+        # Scrollbars - the vertical one scrolls the pager, not the Treeview itself
+        self.v_scrollbar = ttk.Scrollbar(data_frame, orient="vertical", command=self.on_scrollbar)
         h_scrollbar = ttk.Scrollbar(data_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
         
         # Grid layout for treeview and scrollbars
         self.tree.grid(row=0, column=0, sticky="nsew")
-        v_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
         
+        # Row count without materializing the table
+        self.count_label = ttk.Label(data_frame, text="", font=('Arial', 9))
+        self.count_label.grid(row=2, column=0, sticky="w", pady=(5, 0))
+        
+        # Treeview items are created once per visible row and recycled while scrolling
+        self.row_items = []
+        self.tree.bind('<Configure>', self.on_tree_resize)
+        self.tree.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll_rows(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_rows(3))
+        self.tree.bind('<Prior>', lambda event: self.scroll_rows(-self.visible_rows))
+        self.tree.bind('<Next>', lambda event: self.scroll_rows(self.visible_rows))
+        
+        # Charts tab
+        self.chart_frame = ttk.Frame(self.notebook, padding=10)
+        self.chart_frame.rowconfigure(0, weight=1)
+        self.chart_frame.columnconfigure(0, weight=1)
+        self.notebook.add(self.chart_frame, text="Charts")
+        if not CHARTS_AVAILABLE:
+            ttk.Label(self.chart_frame, text="Install matplotlib and numpy to see charts.",
+                      font=('Arial', 10)).grid(row=0, column=0)
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
         # Button frame
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, sticky="ew", pady=(10, 0))
@@ -94,42 +156,44 @@ class AnalyticsWindow:
         self.clear_button = ttk.Button(button_frame, text="Clear Database", 
                                      command=self.clear_database)
         self.clear_button.grid(row=0, column=1, padx=(0, 10))
+        
+        # Loading indicator, visible while a query runs
+        self.loading_bar = ttk.Progressbar(button_frame, mode='indeterminate', length=120)
+        self.loading_bar.grid(row=0, column=2, padx=(10, 5))
+        self.loading_label = ttk.Label(button_frame, text="Loading...", font=('Arial', 9))
+        self.loading_label.grid(row=0, column=3)
+        self.show_loading(False)
 
-    def sort_column(self, col, is_numeric):
-        """Sorts column in Treeview with three states: unsorted → ascending → descending → unsorted"""
-        # Get all elements from tree
-        data = [(self.tree.set(child, col), child) for child in self.tree.get_children('')]
+    def sort_column(self, col):
+        """Sorts column with three states: unsorted → ascending → descending → unsorted
         
+        Sorting runs in the database (ORDER BY on an indexed column, id as tiebreaker),
+        so a header click only fetches the first page in the new order.
+        """
         # Determine sorting state (0=unsorted, 1=ascending, 2=descending)
         current_state = self.sort_reverse.get(col, 0)
         next_state = (current_state + 1) % 3
         self.sort_reverse[col] = next_state
         
+        pager = self.pager.copy()
+        pager.visible_rows = self.visible_rows
+        self._pending_move = None  # the new first page replaces any pending move
         if next_state == 0:
-            # Unsorted state - restore original order (sort by timestamp)
-            self.load_data()  # Reload data in original order
+            # Unsorted state - restore original order (newest first)
+            pager.order_by, pager.descending = 'ts', True
             direction = "↕"
         else:
-            # Sort data
             reverse = (next_state == 2)  # True for descending, False for ascending
-            
-            if is_numeric:
-                # For numeric columns
-                try:
-                    data.sort(key=lambda x: float(x[0]), reverse=reverse)
-                except ValueError:
-                    # If float conversion fails, sort as text
-                    data.sort(key=lambda x: x[0], reverse=reverse)
-            else:
-                # For text columns (date/time)
-                data.sort(key=lambda x: x[0], reverse=reverse)
-            
-            # Reorganize elements in tree
-            for index, (val, child) in enumerate(data):
-                self.tree.move(child, '', index)
-            
+            pager.order_by, pager.descending = self.SORT_COLUMNS[col], reverse
             direction = "↓" if reverse else "↑"
         
+        def load_sorted_page():
+            pager.reload()
+            return pager
+        
+        self.loader.submit('rows', load_sorted_page, self.show_pager,
+                           lambda e: messagebox.showerror("Error", f"Cannot sort data: {str(e)}"))
+        
         # Update column header with sorting direction indicator
         current_text = self.tree.heading(col)['text']
         # Remove previous direction indicator
@@ -144,46 +208,191 @@ class AnalyticsWindow:
                 other_base_text = other_text.replace(" ↑", "").replace(" ↓", "").replace(" ↕", "")
                 self.tree.heading(column, text=f"{other_base_text} ↕")
     
+    def load_devices(self):
+        """Fills the plant selector from the devices table"""
+        def show_devices(devices):
+            labels = [f"{device_id}: {name} ({record_count:,} readings)"
+                      for device_id, name, record_count, _ in devices]
+            self.device_box['values'] = labels
+            for device_id, label in zip((device[0] for device in devices), labels):
+                if device_id == self.device_id:
+                    self.device_var.set(label)
+        
+        self.loader.submit('devices', self.database.get_devices, show_devices,
+                           lambda e: messagebox.showerror("Error", f"Cannot load plants: {str(e)}"))
+    
+    def on_device_selected(self, event=None):
+        """Shows the table, statistics and charts of the selected plant"""
+        self.device_id = int(self.device_var.get().split(':', 1)[0])
+        self.pager.device_id = self.device_id
+        if self.chart_panel is not None:
+            self.chart_panel.set_device(self.device_id)
+        self.load_data()
+    
     def load_data(self):
-        """Loads data from database"""
-        try:
-            # Clear existing data
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Get data from database
-            readings = self.database.get_all_readings()
-            
-            # Add data to treeview
-            for reading in readings:
-                timestamp, moisture, light, temperature, time_of_day = reading
-                self.tree.insert('', 'end', values=(timestamp, moisture, light, temperature, time_of_day))
-            
-            # Update statistics
-            self.update_statistics()
-            
-        except Exception as e:
+        """Loads the first page of data and the statistics on the worker thread"""
+        pager = self.pager.copy()
+        pager.visible_rows = self.visible_rows
+        self._pending_move = None  # the new first page replaces any pending move
+        
+        def load():
+            # Include readings still in the write buffer
+            self.database.flush()
+            pager.reload()
+            return pager
+        
+        self.loader.submit('rows', load, self.show_pager,
+                           lambda e: messagebox.showerror("Error", f"Cannot load data: {str(e)}"))
+        self.update_statistics()
+        if self.chart_panel is not None:
+            self.chart_panel.show_range()
+    
+    def show_pager(self, pager: ReadingsPager):
+        """Switches the table to a pager loaded on the worker thread"""
+        self.pager = pager
+        self.render_rows()
+        if pager.visible_rows != self.visible_rows and self._pending_move is None:
+            # The window was resized while the page was loading
+            self.move_rows()
+    
+    def show_moved(self, pager: ReadingsPager):
+        """Switches the table to a pager moved on the worker thread"""
+        self._pending_move = None
+        self.show_pager(pager)
+    
+    def show_loading(self, busy: bool):
+        """Shows or hides the loading indicator"""
+        if busy:
+            self.loading_bar.grid()
+            self.loading_label.grid()
+            self.loading_bar.start(15)
+        else:
+            self.loading_bar.stop()
+            self.loading_bar.grid_remove()
+            self.loading_label.grid_remove()
+    
+    def on_tab_changed(self, event):
+        """Creates the chart panel the first time the Charts tab is shown"""
+        if self.notebook.select() != str(self.chart_frame) or self.chart_panel is not None:
+            return
+        if CHARTS_AVAILABLE:
+            self.chart_panel = ChartPanel(self.chart_frame, self.database, self.loader, self.readings_since,
+                                          self.device_id)
+            self.chart_panel.frame.grid(row=0, column=0, sticky="nsew")
+            self.chart_panel.show_range()
+    
+    def close(self):
+        """Stops background loading and closes the window"""
+        if self.chart_panel is not None:
+            self.chart_panel.stop()
+        self.loader.shutdown()
+        self.window.destroy()
+    
+    def render_rows(self):
+        """Shows the pager's visible rows in the recycled Treeview items"""
+        # Create or drop items so there is exactly one per visible row
+        while len(self.row_items) < self.visible_rows:
+            self.row_items.append(self.tree.insert('', 'end', values=()))
+        while len(self.row_items) > self.visible_rows:
+            self.tree.delete(self.row_items.pop())
+        
+        rows = self.pager.visible()[:self.visible_rows]
+        for index, item in enumerate(self.row_items):
+            if index < len(rows):
+                timestamp, moisture, light, temperature, time_of_day = rows[index][2:]
+                self.tree.item(item, values=(timestamp, moisture, light, temperature, time_of_day))
+            else:
+                self.tree.item(item, values=())
+        
+        # Scrollbar and row counter reflect the position in the whole table
+        total = max(self.pager.total, 1)
+        first = self.pager.position
+        self.v_scrollbar.set(first / total, min(first + len(rows), total) / total)
+        if rows:
+            self.count_label.config(
+                text=f"Rows {first + 1:,}–{first + len(rows):,} of {self.pager.total:,}")
+        else:
+            self.count_label.config(text="No measurements")
+    
+    def scroll_rows(self, delta: int):
+        """Scrolls the table by delta rows"""
+        self.move_rows(delta=delta)
+    
+    def move_rows(self, delta: int = 0, seek: Optional[float] = None):
+        """Seeks and/or scrolls the table, querying the database on the worker thread
+        
+        Moves within the rows already in memory are applied directly. Others
+        run on a snapshot of the pager; moves made while one is pending are
+        added to it, so a newer request replacing an older one loses no rows.
+        """
+        if (self._pending_move is None and seek is None and self.pager.visible_rows == self.visible_rows
+                and self.pager.cached(delta)):
+            self.pager.scroll(delta)
+            self.render_rows()
+            return
+        
+        fraction, pending_delta = self._pending_move or (None, 0)
+        if seek is not None:
+            fraction, pending_delta = seek, 0
+        delta += pending_delta
+        self._pending_move = (fraction, delta)
+        pager = self.pager.snapshot()
+        visible_rows = self.visible_rows
+        
+        def move():
+            pager.resize(visible_rows)
+            if fraction is not None:
+                pager.seek(fraction)
+            if delta:
+                pager.scroll(delta)
+            return pager
+        
+        def on_error(e):
+            self._pending_move = None
             messagebox.showerror("Error", f"Cannot load data: {str(e)}")
+        
+        self.loader.submit('rows', move, self.show_moved, on_error)
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """Handles scrollbar drags ('moveto') and arrow/trough clicks ('scroll')"""
+        if action == 'moveto':
+            self.move_rows(seek=float(value))
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_rows(int(value) * step)
+    
+    def on_mouse_wheel(self, event):
+        """Scrolls three rows per wheel notch"""
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+    
+    def on_tree_resize(self, event):
+        """Adjusts the number of fetched rows to the height of the Treeview"""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        heading_height = 25
+        visible_rows = max(1, (event.height - heading_height) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.move_rows()
     
     def update_statistics(self):
         """Updates statistics"""
-        try:
-            stats = self.database.get_database_stats()
-            
-            if stats['total_records'] > 0:
-                stats_text = f"""Total measurements: {stats['total_records']}
+        device_id = self.device_id
+        self.loader.submit('stats', lambda: self.database.get_database_stats(device_id), self.show_statistics,
+                           lambda e: self.stats_label.config(text=f"Error loading statistics: {str(e)}"))
+    
+    def show_statistics(self, stats: dict):
+        """Shows statistics returned by get_database_stats"""
+        if stats['total_records'] > 0:
+            stats_text = f"""Total measurements: {stats['total_records']}
 Date range: {stats['date_range'][0]} - {stats['date_range'][1]}
-Average values:
-  • Moisture: {stats['averages']['moisture']}%
-  • Light: {stats['averages']['light']}%
-  • Temperature: {stats['averages']['temperature']}°C"""
-            else:
-                stats_text = "No data in database"
-            
-            self.stats_label.config(text=stats_text)
-            
-        except Exception as e:
-            self.stats_label.config(text=f"Error loading statistics: {str(e)}")
+Average values (± standard deviation):
+  • Moisture: {stats['averages']['moisture']} ± {stats['std_devs']['moisture']}%
+  • Light: {stats['averages']['light']} ± {stats['std_devs']['light']}%
+  • Temperature: {stats['averages']['temperature']} ± {stats['std_devs']['temperature']}°C"""
+        else:
+            stats_text = "No data in database"
+        
+        self.stats_label.config(text=stats_text)
     
     def clear_database(self):
         """Clears database after confirmation"""
@@ -194,9 +403,9 @@ Average values:
         )
         
         if result:
-            try:
-                self.database.clear_database()
+            def on_cleared(_):
                 self.load_data()  # Refresh view
                 messagebox.showinfo("Success", "Database has been cleared.")
-            except Exception as e:
-                messagebox.showerror("Error", f"Cannot clear database: {str(e)}")
\ No newline at end of file
+            
+            self.loader.submit('clear', self.database.clear_database, on_cleared,
+                               lambda e: messagebox.showerror("Error", f"Cannot clear database: {str(e)}"))
@@ -0,0 +1,129 @@
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class AsyncLoader:
+    """Runs database work on a worker thread and delivers results on the Tk main loop
+
+    Tk widgets may only be touched from the main thread, so workers put their
+    results on a queue that the main loop polls with after(). Every request has
+    a key; submitting a new request for a key supersedes the older one, which
+    is cancelled if it has not started yet and otherwise has its result dropped.
+    Long jobs can report progress: with on_progress set, func receives a
+    progress(message) callable whose messages are delivered the same way.
+    """
+
+    def __init__(self, widget: tk.Misc, poll_interval_ms: int = 15,
+                 on_busy_change: Optional[Callable[[bool], None]] = None):
+        self.widget = widget
+        self.poll_interval_ms = poll_interval_ms
+        self.on_busy_change = on_busy_change
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-loader")
+        self._results = queue.Queue()
+        self._generations: Dict[str, int] = {}  # key -> number of the latest request
+        self._pending: Dict[str, tuple] = {}    # key -> (generation, future, on_done, on_error, on_progress)
+        self._poll_id = None
+        self._closed = False
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def submit(self, key: str, func: Callable, on_done: Callable, on_error: Optional[Callable] = None,
+               on_progress: Optional[Callable] = None):
+        """Runs func() on the worker; on_done(result) or on_error(exception) runs on the main loop"""
+        if self._closed:
+            return
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+
+        was_busy = self.busy
+        previous = self._pending.pop(key, None)
+        if previous is not None:
+            previous[1].cancel()
+
+        future = self._executor.submit(self._run, key, generation, func, on_progress is not None)
+        self._pending[key] = (generation, future, on_done, on_error, on_progress)
+        if not was_busy:
+            self._notify_busy(True)
+        self._schedule_poll()
+
+    def cancel(self, key: str):
+        """Drops the pending request for key"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        previous = self._pending.pop(key, None)
+        if previous is not None:
+            previous[1].cancel()
+            if not self.busy:
+                self._notify_busy(False)
+
+    def shutdown(self, wait: bool = False):
+        """Stops polling and discards queued work; a running query finishes in the background,
+        or before returning with wait=True"""
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+        self._pending.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, key: str, generation: int, func: Callable, with_progress: bool):
+        """Worker side: skips superseded requests, runs func and queues the outcome"""
+        if self._generations.get(key) != generation:
+            return
+        try:
+            if with_progress:
+                result = func(lambda message: self._results.put((key, generation, 'progress', message)))
+            else:
+                result = func()
+            self._results.put((key, generation, 'done', result))
+        except Exception as e:
+            self._results.put((key, generation, 'error', e))
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.widget.after(self.poll_interval_ms, self._poll)
+
+    def _poll(self):
+        """Main-loop side: delivers finished results of the latest requests"""
+        self._poll_id = None
+        try:
+            self._deliver_results()
+        finally:
+            if not self._closed:
+                if self._pending:
+                    self._schedule_poll()
+                else:
+                    self._notify_busy(False)
+
+    def _deliver_results(self):
+        while not self._closed:
+            try:
+                key, generation, kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                return
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != generation:
+                continue  # stale result of a superseded request
+            _, _, on_done, on_error, on_progress = pending
+            if kind == 'progress':
+                on_progress(payload)
+                continue
+            del self._pending[key]
+            # Nothing older of this key is left in the FIFO queue, so its counter can go;
+            # keys used once (e.g. one per click) then do not pile up
+            del self._generations[key]
+            if kind == 'done':
+                on_done(payload)
+            elif on_error is not None:
+                on_error(payload)
+
+    def _notify_busy(self, busy: bool):
+        if self.on_busy_change is not None:
+            self.on_busy_change(busy)
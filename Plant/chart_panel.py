@@ -0,0 +1,324 @@
+import time
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import MaxNLocator
+    from .downsample import downsample_series, minmax_decimate
+except ImportError:
+    Figure = None
+
+from db.combined_database import DEFAULT_DEVICE_ID, DEFAULT_LOCATION_ID, PlantDatabase
+from db.rollups import SENSOR_VALUES, WEATHER_VALUES
+from db.timestamps import from_epoch, to_epoch
+from .async_loader import AsyncLoader
+from .ring_buffer import ReadingsWindow
+
+# matplotlib is optional; AnalyticsWindow shows a hint instead of the charts without it
+CHARTS_AVAILABLE = Figure is not None
+
+# Selectable ranges: label -> seconds; the live range is drawn from the in-memory ring buffer
+LIVE_RANGE = 'Live (5 min)'
+RANGES = {
+    LIVE_RANGE: 300,
+    '1 hour': 3600,
+    '1 day': 86400,
+    '1 week': 7 * 86400,
+    '1 month': 30 * 86400,
+    '1 year': 365 * 86400,
+}
+
+# Sensor subplots: value column -> (title, weather column overlaid on the same axis)
+SENSOR_AXES = {
+    'moisture': ("Moisture / humidity (%)", 'humidity'),
+    'light': ("Light (%)", None),
+    'temperature': ("Temperature (°C)", 'temperature'),
+}
+
+LIVE_FRAME_MS = 33  # ~30 fps
+
+
+def to_date_number(ts):
+    """Integer epoch seconds -> matplotlib date number (days since the default 1970 epoch)"""
+    return ts / 86400.0
+
+
+class SeriesFigure:
+    """Sensor charts with weather overlay, independent of Tk (the benchmark renders it with Agg)"""
+
+    def __init__(self, figure: 'Figure'):
+        self.figure = figure
+        self.axes = {}
+        self.lines = {}
+        self.weather_lines = {}
+        self.envelopes = []
+        previous = None
+        for index, (value, (title, weather_value)) in enumerate(SENSOR_AXES.items()):
+            ax = figure.add_subplot(len(SENSOR_AXES), 1, index + 1, sharex=previous)
+            ax.set_ylabel(title, fontsize=8)
+            ax.tick_params(labelsize=8)
+            ax.grid(True, alpha=0.3)
+            # Tick labels are most of the drawing time: few y ticks, dates only under the last plot
+            ax.yaxis.set_major_locator(MaxNLocator(nbins=4))
+            if index < len(SENSOR_AXES) - 1:
+                ax.tick_params(labelbottom=False)
+            self.axes[value] = ax
+            self.lines[value], = ax.plot([], [], linewidth=1, label="Sensor")
+            if weather_value is not None:
+                self.weather_lines[value], = ax.plot([], [], linewidth=1, linestyle='--',
+                                                     color='tab:orange', label="Weather")
+            previous = ax
+        locator = AutoDateLocator(maxticks=7)
+        previous.xaxis.set_major_locator(locator)
+        previous.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        # A plain text key instead of per-axes legends, which cost more to draw than the data
+        figure.text(0.99, 0.995, "solid: sensors   dashed: weather", fontsize=7, ha='right', va='top')
+        figure.tight_layout()
+
+    def show(self, sensor_series, weather_series=None):
+        """Plots downsampled series (see Plant.downsample.downsample_series); envelopes show min/max"""
+        for envelope in self.envelopes:
+            envelope.remove()
+        self.envelopes = []
+        for value, ax in self.axes.items():
+            ts, minimum, average, maximum = sensor_series[value]
+            x = to_date_number(ts)
+            self.lines[value].set_data(x, average)
+            if len(x) and np.any(maximum > minimum):
+                self.envelopes.append(ax.fill_between(x, minimum, maximum, alpha=0.25, linewidth=0))
+            weather_line = self.weather_lines.get(value)
+            if weather_line is not None:
+                weather_value = SENSOR_AXES[value][1]
+                if weather_series is not None:
+                    weather_ts, _, weather_average, _ = weather_series[weather_value]
+                    weather_line.set_data(to_date_number(weather_ts), weather_average)
+                else:
+                    weather_line.set_data([], [])
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+
+class ChartPanel:
+    """Embedded matplotlib charts of sensor readings with weather overlay
+
+    Historical ranges are loaded on the worker thread from the rollup-backed
+    series queries and downsampled to the plot width before they reach the
+    GUI. Zooming with the toolbar reloads the visible range at a matching
+    resolution. The live range draws the ring buffer of recent readings at
+    ~30 fps with blitting, redrawing the axes only when the data leaves them.
+    """
+
+    def __init__(self, parent, database: PlantDatabase, loader: AsyncLoader,
+                 readings_since: Optional[Callable[[int, float], ReadingsWindow]] = None,
+                 device_id: int = DEFAULT_DEVICE_ID):
+        self.database = database
+        self.loader = loader
+        self.readings_since = readings_since  # (device id, since) -> copy of the ring buffer readings
+        self.device_id = device_id
+        self.location_id = DEFAULT_LOCATION_ID  # weather location of the overlay
+        self.frame = ttk.Frame(parent)
+        self.frame.rowconfigure(1, weight=1)
+        self.frame.columnconfigure(0, weight=1)
+
+        # Controls
+        controls = ttk.Frame(self.frame)
+        controls.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        ttk.Label(controls, text="Range:").grid(row=0, column=0, padx=(0, 5))
+        ranges = [name for name in RANGES if name != LIVE_RANGE or readings_since is not None]
+        self.range_var = tk.StringVar(value='1 day')
+        range_box = ttk.Combobox(controls, textvariable=self.range_var, values=ranges, state='readonly', width=14)
+        range_box.grid(row=0, column=1)
+        range_box.bind('<<ComboboxSelected>>', lambda event: self.show_range())
+        self.weather_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls, text="Weather overlay", variable=self.weather_var,
+                        command=self.show_range).grid(row=0, column=2, padx=(10, 0))
+        self.location_var = tk.StringVar()
+        self.location_box = ttk.Combobox(controls, textvariable=self.location_var, state='readonly', width=18)
+        self.location_box.grid(row=0, column=3, padx=(5, 0))
+        self.location_box.bind('<<ComboboxSelected>>', self.on_location_selected)
+        self.status_label = ttk.Label(controls, text="", font=('Arial', 9))
+        self.status_label.grid(row=0, column=4, padx=(10, 0))
+
+        # Figure
+        self.figure = Figure(figsize=(7, 4.5), dpi=100)
+        self.series_figure = SeriesFigure(self.figure)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.canvas.get_tk_widget().grid(row=1, column=0, sticky="nsew")
+        toolbar_frame = ttk.Frame(self.frame)
+        toolbar_frame.grid(row=2, column=0, sticky="ew")
+        NavigationToolbar2Tk(self.canvas, toolbar_frame)
+
+        self._setting_limits = False  # limits set by the panel itself, not a zoom
+        self._reload_id = None
+        self._live_id = None
+        self._background = None
+        self._utc_offset = 0
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        next(iter(self.series_figure.axes.values())).callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.load_locations()
+
+    def show_range(self):
+        """Loads the selected range, or starts the live view"""
+        name = self.range_var.get()
+        if name == LIVE_RANGE:
+            self.start_live()
+            return
+        self.stop_live()
+        end_ts = to_epoch(datetime.now())
+        self.load_range(end_ts - RANGES[name], end_ts)
+
+    def load_locations(self):
+        """Fills the weather location selector from the locations table"""
+        def show_locations(locations):
+            labels = [f"{location_id}: {name}" for location_id, name, *_ in locations]
+            self.location_box['values'] = labels
+            for location_id, label in zip((location[0] for location in locations), labels):
+                if location_id == self.location_id:
+                    self.location_var.set(label)
+
+        self.loader.submit('locations', self.database.get_locations, show_locations,
+                           lambda e: self.status_label.config(text=f"Cannot load locations: {e}"))
+
+    def on_location_selected(self, event=None):
+        """Overlays the weather of the selected location"""
+        self.location_id = int(self.location_var.get().split(':', 1)[0])
+        if self.weather_var.get():
+            self.show_range()
+
+    def set_device(self, device_id: int):
+        """Switches to another device's readings; the next show_range loads them"""
+        self.stop_live()
+        self.device_id = device_id
+
+    def load_range(self, start_ts: int, end_ts: int):
+        """Reads and downsamples a range on the worker thread"""
+        points = max(200, int(self.figure.get_figwidth() * self.figure.dpi))
+        with_weather = self.weather_var.get()
+        device_id, location_id = self.device_id, self.location_id
+        start, end = from_epoch(start_ts), from_epoch(end_ts)
+
+        def load():
+            # A few points per pixel from the database, then reduced to one per pixel
+            resolution, rows = self.database.get_sensor_series(start, end, max_points=4 * points,
+                                                               device_id=device_id)
+            sensor = downsample_series(resolution, rows, SENSOR_VALUES, points)
+            weather = None
+            if with_weather:
+                weather_resolution, weather_rows = self.database.get_weather_series(start, end, 4 * points,
+                                                                                    location_id=location_id)
+                weather = downsample_series(weather_resolution, weather_rows, WEATHER_VALUES, points)
+            return resolution, sensor, weather
+
+        self.status_label.config(text="Loading...")
+        self.loader.submit('chart', load, lambda result: self.show_series(start_ts, end_ts, *result),
+                           lambda e: self.status_label.config(text=f"Cannot load chart: {e}"))
+
+    def show_series(self, start_ts: int, end_ts: int, resolution: int, sensor, weather):
+        """Plots a loaded range"""
+        if self._live_id is not None:
+            return  # the live view was started while loading
+        self.series_figure.show(sensor, weather)
+        self._set_xlim(start_ts, end_ts)
+        self.status_label.config(text=f"Resolution: {self.describe_resolution(resolution)}")
+        self.canvas.draw_idle()
+
+    def on_xlim_changed(self, ax):
+        """Reloads the visible range after a zoom or pan, once the toolbar has settled"""
+        if self._setting_limits or self._live_id is not None:
+            return
+        if self._reload_id is not None:
+            self.frame.after_cancel(self._reload_id)
+        low, high = ax.get_xlim()
+        self._reload_id = self.frame.after(200, self._reload_visible, int(low * 86400), int(high * 86400))
+
+    def _reload_visible(self, start_ts: int, end_ts: int):
+        self._reload_id = None
+        self.load_range(start_ts, end_ts)
+
+    def start_live(self):
+        """Draws the newest readings from the ring buffer at ~30 fps"""
+        if self.readings_since is None or self._live_id is not None:
+            return
+        self.loader.cancel('chart')
+        # Ring buffer times are epoch seconds; database ts are local wall-clock seconds
+        now = time.time()
+        self._utc_offset = to_epoch(datetime.fromtimestamp(now)) - int(now)
+        empty = {value: (np.empty(0),) * 4 for value in SENSOR_VALUES}
+        self.series_figure.show(empty)
+        for line in self.series_figure.lines.values():
+            line.set_animated(True)
+        self.status_label.config(text="Live")
+        self._live_id = self.frame.after(0, self._live_frame)
+
+    def stop_live(self):
+        """Stops the live view"""
+        if self._live_id is None:
+            return
+        self.frame.after_cancel(self._live_id)
+        self._live_id = None
+        for line in self.series_figure.lines.values():
+            line.set_animated(False)
+
+    def stop(self):
+        """Stops timers before the window is destroyed"""
+        self.stop_live()
+        if self._reload_id is not None:
+            self.frame.after_cancel(self._reload_id)
+            self._reload_id = None
+
+    def on_draw(self, event):
+        """Keeps a copy of the freshly drawn axes without the animated lines for blitting"""
+        if self._live_id is not None:
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self._draw_live_lines()
+
+    def _live_frame(self):
+        """One live frame: update the lines and blit them, or redraw when the data left the axes"""
+        span = RANGES[LIVE_RANGE]
+        now = time.time() + self._utc_offset
+        # A copy: the ingest thread keeps appending to the ring buffer while this frame is drawn
+        window = self.readings_since(self.device_id, now - self._utc_offset - span)
+        x = to_date_number(np.array(window.time) + self._utc_offset)
+        width = max(100, int(self.figure.get_figwidth() * self.figure.dpi))
+        rescale = False
+        for value, line in self.series_figure.lines.items():
+            line_x, line_y = minmax_decimate(x, np.array(getattr(window, value)), width)
+            line.set_data(line_x, line_y)
+            if len(line_y):
+                low, high = self.series_figure.axes[value].get_ylim()
+                rescale = rescale or line_y.min() < low or line_y.max() > high
+
+        low, high = self.series_figure.axes['moisture'].get_xlim()
+        if rescale or now / 86400.0 > high or self._background is None:
+            # Leave 10% of the span free on the right so the axes are redrawn only now and then
+            self._set_xlim(now - span, now + span * 0.1)
+            for value, ax in self.series_figure.axes.items():
+                ax.relim(visible_only=True)
+                ax.autoscale_view(scalex=False)
+            self.canvas.draw()  # on_draw captures the new background
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_live_lines()
+        self._live_id = self.frame.after(LIVE_FRAME_MS, self._live_frame)
+
+    def _draw_live_lines(self):
+        for value, line in self.series_figure.lines.items():
+            self.series_figure.axes[value].draw_artist(line)
+        self.canvas.blit(self.figure.bbox)
+
+    def _set_xlim(self, start_ts: float, end_ts: float):
+        self._setting_limits = True
+        try:
+            self.series_figure.axes['moisture'].set_xlim(to_date_number(start_ts), to_date_number(end_ts))
+        finally:
+            self._setting_limits = False
+
+    @staticmethod
+    def describe_resolution(resolution: int) -> str:
+        return {0: "raw", 60: "1 minute", 3600: "1 hour", 86400: "1 day"}.get(resolution, f"{resolution} s")
@@ -1,23 +1,109 @@
 import tkinter as tk
+from db.write_buffer import Durability
+from sensors.config import DISPLAY_REFRESH_MS
+from sensors.serial_ingest import SerialIngestor
+from .async_loader import AsyncLoader
 from .model import PlantModel
+from .startup_timer import StartupTimer
 from .view import SystemView
 
 
 class SystemController:
 
-    def __init__(self):
-        self.model = PlantModel()
+    def __init__(self, database=None, durability: Durability = Durability.GROUP,
+                 startup_timer: StartupTimer = None):
+        self.model = PlantModel(database)
+        # Readings are queued and committed in groups by a background writer
+        self.model.database.enable_write_buffer(durability)
+        self.startup_timer = startup_timer
+        self.ingestor = None
+        self.weather_collector = None
         self.root=tk.Tk()
         self.view = SystemView(self.root, self)
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
+        # Network-bound weather work gets its own worker so it never delays GUI queries
+        self.weather_loader = AsyncLoader(self.root, poll_interval_ms=100)
+        self.root.after_idle(self.on_first_window)
 
+    def run(self) -> None:
+        """Runs the main GUI application loop."""
+        try:
+            self.root.mainloop()
+        finally:
+            if self.ingestor is not None:
+                self.ingestor.stop()
+            # Workers still using the database are stopped and joined before it is closed
+            if self.weather_collector is not None:
+                self.weather_collector.stop()
+            self.weather_loader.shutdown(wait=True)
+            self.view.loader.shutdown(wait=True)
+            if self.weather_collector is not None:
+                self.weather_collector.close()  # its pooled HTTP session
+            # Guaranteed flush of buffered readings, also after errors in the GUI loop
+            self.model.database.close()
 
+    def shutdown(self) -> None:
+        """Closes the main window, which ends the GUI loop."""
+        self.view.loader.shutdown()
+        self.weather_loader.shutdown()
+        self.root.destroy()
 
+    def start_sensor_ingestion(self, stream, parser=None) -> None:
+        """Reads sensor samples from a serial stream in the background and shows the newest one"""
+        self.ingestor = SerialIngestor(self.model.database, stream, parser, on_samples=self.model.add_samples)
+        self.ingestor.start()
+        self.root.after(DISPLAY_REFRESH_MS, self.refresh_sensor_display)
 
-    def run(self) -> None:
-        """Runs the main GUI application loop."""
-        self.root.mainloop()
+    def refresh_sensor_display(self) -> None:
+        """Periodically shows the newest sample while ingestion runs"""
+        if self.ingestor is None or not self.ingestor.running:
+            self.view.show_error("Sensor connection lost")
+            return
+        self.view.refresh_data()
+        self.view.update_message_based_on_conditions()
+        self.root.after(DISPLAY_REFRESH_MS, self.refresh_sensor_display)
+
+    def on_first_window(self) -> None:
+        """Records when the main loop has shown the first window"""
+        if self.startup_timer is not None:
+            self.startup_timer.mark("first window")
+
+    def start_weather_catch_up(self, weather_collector) -> None:
+        """Collects missing weather data in the background, reporting progress to the view"""
+        self.weather_collector = weather_collector
+        def catch_up(progress):
+            progress("Checking for missing weather data...")
+            # Fills holes and the gap up to now; nothing is fetched when coverage is complete
+            weather_collector.collect_missing_data()
+            return self.model.database.get_latest_weather_data(1)
+
+        self.view.show_weather_status("Starting weather data collection...")
+        self.weather_loader.submit('weather', catch_up, self.on_weather_ready,
+                                   self.on_weather_failed, on_progress=self.view.show_weather_status)
+
+    def on_weather_ready(self, latest_weather) -> None:
+        """Shows the newest weather record once the catch-up is done"""
+        if latest_weather:
+            latest = latest_weather[0]
+            self.view.show_weather_status(
+                f"{latest['date']} {latest['time']} - Temp: {latest['temperature']}°C, "
+                f"Humidity: {latest['humidity']}%")
+        else:
+            self.view.show_weather_status("No weather data available")
+        self.report_data_ready()
+
+    def on_weather_failed(self, error: Exception) -> None:
+        """Shows a failed catch-up; the GUI keeps working with the stored data"""
+        self.view.show_weather_status(f"Weather data collection failed: {error}", error=True)
+        self.report_data_ready()
+
+    def report_data_ready(self) -> None:
+        """Prints the startup timing report once the startup data work is finished"""
+        if self.startup_timer is not None:
+            self.startup_timer.mark("data ready")
+            self.startup_timer.log_report()
 
 
 if __name__ == "__main__":
     app = SystemController()
-    app.run()
\ No newline at end of file
+    app.run()
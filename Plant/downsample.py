@@ -0,0 +1,108 @@
+"""
+Shape-preserving downsampling of series for charts (requires numpy)
+
+Series come from PlantDatabase.get_sensor_series / get_weather_series with at
+most a few points per pixel. Raw rows are reduced with LTTB (Largest Triangle
+Three Buckets), which keeps the visually important peaks and dips. Rollup rows
+are merged in groups of neighbouring buckets, keeping the minimum of the
+minimums and the maximum of the maximums so spikes stay visible.
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from db.rollups import SERIES_AGGREGATES
+
+# Per value column: (ts, min, avg, max) arrays of equal length
+ChartSeries = Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Returns the indices of the threshold points LTTB keeps (first and last included)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(np.append(edges, n))
+    # Average point of every bucket; the last "bucket" is the final point itself
+    mean_x = (np.add.reduceat(x, edges) / counts).tolist()
+    mean_y = (np.add.reduceat(np.nan_to_num(y), edges) / counts).tolist()
+    mean_x[-1], mean_y[-1] = float(x[-1]), float(y[-1])
+
+    # Buckets hold only a few points each, so plain Python beats per-bucket numpy calls
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    indices = [0]
+    selected = 0
+    for bucket in range(threshold - 2):
+        ax, ay = xs[selected], ys[selected]
+        bx, by = mean_x[bucket + 1], mean_y[bucket + 1]
+        best, best_area = edges[bucket], -1.0
+        for index in range(edges[bucket], edges[bucket + 1]):
+            # Twice the area of the triangle (previous pick, candidate, next bucket's average)
+            area = abs((ax - bx) * (ys[index] - ay) - (ax - xs[index]) * (by - ay))
+            if area > best_area:  # False for NaN
+                best, best_area = index, area
+        indices.append(best)
+        selected = best
+    indices.append(n - 1)
+    return np.array(indices, dtype=np.int64)
+
+
+def merge_buckets(ts: np.ndarray, counts: np.ndarray, minimum: np.ndarray, average: np.ndarray,
+                  maximum: np.ndarray, target: int) -> Tuple[np.ndarray, ...]:
+    """Merges neighbouring rollup buckets so at most target remain (min/max envelope preserved)"""
+    n = len(ts)
+    if n <= target:
+        return ts, minimum, average, maximum
+    group = -(-n // target)  # ceil
+    starts = np.arange(0, n, group)
+    counts = np.where(np.isnan(average), 0, counts)
+    weights = np.add.reduceat(counts, starts)
+    weighted = np.add.reduceat(np.nan_to_num(average) * counts, starts)
+    return (ts[starts],
+            np.fmin.reduceat(minimum, starts),
+            np.divide(weighted, weights, out=np.full(len(starts), np.nan), where=weights > 0),
+            np.fmax.reduceat(maximum, starts))
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keeps the minimum and maximum of each of buckets equal slices (cheap enough for every frame)"""
+    n = len(x)
+    if n <= 2 * buckets:
+        return x, y
+    size = n // buckets
+    used = size * buckets
+    slices = y[:used].reshape(buckets, size)
+    offsets = np.arange(0, used, size)
+    low = offsets + np.argmin(slices, axis=1)
+    high = offsets + np.argmax(slices, axis=1)
+    # Both extremes of a bucket, in time order, plus the newest point
+    keep = np.concatenate((np.minimum(low, high), np.maximum(low, high)))
+    keep.sort()
+    keep = np.append(keep, n - 1)
+    return x[keep], y[keep]
+
+
+def downsample_series(resolution: int, rows: Sequence[Tuple], values: Sequence[str], target: int) -> ChartSeries:
+    """Converts series rows to arrays with at most target points per value column"""
+    if not rows:
+        empty = np.empty(0)
+        return {value: (empty, empty, empty, empty) for value in values}
+
+    # NULL values become NaN, which matplotlib leaves as gaps
+    table = np.array(rows, dtype=float)
+    ts, counts = table[:, 0], table[:, 1]
+    width = len(SERIES_AGGREGATES)
+    series = {}
+    for position, value in enumerate(values):
+        column = 2 + position * width
+        minimum, average, maximum = table[:, column], table[:, column + 1], table[:, column + 2]
+        if resolution == 0:
+            keep = lttb_indices(ts, average, target)
+            series[value] = (ts[keep], minimum[keep], average[keep], maximum[keep])
+        else:
+            series[value] = merge_buckets(ts, counts, minimum, average, maximum, target)
+    return series
@@ -1,11 +1,18 @@
 import random
+import threading
+import time
 from datetime import datetime
-from db.combined_database import PlantDatabase
+from typing import Dict, List, Tuple
+from db.combined_database import DEFAULT_DEVICE_ID, PlantDatabase
+from .ring_buffer import ReadingsWindow, RecentReadings
+
+# Readings kept in memory per device for trends and the live chart (one hour at one sample per second, ~230 KB)
+RECENT_CAPACITY = 3600
 
 
 class PlantModel:
-    '''Plant class, stores state and logic'''
-    def __init__(self):
+    '''Plant class, stores state and logic; the values are those of the selected device'''
+    def __init__(self, database: PlantDatabase = None):
         '''self refers to the current instance of the class, i.e., the object, "_" indicates private'''
         self._moisture=0
         self._light=0
@@ -13,7 +20,15 @@ class PlantModel:
         self._time_of_day=0
         self._message="My plant app"
         self._systemTime=""
-        self.database = PlantDatabase()
+        # One database instance is shared with the weather collector when given
+        self.database = database if database is not None else PlantDatabase()
+        # Plant shown in the main window; samples of every device are kept
+        self.device_id = DEFAULT_DEVICE_ID
+        self._latest: Dict[int, Tuple] = {}  # device id -> (moisture, light, temperature, time_of_day)
+        # Recent history per device for the GUI and analytics, so they need no queries for it
+        self._recent: Dict[int, RecentReadings] = {}
+        # add_samples runs on the serial-ingest thread; this guards the state above and the shown values
+        self._lock = threading.RLock()
 
 
     def get_moisture(self) -> int:
@@ -41,12 +56,80 @@ class PlantModel:
         self._systemTime=now.strftime("%H:%M:%S")
         return self._systemTime
     
+    @property
+    def recent(self) -> RecentReadings:
+        """In-memory history of the selected device"""
+        return self.recent_readings(self.device_id)
+
+    def recent_readings(self, device_id: int) -> RecentReadings:
+        """In-memory history of a device, created on first use"""
+        with self._lock:
+            recent = self._recent.get(device_id)
+            if recent is None:
+                recent = self._recent[device_id] = RecentReadings(RECENT_CAPACITY)
+            return recent
+
+    def seen_devices(self) -> List[int]:
+        """Ids of the devices that sent samples since the start"""
+        with self._lock:
+            return sorted(self._latest)
+
+    def select_device(self, device_id: int):
+        """Shows another device's newest values"""
+        with self._lock:
+            self.device_id = device_id
+            self._moisture, self._light, self._temperature, self._time_of_day = \
+                self._latest.get(device_id, (0, 0, 0, 0))
+
+    def add_samples(self, samples):
+        """Records samples received from the sensors (called by the serial ingestor)"""
+        with self._lock:
+            newest = {}
+            for sample in samples:
+                self.recent_readings(sample.device_id).append(sample.arrival, sample.moisture, sample.light,
+                                                              sample.temperature)
+                newest[sample.device_id] = sample
+            for device_id, sample in newest.items():
+                self._latest[device_id] = (sample.moisture, sample.light, sample.temperature,
+                                           datetime.fromtimestamp(sample.arrival).hour)
+            if self.device_id in newest:
+                self.select_device(self.device_id)
+
+    def get_recent(self, seconds: float) -> ReadingsWindow:
+        """Readings of the selected device in the last seconds from the in-memory history (zero-copy views)"""
+        with self._lock:
+            return self.recent.since(time.time() - seconds)
+
+    def readings_since(self, device_id: int, since: float) -> ReadingsWindow:
+        """Copy of a device's in-memory readings with time >= since, taken under the lock"""
+        with self._lock:
+            return self.recent_readings(device_id).since(since).copy()
+
+    def get_trend(self, column: str, seconds: float = 300, tolerance: float = 1.0) -> int:
+        """Compares the newest value with the average of the last seconds: 1 rising, -1 falling, 0 steady"""
+        with self._lock:
+            # Copied under the lock, as appends on the ingest thread change the live views
+            values = list(getattr(self.get_recent(seconds), column))
+        if len(values) < 2:
+            return 0
+        difference = values[-1] - sum(values) / len(values)
+        if difference > tolerance:
+            return 1
+        if difference < -tolerance:
+            return -1
+        return 0
+
     def simulate_sensor_readings(self):
-        """Simulates new sensor readings"""
-        self._moisture = random.randint(10, 90)
-        self._light = random.randint(20, 100)
-        self._temperature = random.randint(15, 30)
-        self._time_of_day = random.randint(0, 23)
+        """Simulates new sensor readings of the selected device"""
+        with self._lock:
+            self._moisture = random.randint(10, 90)
+            self._light = random.randint(20, 100)
+            self._temperature = random.randint(15, 30)
+            self._time_of_day = random.randint(0, 23)
+            reading = (self._moisture, self._light, self._temperature, self._time_of_day)
+            device_id = self.device_id
+            self._latest[device_id] = reading
+            self.recent.append(time.time(), *reading[:3])
         
         # Save reading to database
-        self.database.save_reading(self._moisture, self._light, self._temperature, self._time_of_day)
\ No newline at end of file
+        self.database.save_reading(*reading, device_id)
\ No newline at end of file
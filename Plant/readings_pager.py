@@ -0,0 +1,190 @@
+import copy
+from typing import List, Tuple
+
+from db.combined_database import DEFAULT_DEVICE_ID, PlantDatabase
+
+# Largest SQLite integer, used as an id bound when seeking to a value
+_MAX_ID = 2 ** 63 - 1
+
+# Position of each sortable column in the rows of PlantDatabase.get_readings_page
+_ROW_INDEX = {'ts': 1, 'moisture': 3, 'light': 4, 'temperature': 5, 'time_of_day': 6}
+
+
+class ReadingsPager:
+    """Windowed, keyset-paginated view of one device's sensor_readings for a virtual-scrolling table
+
+    Only the visible rows plus a prefetch margin on each side are kept in
+    memory. Moving through the table fetches the neighbouring rows with
+    keyset queries on the (order_by, id) index, so the cost of a scroll
+    step or a sort change does not depend on the table size. Rows are the
+    tuples returned by PlantDatabase.get_readings_page.
+    """
+
+    def __init__(self, database: PlantDatabase, visible_rows: int = 20, prefetch: int = 200,
+                 device_id: int = DEFAULT_DEVICE_ID):
+        self.database = database
+        self.device_id = device_id
+        self.visible_rows = visible_rows
+        self.prefetch = prefetch
+        self.order_by = 'ts'
+        self.descending = True  # newest first
+        self.total = 0
+
+        self._rows: List[Tuple] = []  # contiguous slice of the table in display order
+        self._rows_start = 0          # table position of _rows[0] (estimated after a seek)
+        self._top = 0                 # index in _rows of the first visible row
+        self._at_start = True         # _rows[0] is the first row of the table
+        self._at_end = True           # _rows[-1] is the last row of the table
+
+    def copy(self) -> 'ReadingsPager':
+        """Returns an unloaded pager with the same device, size and order (for loading on another thread)"""
+        pager = ReadingsPager(self.database, self.visible_rows, self.prefetch, self.device_id)
+        pager.order_by = self.order_by
+        pager.descending = self.descending
+        return pager
+
+    def snapshot(self) -> 'ReadingsPager':
+        """Returns a copy with the same rows and position (to move it on another thread)"""
+        pager = copy.copy(self)
+        pager._rows = list(self._rows)
+        return pager
+
+    def cached(self, delta: int) -> bool:
+        """Whether scroll(delta) is served from the rows in memory, without a query"""
+        if abs(delta) > 2 * self.prefetch + self.visible_rows:
+            return False
+        if delta < 0 and self._top + delta < 0 and not self._at_start:
+            return False
+        if delta > 0 and self._top + delta + self.visible_rows > len(self._rows) and not self._at_end:
+            return False
+        return True
+
+    @property
+    def position(self) -> int:
+        """Table position of the first visible row"""
+        return self._rows_start + self._top
+
+    def visible(self) -> List[Tuple]:
+        """Returns the rows currently in view"""
+        return self._rows[self._top:self._top + self.visible_rows]
+
+    def reload(self):
+        """Reads the row count and the first page"""
+        self.total = self.database.get_database_stats(self.device_id)['total_records']
+        self._load_from(None, start_position=0)
+        self._at_start = True
+
+    def resize(self, visible_rows: int):
+        """Changes the number of visible rows, fetching more rows if needed"""
+        self.visible_rows = visible_rows
+        missing = self._top + visible_rows - len(self._rows)
+        if missing > 0 and not self._at_end:
+            self._extend_forward(missing + self.prefetch)
+        self._top = min(self._top, max(0, len(self._rows) - visible_rows))
+
+    def scroll(self, delta: int):
+        """Moves the view by delta rows (negative = towards the start)"""
+        if abs(delta) > 2 * self.prefetch + self.visible_rows:
+            # Long jumps seek instead of fetching every row in between
+            last_position = max(1, self.total - self.visible_rows)
+            self.seek(min(max(self.position + delta, 0), last_position) / last_position)
+            return
+        if delta < 0 and self._top + delta < 0 and not self._at_start:
+            self._extend_backward(-(self._top + delta) + self.prefetch)
+        needed = self._top + delta + self.visible_rows - len(self._rows)
+        if delta > 0 and needed > 0 and not self._at_end:
+            self._extend_forward(needed + self.prefetch)
+
+        last_top = max(0, len(self._rows) - self.visible_rows)
+        self._top = min(max(self._top + delta, 0), last_top)
+        self._trim()
+
+    def seek(self, fraction: float):
+        """Jumps to a relative position (0.0 = first row, 1.0 = last page)"""
+        fraction = min(max(fraction, 0.0), 1.0)
+        target = int(round(fraction * max(0, self.total - self.visible_rows)))
+        delta = target - self.position
+
+        # Nearby targets are reached by scrolling, which keeps positions exact
+        if abs(delta) <= 2 * self.prefetch + self.visible_rows:
+            self.scroll(delta)
+        elif fraction == 0.0:
+            self.reload()
+        elif fraction == 1.0:
+            self._load_last_page()
+        else:
+            self._seek_by_value(fraction, target)
+
+    def _seek_by_value(self, fraction: float, target: int):
+        """Far jumps interpolate a value of the sort column between its minimum and maximum"""
+        low, high = self.database.get_value_bounds(self.order_by, self.device_id)
+        if low is None:
+            self.reload()
+            return
+        if self.descending:
+            key = (int(high - fraction * (high - low)), _MAX_ID)
+        else:
+            key = (int(low + fraction * (high - low)), 0)
+        self._load_from(key, start_position=target)
+        self._at_start = False
+
+    def _load_from(self, key, start_position: int):
+        """Replaces the window with the rows following key"""
+        limit = self.visible_rows + self.prefetch
+        self._rows = self.database.get_readings_page(limit, key, self.descending, self.order_by, self.device_id)
+        self._rows_start = start_position
+        self._top = 0
+        self._at_end = len(self._rows) < limit
+
+    def _load_last_page(self):
+        """Replaces the window with the last rows of the table"""
+        limit = self.visible_rows + self.prefetch
+        self._rows = self.database.get_readings_page(limit, None, not self.descending, self.order_by,
+                                                     self.device_id)[::-1]
+        self._rows_start = max(0, self.total - len(self._rows))
+        self._top = max(0, len(self._rows) - self.visible_rows)
+        self._at_start = len(self._rows) < limit
+        self._at_end = True
+
+    def _extend_forward(self, count: int):
+        """Appends the next count rows"""
+        if not self._rows:
+            return
+        rows = self.database.get_readings_page(count, self._key(self._rows[-1]), self.descending, self.order_by,
+                                               self.device_id)
+        self._rows.extend(rows)
+        if len(rows) < count:
+            self._at_end = True
+            self.total = max(self.total, self._rows_start + len(self._rows))
+
+    def _extend_backward(self, count: int):
+        """Prepends the previous count rows"""
+        if not self._rows:
+            return
+        rows = self.database.get_readings_page(count, self._key(self._rows[0]), not self.descending,
+                                               self.order_by, self.device_id)[::-1]
+        self._rows[:0] = rows
+        self._top += len(rows)
+        if len(rows) < count:
+            # Reached the real start, which also corrects an estimated position
+            self._at_start = True
+            self._rows_start = 0
+        else:
+            self._rows_start = max(self._rows_start - len(rows), 0)
+
+    def _key(self, row: Tuple) -> Tuple:
+        """Keyset pagination key of a row: (sort value, id)"""
+        return row[_ROW_INDEX[self.order_by]], row[0]
+
+    def _trim(self):
+        """Keeps at most prefetch rows on each side of the visible rows"""
+        if self._top > 2 * self.prefetch:
+            cut = self._top - self.prefetch
+            del self._rows[:cut]
+            self._top -= cut
+            self._rows_start += cut
+            self._at_start = False
+        keep = self._top + self.visible_rows + self.prefetch
+        if len(self._rows) > keep + self.prefetch:
+            del self._rows[keep:]
+            self._at_end = False
@@ -0,0 +1,93 @@
+import bisect
+from array import array
+from typing import NamedTuple, Optional, Tuple
+
+
+class ReadingsWindow(NamedTuple):
+    """Zero-copy views of consecutive readings, oldest first (one memoryview per column)"""
+    time: memoryview
+    moisture: memoryview
+    light: memoryview
+    temperature: memoryview
+
+    def copy(self) -> 'ReadingsWindow':
+        """Copies the columns, so the window outlives later appends"""
+        return ReadingsWindow(*(memoryview(view.tobytes()).cast('d') for view in self))
+
+
+class RecentReadings:
+    """Fixed-capacity ring buffer of the latest readings with array-backed columns
+
+    Every column is a preallocated array('d') of twice the capacity, and each
+    value is written at slot i and i + capacity. The last n readings are then
+    always one contiguous slice, so windows are memoryviews into the columns
+    (no copies; numpy.frombuffer works on them too). Memory stays at
+    4 columns * 2 * capacity * 8 bytes. Times must not decrease, which lets
+    since() find its start with a binary search.
+
+    Views are live: appends that wrap around overwrite the oldest slots, so
+    copy a window (window.copy()) if it has to outlive the next appends.
+    """
+
+    __slots__ = ('capacity', '_time', '_moisture', '_light', '_temperature', '_next', '_count')
+
+    def __init__(self, capacity: int = 86400):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        empty = bytes(2 * capacity * array('d').itemsize)
+        self._time = array('d', empty)
+        self._moisture = array('d', empty)
+        self._light = array('d', empty)
+        self._temperature = array('d', empty)
+        self._next = 0   # slot of the next append
+        self._count = 0  # readings stored, at most capacity
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the columns"""
+        return 4 * len(self._time) * self._time.itemsize
+
+    def append(self, time: float, moisture: float, light: float, temperature: float):
+        """Adds a reading in O(1), overwriting the oldest one when full"""
+        slot = self._next
+        mirror = slot + self.capacity
+        self._time[slot] = self._time[mirror] = time
+        self._moisture[slot] = self._moisture[mirror] = moisture
+        self._light[slot] = self._light[mirror] = light
+        self._temperature[slot] = self._temperature[mirror] = temperature
+        self._next = slot + 1 if slot + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+
+    def latest(self) -> Optional[Tuple[float, float, float, float]]:
+        """Returns the newest (time, moisture, light, temperature), or None when empty"""
+        if not self._count:
+            return None
+        slot = self._next - 1 + self.capacity
+        return self._time[slot], self._moisture[slot], self._light[slot], self._temperature[slot]
+
+    def last(self, n: int) -> ReadingsWindow:
+        """Views of the newest n readings (fewer if not that many are stored)"""
+        n = min(max(n, 0), self._count)
+        end = self._next + self.capacity
+        return self._window(end - n, end)
+
+    def since(self, time: float) -> ReadingsWindow:
+        """Views of the stored readings with time >= the given time"""
+        end = self._next + self.capacity
+        start = end - self._count
+        start = bisect.bisect_left(memoryview(self._time)[start:end], time) + start
+        return self._window(start, end)
+
+    def clear(self):
+        """Forgets all readings (the memory stays allocated)"""
+        self._next = 0
+        self._count = 0
+
+    def _window(self, start: int, end: int) -> ReadingsWindow:
+        return ReadingsWindow(memoryview(self._time)[start:end], memoryview(self._moisture)[start:end],
+                              memoryview(self._light)[start:end], memoryview(self._temperature)[start:end])
@@ -0,0 +1,39 @@
+import logging
+import time
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Records startup milestones (time to first window, time to data ready)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, name: str) -> float:
+        """Records a milestone and returns the seconds since start"""
+        elapsed = time.perf_counter() - self.start
+        self.marks.append((name, elapsed))
+        return elapsed
+
+    def elapsed(self, name: str) -> float:
+        """Returns the seconds from start to a recorded milestone"""
+        for mark_name, elapsed in self.marks:
+            if mark_name == name:
+                return elapsed
+        raise KeyError(name)
+
+    def report(self) -> str:
+        """Formats all milestones, one per line"""
+        lines = ["Startup timing:"]
+        for name, elapsed in self.marks:
+            lines.append(f"  {name:<24} {elapsed * 1000:8.0f} ms")
+        return "\n".join(lines)
+
+    def log_report(self):
+        """Prints the report and writes it to the log"""
+        report = self.report()
+        print(report)
+        logger.info(report.replace("\n", " |"))
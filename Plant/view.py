@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
+from .async_loader import AsyncLoader
 
 
 class SystemView:
@@ -7,6 +8,9 @@ class SystemView:
     def __init__(self, master: tk.Tk, controller):
         self.master = master
         self.controller = controller
+        # Database writes run on a worker thread, results come back via the main loop
+        self.loader = AsyncLoader(master)
+        self._simulation_count = 0
         
         #Master window
         master.title("🌱 Plant Management Panel")
@@ -40,26 +44,40 @@ class SystemView:
         status_frame.grid(row=1, column=0, sticky="ew", pady=(0, 15))
         status_frame.columnconfigure(0, weight=1)
         
+        # Plant selector; the list comes from the devices table and devices seen since the start
+        selector_frame = ttk.Frame(status_frame)
+        selector_frame.grid(row=0, column=0, sticky="w", pady=(0, 10))
+        ttk.Label(selector_frame, text="🪴 Plant:", style='Status.TLabel').grid(row=0, column=0, padx=(0, 8))
+        self.device_names = {}  # device id -> name, from the devices table
+        self.device_var = tk.StringVar()
+        self.device_box = ttk.Combobox(selector_frame, textvariable=self.device_var, state='readonly', width=24,
+                                       postcommand=self.update_device_list)
+        self.device_box.grid(row=0, column=1)
+        self.device_box.bind('<<ComboboxSelected>>', self.on_device_selected)
+        
         # Status labels with icons and better styling
         self.moisture_label = ttk.Label(status_frame, 
                                       text=f"💧 Moisture: {self.controller.model.get_moisture()}%", 
                                       style='Status.TLabel')
-        self.moisture_label.grid(row=0, column=0, sticky="w", pady=5)
+        self.moisture_label.grid(row=1, column=0, sticky="w", pady=5)
         
         self.light_label = ttk.Label(status_frame, 
                                    text=f"☀️ Light: {self.controller.model.get_light()}%", 
                                    style='Status.TLabel')
-        self.light_label.grid(row=1, column=0, sticky="w", pady=5)
+        self.light_label.grid(row=2, column=0, sticky="w", pady=5)
         
         self.temperature_label = ttk.Label(status_frame, 
                                          text=f"🌡️ Temperature: {self.controller.model.get_temperature()}°C", 
                                          style='Status.TLabel')
-        self.temperature_label.grid(row=2, column=0, sticky="w", pady=5)
+        self.temperature_label.grid(row=3, column=0, sticky="w", pady=5)
         
         self.time_label = ttk.Label(status_frame, 
                                   text=f"🕐 System Time: {self.controller.model.get_SystemTimeSTR()}", 
                                   style='Status.TLabel')
-        self.time_label.grid(row=3, column=0, sticky="w", pady=5)
+        self.time_label.grid(row=4, column=0, sticky="w", pady=5)
+
+        self.weather_label = ttk.Label(status_frame, text="🌦️ Weather: -", style='Status.TLabel')
+        self.weather_label.grid(row=5, column=0, sticky="w", pady=5)
 
         # Message frame with modern styling
         message_frame = ttk.LabelFrame(self.main_frame, text="💬 Messages", padding=15)
@@ -88,6 +106,9 @@ class SystemView:
         self.analytics_button = ttk.Button(control_frame, text="📊 Analytics Data", 
                                          command=self.open_analytics, style='Action.TButton')
         self.analytics_button.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+        
+        self.update_device_list()
+        self.load_devices()
 
     def configure_styles(self):
         """Configure modern styling for the application"""
@@ -112,19 +133,67 @@ class SystemView:
                            font=('Segoe UI', 10),
                            padding=(15, 8))
 
+    # Trend arrows shown next to the values (from the model's in-memory history)
+    TREND_ARROWS = {1: " ↑", 0: "", -1: " ↓"}
+
     def refresh_data(self):
         """Refreshes displayed data"""
-        self.moisture_label.config(text=f"💧 Moisture: {self.controller.model.get_moisture()}%")
-        self.light_label.config(text=f"☀️ Light: {self.controller.model.get_light()}%")
-        self.temperature_label.config(text=f"🌡️ Temperature: {self.controller.model.get_temperature()}°C")
+        model = self.controller.model
+        arrows = {column: self.TREND_ARROWS[model.get_trend(column)]
+                  for column in ('moisture', 'light', 'temperature')}
+        self.moisture_label.config(text=f"💧 Moisture: {model.get_moisture()}%{arrows['moisture']}")
+        self.light_label.config(text=f"☀️ Light: {model.get_light()}%{arrows['light']}")
+        self.temperature_label.config(text=f"🌡️ Temperature: {model.get_temperature()}°C{arrows['temperature']}")
         self.time_label.config(text=f"🕐 System Time: {self.controller.model.get_SystemTimeSTR()}")
         
+    def load_devices(self):
+        """Reads the registered devices on the worker thread"""
+        self.loader.submit('devices', self.controller.model.database.get_devices, self.show_devices,
+                           self.show_error)
+    
+    def show_devices(self, devices):
+        """Fills the plant selector with (id, name, record_count, last_timestamp) rows"""
+        self.device_names = {device_id: name for device_id, name, _, _ in devices}
+        self.update_device_list()
+    
+    def update_device_list(self):
+        """Lists the registered devices and those that sent samples since the start"""
+        device_ids = sorted(set(self.device_names) | set(self.controller.model.seen_devices())
+                            | {self.controller.model.device_id})
+        self.device_box['values'] = [self.device_label(device_id) for device_id in device_ids]
+        self.device_var.set(self.device_label(self.controller.model.device_id))
+    
+    def device_label(self, device_id: int) -> str:
+        return f"{device_id}: {self.device_names.get(device_id, f'Plant {device_id}')}"
+    
+    def on_device_selected(self, event=None):
+        """Shows the newest values of the selected plant"""
+        device_id = int(self.device_var.get().split(':', 1)[0])
+        self.controller.model.select_device(device_id)
+        self.refresh_data()
+        self.update_message_based_on_conditions()
+    
     def simulate_readings(self):
         """Simulates new sensor readings"""
-        self.controller.model.simulate_sensor_readings()
+        # Every click gets its own key, so quick clicks are not dropped as superseded
+        self._simulation_count += 1
+        self.loader.submit(f"simulate-{self._simulation_count}",
+                           self.controller.model.simulate_sensor_readings,
+                           self.on_readings_simulated, self.show_error)
+    
+    def on_readings_simulated(self, _):
+        """Shows readings produced by simulate_readings"""
         self.refresh_data()
         self.update_message_based_on_conditions()
+    
+    def show_error(self, error: Exception):
+        """Shows an error in the message panel"""
+        self.message_label.config(text=f"❌ {error}", foreground="red")
         
+    def show_weather_status(self, text: str, error: bool = False):
+        """Shows weather collection progress or the latest weather record"""
+        self.weather_label.config(text=f"🌦️ Weather: {text}", foreground="red" if error else "")
+
     def update_message_based_on_conditions(self):
         """Updates message based on plant conditions"""
         moisture = self.controller.model.get_moisture()
@@ -149,4 +218,5 @@ class SystemView:
     def open_analytics(self):
         """Opens analytics data window"""
         from .analytics_window import AnalyticsWindow
-        AnalyticsWindow(self.master, self.controller.model.database)
\ No newline at end of file
+        model = self.controller.model
+        AnalyticsWindow(self.master, model.database, model.readings_since, model.device_id)
\ No newline at end of file
@@ -0,0 +1 @@
+# Benchmarks package - performance measurements for the data layer
\ No newline at end of file
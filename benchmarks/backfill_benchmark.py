@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Backfill benchmark
+Backfills a long range from the local stub Open-Meteo server (with simulated
+network latency), comparing one new connection per sequential request with
+the pooled session and parallel chunks
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from db.combined_database import PlantDatabase
+from meteo_data.backfill import Backfill, split_range
+from meteo_data.conversion import HOURLY_VARIABLES, hourly_rows
+from meteo_data.locations import Location
+from meteo_data.open_meteo_client import OpenMeteoClient
+from meteo_data.stub_server import StubOpenMeteoServer
+
+
+def connect_per_request(server: StubOpenMeteoServer, database: PlantDatabase, start_time: datetime,
+                        end_time: datetime, chunk_days: int):
+    """Baseline: sequential requests.get calls, each on a new connection"""
+    for chunk_start, chunk_end in split_range(start_time.date(), end_time.date(), chunk_days):
+        response = requests.get(server.forecast_url, params={
+            'latitude': 53.12, 'longitude': 18.0, 'hourly': ','.join(HOURLY_VARIABLES),
+            'start_date': chunk_start.isoformat(), 'end_date': chunk_end.isoformat(),
+        }, headers={'Connection': 'close'})
+        response.raise_for_status()
+        database.upsert_weather_data(hourly_rows(response.json()["hourly"], start_time, end_time), update_changed=True)
+
+
+def main():
+    """Runs each variant against a fresh database"""
+    parser = argparse.ArgumentParser(description="Compare backfill strategies against a local stub API")
+    parser.add_argument('--days', type=int, default=730, help="length of the backfilled range")
+    parser.add_argument('--chunk-days', type=int, default=31)
+    parser.add_argument('--latency', type=float, default=0.15, help="simulated seconds per response")
+    parser.add_argument('--fail-rate', type=float, default=0.1, help="fraction of 503 responses")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # retries are expected here
+
+    end_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=args.days)
+    chunks = len(split_range(start_time.date(), end_time.date(), args.chunk_days))
+    print(f"Backfilling {args.days} days in {chunks} chunks, {args.latency * 1000:.0f} ms latency")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with StubOpenMeteoServer(latency=args.latency) as server, \
+                PlantDatabase(os.path.join(tmp_dir, "baseline.db")) as database:
+            started = time.perf_counter()
+            connect_per_request(server, database, start_time, end_time, args.chunk_days)
+            baseline = time.perf_counter() - started
+            print(f"  {'connect per request, sequential':<40} {baseline:6.2f} s  "
+                  f"({server.stats()['connections']} connections)")
+
+        for workers, fail_rate in ((1, 0.0), (4, 0.0), (8, 0.0), (8, args.fail_rate)):
+            with StubOpenMeteoServer(latency=args.latency, fail_rate=fail_rate) as server, \
+                    PlantDatabase(os.path.join(tmp_dir, f"pooled_{workers}_{fail_rate}.db")) as database, \
+                    OpenMeteoClient(server.forecast_url, server.archive_url, backoff=0.05,
+                                    pool_size=workers) as client:
+                location = Location('Bydgoszcz', 53.12, 18.0, id=1)
+                backfill = Backfill(database, client, [location], args.chunk_days, workers)
+                result = backfill.run(start_time, end_time)
+                stats = server.stats()
+                label = f"pooled session, {workers} worker{'s' if workers > 1 else ''}"
+                if fail_rate:
+                    label += f", {fail_rate:.0%} failures"
+                print(f"  {label:<40} {result.seconds:6.2f} s  ({baseline / result.seconds:4.1f}x, "
+                      f"{stats['connections']} connections, {client.retries} retries, "
+                      f"{len(result.failed_chunks)} failed chunks, {result.new} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Chart benchmark
+Measures query + downsampling + rendering time of the analytics charts for
+zoom levels over a year of one-second sensor data, and the cost of one live
+blitting frame
+
+Inserting 31.5 million raw rows would take most of an hour, so the benchmark
+inserts raw one-second readings for the newest --raw-days days and writes the
+minute/hour/day rollups of the rest of the year directly. The series queries
+only ever read raw rows for ranges that hold few of them, so the measured
+query paths are the same as with a full year of raw rows.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from db.combined_database import PlantDatabase
+from db.rollups import SENSOR_RESOLUTIONS, SENSOR_VALUES, WEATHER_VALUES
+from db.timestamps import from_epoch, to_epoch
+from Plant.chart_panel import SeriesFigure, to_date_number
+from Plant.downsample import downsample_series, minmax_decimate
+from Plant.ring_buffer import RecentReadings
+
+DAY = 86400
+
+
+def signal(ts: np.ndarray, rng) -> tuple:
+    """Daily cycles plus noise for moisture, light and temperature"""
+    phase = 2 * np.pi * (ts % DAY) / DAY
+    moisture = np.clip(55 + 20 * np.sin(ts / (7 * DAY)) + rng.normal(0, 2, len(ts)), 0, 100)
+    light = np.clip(50 - 45 * np.cos(phase) + rng.normal(0, 3, len(ts)), 0, 100)
+    temperature = 21 + 4 * np.sin(phase - 1) + rng.normal(0, 0.5, len(ts))
+    return moisture.round(), light.round(), temperature.round()
+
+
+def populate(database: PlantDatabase, end_ts: int, days: int, raw_days: int):
+    """Raw readings for the newest raw_days, synthetic minute/hour/day rollups before that"""
+    rng = np.random.default_rng(1)
+    raw_start = end_ts - end_ts % DAY - (raw_days - 1) * DAY
+    start = raw_start - (days - raw_days) * DAY
+
+    # Raw rows go through save_readings, so the triggers build their rollups
+    for chunk_start in range(raw_start, end_ts, 3600):
+        ts = np.arange(chunk_start, min(chunk_start + 3600, end_ts))
+        moisture, light, temperature = signal(ts, rng)
+        database.save_readings(
+            (from_epoch(int(t)).strftime("%Y-%m-%d %H:%M:%S"), int(m), int(l), int(c), from_epoch(int(t)).hour, 1)
+            for t, m, l, c in zip(ts.tolist(), moisture.tolist(), light.tolist(), temperature.tolist())
+        )
+
+    columns = ', '.join(f'sum_{v}, min_{v}, max_{v}, last_{v}' for v in SENSOR_VALUES)
+    with database._connections.transaction() as conn:
+        buckets = np.arange(start, raw_start, 60)
+        values = signal(buckets, rng)
+        rows = [(1, 60, int(b), 60, int(b) + 59) + tuple(
+                    x for v in value for x in (int(v) * 60, int(v) - 3, int(v) + 3, int(v)))
+                for b, value in zip(buckets.tolist(), zip(*(v.tolist() for v in values)))]
+        conn.executemany(f'''
+            INSERT INTO sensor_rollups (device_id, resolution, bucket, record_count, last_ts, {columns})
+            VALUES ({', '.join('?' * 17)})
+        ''', rows)
+        merged = ', '.join(f'SUM(sum_{v}), MIN(min_{v}), MAX(max_{v}), MAX(last_{v})' for v in SENSOR_VALUES)
+        for resolution in SENSOR_RESOLUTIONS[1:]:
+            conn.execute(f'''
+                INSERT INTO sensor_rollups (device_id, resolution, bucket, record_count, last_ts, {columns})
+                SELECT 1, {resolution}, bucket - bucket % {resolution}, SUM(record_count), MAX(last_ts), {merged}
+                FROM sensor_rollups
+                WHERE device_id = 1 AND resolution = 60 AND bucket < ?
+                GROUP BY bucket - bucket % {resolution}
+            ''', (raw_start,))
+
+    # Hourly weather for the whole period
+    hours = np.arange(start, end_ts, 3600)
+    weather_rng = np.random.default_rng(2)
+    database.upsert_weather_data(
+        (from_epoch(t).strftime("%Y-%m-%d"), from_epoch(t).strftime("%H:%M"),
+         round(10 + 8 * np.sin(2 * np.pi * (t % DAY) / DAY) + weather_rng.normal(0, 1), 1),
+         round(70 + weather_rng.normal(0, 10), 1), 1013.0, 3.0, 180, 0.0, 10000)
+        for t in hours.tolist()
+    )
+
+
+def render_range(database: PlantDatabase, series_figure: SeriesFigure, canvas, start_ts: int, end_ts: int,
+                 points: int):
+    """Same work as ChartPanel.load_range + show_series; returns (resolution, query ms, draw ms)"""
+    started = time.perf_counter()
+    start, end = from_epoch(start_ts), from_epoch(end_ts)
+    resolution, rows = database.get_sensor_series(start, end, max_points=4 * points)
+    sensor = downsample_series(resolution, rows, SENSOR_VALUES, points)
+    weather_resolution, weather_rows = database.get_weather_series(start, end, 4 * points)
+    weather = downsample_series(weather_resolution, weather_rows, WEATHER_VALUES, points)
+    queried = time.perf_counter()
+    series_figure.show(sensor, weather)
+    series_figure.axes['moisture'].set_xlim(to_date_number(start_ts), to_date_number(end_ts))
+    canvas.draw()
+    drawn = time.perf_counter()
+    return resolution, (queried - started) * 1000, (drawn - queried) * 1000
+
+
+def live_frame_cost(series_figure: SeriesFigure, canvas, rate: int, points: int, frames: int = 60) -> float:
+    """Mean time of one blitted live frame over a 5-minute ring buffer window (ms)"""
+    recent = RecentReadings(300 * rate)
+    now = time.time()
+    for i in range(300 * rate):
+        recent.append(now - 300 + i / rate, 50 + (i % 100) / 10, 60, 21)
+    for line in series_figure.lines.values():
+        line.set_animated(True)
+    series_figure.axes['moisture'].set_xlim(to_date_number(now - 300), to_date_number(now + 30))
+    for ax in series_figure.axes.values():
+        ax.set_ylim(0, 100)
+    canvas.draw()
+    background = canvas.copy_from_bbox(series_figure.figure.bbox)
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        window = recent.since(now - 300)
+        x = to_date_number(np.array(window.time))
+        canvas.restore_region(background)
+        for value, line in series_figure.lines.items():
+            line.set_data(*minmax_decimate(x, np.array(getattr(window, value)), points))
+            series_figure.axes[value].draw_artist(line)
+        canvas.blit(series_figure.figure.bbox)
+    return (time.perf_counter() - started) * 1000 / frames
+
+
+def main():
+    """Builds the dataset in a temporary directory and times every zoom level"""
+    parser = argparse.ArgumentParser(description="Time chart rendering for zoom levels over a year of data")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--raw-days', type=int, default=2, help="newest days stored as raw 1 s readings")
+    parser.add_argument('--width', type=int, default=700, help="plot width in pixels (points per series)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = PlantDatabase(os.path.join(tmp_dir, "chart.db"))
+        end_ts = to_epoch(datetime.now())
+        started = time.perf_counter()
+        populate(database, end_ts, args.days, args.raw_days)
+        print(f"Dataset: {args.days} days ({args.raw_days} raw) built in {time.perf_counter() - started:.1f} s")
+
+        figure = Figure(figsize=(args.width / 100, 4.5), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        series_figure = SeriesFigure(figure)
+        ranges = [("1 minute", 60, 0), ("1 hour", 3600, 0), ("6 hours, yesterday", 6 * 3600, DAY),
+                  ("1 day", DAY, 0), ("1 week", 7 * DAY, 0), ("1 month", 30 * DAY, 0), ("1 year", 365 * DAY, 0)]
+        # The first draw loads fonts and caches; it is not what a zoom costs
+        render_range(database, series_figure, canvas, end_ts - DAY, end_ts, args.width)
+        print(f"  {'range (median of 3)':<22} {'resolution':>10} {'query+downsample':>17} {'draw':>8} {'total':>8}")
+        for label, span, offset in ranges:
+            end = end_ts - offset
+            runs = sorted((render_range(database, series_figure, canvas, end - span, end, args.width)
+                           for _ in range(3)), key=lambda run: run[1] + run[2])
+            resolution, query_ms, draw_ms = runs[1]
+            print(f"  {label:<22} {resolution:>10} {query_ms:14.1f} ms {draw_ms:5.1f} ms {query_ms + draw_ms:5.1f} ms")
+
+        for rate in (1, 1000):
+            print(f"Live frame (5 min at {rate} Hz): {live_frame_cost(series_figure, canvas, rate, args.width):.1f} ms")
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Connection benchmark for PlantDatabase
+Compares the pooled WAL connection manager with opening a new connection per call
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from db.combined_database import PlantDatabase
+
+
+def save_reading_connect_per_call(db_path: str, moisture: int, light: int, temperature: int, time_of_day: int):
+    """Previous save_reading behaviour: connect, insert, commit, close"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute('''
+                INSERT INTO sensor_readings (timestamp, moisture, light, temperature, time_of_day)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (timestamp, moisture, light, temperature, time_of_day))
+    finally:
+        conn.close()
+
+
+def get_recent_readings_connect_per_call(db_path: str, limit: int = 100):
+    """Previous get_recent_readings behaviour"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('''
+            SELECT timestamp, moisture, light, temperature, time_of_day
+            FROM sensor_readings
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    finally:
+        conn.close()
+
+
+def timed(label: str, iterations: int, func):
+    """Runs func iterations times and prints the mean latency"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed * 1e6 / iterations:10.1f} us/op  ({iterations / elapsed:10.0f} ops/s)")
+    return elapsed
+
+
+def main():
+    """Runs the benchmark in a temporary directory"""
+    parser = argparse.ArgumentParser(description="Compare pooled connections with connect-per-call")
+    parser.add_argument('--iterations', type=int, default=2000, help="operations per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Baseline uses the old rollback-journal database
+        legacy_path = os.path.join(tmp_dir, "legacy.db")
+        PlantDatabase(legacy_path, pragmas={'journal_mode': 'DELETE', 'synchronous': 'FULL'}).close()
+
+        pooled_path = os.path.join(tmp_dir, "pooled.db")
+        database = PlantDatabase(pooled_path)
+
+        print(f"save_reading x {args.iterations}")
+        legacy = timed("connect per call", args.iterations,
+                       lambda i: save_reading_connect_per_call(legacy_path, 50, 60, 21, i % 24))
+        pooled = timed("pooled WAL connection", args.iterations,
+                       lambda i: database.save_reading(50, 60, 21, i % 24))
+        print(f"  speedup: {legacy / pooled:.1f}x")
+
+        print(f"get_recent_readings(100) x {args.iterations}")
+        legacy = timed("connect per call", args.iterations,
+                       lambda i: get_recent_readings_connect_per_call(legacy_path))
+        pooled = timed("pooled WAL connection", args.iterations,
+                       lambda i: database.get_recent_readings(100))
+        print(f"  speedup: {legacy / pooled:.1f}x")
+
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
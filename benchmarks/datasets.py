@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Synthetic, reproducible plant databases for benchmarks
+
+A dataset holds one-second sensor_readings of N plants and hourly
+weather_data for several years, all ending at DATASET_END, so the same
+parameters always produce the same rows. Readings are generated inside
+SQLite (a recursive CTE, about 55k rows/s with the stats and rollup
+triggers active) and weather rows go through upsert_weather_data, so the
+aggregates, rollups and coverage are built by the application's own code.
+
+Generated files are kept in a cache directory and reused:
+
+    python -m benchmarks.datasets --readings 1000000 --plants 4
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from db.combined_database import PlantDatabase
+from db.migrations import latest_version
+from db.timestamps import to_epoch
+from meteo_data.conversion import HOURLY_VARIABLES
+from meteo_data.stub_server import hourly_value
+
+logger = logging.getLogger(__name__)
+
+# Last second of every dataset; fixed, so results don't depend on the day they are generated
+DATASET_END = datetime(2025, 1, 1)
+
+# Bumped whenever the generated rows change, which invalidates cached files
+DATASET_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "plant_benchmark_datasets")
+
+# Readings inserted per transaction
+READINGS_BATCH = 500000
+
+
+class DatasetSpec(NamedTuple):
+    """Parameters of a synthetic dataset"""
+    readings: int
+    plants: int = 1
+    weather_years: float = 3.0
+    seed: int = 1
+
+    @property
+    def seconds(self) -> int:
+        """Length of the sensor history; every plant reports once per second"""
+        return -(-self.readings // self.plants)
+
+    @property
+    def weather_hours(self) -> int:
+        return int(self.weather_years * 365.25 * 24)
+
+    @property
+    def filename(self) -> str:
+        # The schema version is part of the name: a cached file from older code would be migrated on open
+        return (f"plants_r{self.readings}_p{self.plants}_w{self.weather_hours}_s{self.seed}"
+                f"_v{DATASET_VERSION}_schema{latest_version()}.db")
+
+
+def parse_count(text: str) -> int:
+    """Row count with an optional k/m suffix: '10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def insert_readings(database: PlantDatabase, spec: DatasetSpec):
+    """One-second readings of spec.plants plants (devices 1..plants), ending at DATASET_END
+
+    Moisture dries out over a three-day watering cycle, light follows a
+    triangular day curve peaking at 13:00 and temperature follows the light;
+    each plant is phase-shifted and a multiplicative hash of the row number
+    adds noise.
+    """
+    start_ts = to_epoch(DATASET_END) - spec.seconds + 1
+    conn = database._connections.get_connection()
+    for low in range(0, spec.readings, READINGS_BATCH):
+        high = min(low + READINGS_BATCH, spec.readings)
+        with conn:
+            conn.execute('''
+                WITH RECURSIVE seq(i) AS (SELECT ?1 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < ?2),
+                rows AS (
+                    SELECT i, ?3 + i / ?4 AS ts, i % ?4 AS plant, (i * 2654435761 + ?5) % 1000 AS noise
+                    FROM seq
+                ),
+                shaped AS (
+                    SELECT ts, plant, noise, ts % 86400 AS second_of_day,
+                           MAX(0, 100 - ABS(ts % 86400 - 46800) * 100 / 25200) AS daylight
+                    FROM rows
+                )
+                INSERT INTO sensor_readings (device_id, timestamp, ts, moisture, light, temperature, time_of_day)
+                SELECT plant + 1, datetime(ts, 'unixepoch'), ts,
+                       85 - (ts + plant * 21600) % 259200 * 60 / 259200 + noise % 5,
+                       MAX(0, MIN(100, daylight - plant * 3 + noise % 7)),
+                       17 + daylight / 12 + plant % 3 + noise % 3,
+                       second_of_day / 3600
+                FROM shaped
+            ''', (low, high, start_ts, spec.plants, spec.seed))
+
+
+def weather_rows(spec: DatasetSpec):
+    """Hourly (date, time, temperature, ...) rows for the spec.weather_hours hours before DATASET_END"""
+    first = DATASET_END - timedelta(hours=spec.weather_hours - 1)
+    for hour in range(spec.weather_hours):
+        moment = first + timedelta(hours=hour)
+        values = [hourly_value(name, moment) for name in HOURLY_VARIABLES]
+        yield (moment.strftime('%Y-%m-%d'), moment.strftime('%H:%M:%S')) + tuple(values)
+
+
+def build(spec: DatasetSpec, path: str):
+    """Writes a dataset to path"""
+    with PlantDatabase(path) as database:
+        insert_readings(database, spec)
+        database.upsert_weather_data(weather_rows(spec))
+        conn = database._connections.get_connection()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def get_dataset(spec: DatasetSpec, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Path of the cached dataset, generated first if needed"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, spec.filename)
+    if os.path.exists(path):
+        return path
+
+    # Built under a temporary name, so an interrupted run never leaves a partial dataset behind
+    partial = path + ".partial"
+    for leftover in (partial, partial + "-wal", partial + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    started = time.perf_counter()
+    logger.info(f"Generating {spec.readings} readings of {spec.plants} plants "
+                f"and {spec.weather_hours} weather hours")
+    build(spec, partial)
+    os.replace(partial, path)
+    logger.info(f"Dataset {path} ready in {time.perf_counter() - started:.1f}s "
+                f"({os.path.getsize(path) / 1e6:.0f} MB)")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a cached synthetic plant database")
+    parser.add_argument('--readings', type=parse_count, default=parse_count('1m'), help="e.g. 10k, 1m, 10m")
+    parser.add_argument('--plants', type=int, default=1)
+    parser.add_argument('--weather-years', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    spec = DatasetSpec(args.readings, args.plants, args.weather_years, args.seed)
+    print(get_dataset(spec, args.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
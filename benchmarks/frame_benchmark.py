@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Frame format benchmark
+Compares the size and decoding speed of the text line protocol and binary frames
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from sensors.binary_frame import BinaryFrameParser, encode_frames
+from sensors.line_parser import LineParser
+
+
+def make_samples(count: int, devices: int, seed: int = 1):
+    """Returns device ids, per-device sequence numbers and values as arrays"""
+    rng = np.random.default_rng(seed)
+    device_ids = np.arange(count) % devices + 1
+    sequences = np.arange(count) // devices
+    moisture = rng.uniform(10, 90, count).round(2)
+    light = rng.uniform(20, 100, count).round(2)
+    temperature = rng.uniform(15, 30, count).round(2)
+    return device_ids, sequences, moisture, light, temperature
+
+
+def encode_lines(device_ids, sequences, moisture, light, temperature) -> bytes:
+    """Encodes the samples in the text line protocol"""
+    return b''.join(
+        f"{d},{s % 65536},{m:.2f},{l:.2f},{t:.2f}\r\n".encode()
+        for d, s, m, l, t in zip(device_ids.tolist(), sequences.tolist(), moisture.tolist(),
+                                 light.tolist(), temperature.tolist())
+    )
+
+
+def measure(label: str, data: bytes, feed, count: int, chunk_size: int, repeat: int = 3):
+    """Feeds data in chunks and prints the best decoding rate"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded = feed(data, chunk_size)
+        best = min(best, time.perf_counter() - start)
+    assert decoded == count, f"{label}: decoded {decoded} of {count}"
+    print(f"  {label:<28} {len(data) / count:5.1f} B/sample  {count / best:12,.0f} samples/s")
+    return best
+
+
+def main():
+    """Runs the comparison"""
+    parser = argparse.ArgumentParser(description="Compare line and binary sample decoding")
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--chunk', type=int, default=4096, help="bytes per serial read")
+    args = parser.parse_args()
+
+    samples = make_samples(args.samples, args.devices)
+    lines = encode_lines(*samples)
+    frames = encode_frames(*samples)
+
+    def feed_lines(data, chunk_size):
+        decoder = LineParser()
+        for offset in range(0, len(data), chunk_size):
+            decoder.feed(data[offset:offset + chunk_size], 0.0)
+        return decoder.samples
+
+    def feed_frames(use_numpy, arrays_only):
+        def feed(data, chunk_size):
+            decoder = BinaryFrameParser(use_numpy=use_numpy)
+            decode = decoder.decode if arrays_only else lambda chunk: decoder.feed(chunk, 0.0)
+            for offset in range(0, len(data), chunk_size):
+                decode(data[offset:offset + chunk_size])
+            return decoder.samples
+        return feed
+
+    print(f"{args.samples} samples, {args.chunk}-byte reads")
+    baseline = measure("text lines", lines, feed_lines, args.samples, args.chunk)
+    for label, feed in (("binary, numpy arrays", feed_frames(True, True)),
+                        ("binary, numpy -> Samples", feed_frames(True, False)),
+                        ("binary, struct fallback", feed_frames(False, False))):
+        elapsed = measure(label, frames, feed, args.samples, args.chunk)
+        print(f"  {'':<28} {baseline / elapsed:5.1f}x the text line rate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Serial ingestion benchmark
+Streams Arduino protocol lines through a pty into SerialIngestor and PlantDatabase,
+and measures parser throughput on its own
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import tty
+
+from db.combined_database import PlantDatabase
+from db.write_buffer import Durability
+from sensors.line_parser import LineParser
+from sensors.serial_ingest import SerialIngestor
+
+
+def make_lines(count: int, devices: int, corrupt_fraction: float, seed: int = 1):
+    """Builds protocol lines round-robin over devices; returns (lines, number corrupted)"""
+    rng = random.Random(seed)
+    lines = []
+    corrupted = 0
+    for i in range(count):
+        device = i % devices + 1
+        sequence = (i // devices) % 65536
+        line = (f"{device},{sequence},{rng.randint(10, 90)},{rng.randint(20, 100)},"
+                f"{rng.uniform(15, 30):.1f}\r\n").encode()
+        if rng.random() < corrupt_fraction:
+            # Line noise: a flipped byte in the middle of the line
+            position = rng.randrange(2, len(line) - 3)
+            line = line[:position] + b'#' + line[position + 1:]
+            corrupted += 1
+        lines.append(line)
+    return lines, corrupted
+
+
+def parser_throughput(lines, chunk_size: int = 4096):
+    """Feeds the lines to a LineParser in serial-sized chunks and prints samples/s"""
+    data = b''.join(lines)
+    parser = LineParser()
+    start = time.perf_counter()
+    for offset in range(0, len(data), chunk_size):
+        parser.feed(data[offset:offset + chunk_size], 0.0)
+    elapsed = time.perf_counter() - start
+    print(f"Parser only: {parser.samples} samples in {elapsed * 1000:.1f} ms "
+          f"({parser.samples / elapsed:,.0f} samples/s, {len(data) / elapsed / 1e6:.1f} MB/s)")
+
+
+def pty_throughput(lines, expected_corrupted: int, rate: float, durability: Durability):
+    """Writes the lines into a pty at the given rate (0 = as fast as possible) and ingests them"""
+    master, slave = os.openpty()
+    tty.setraw(slave)  # no echo or line editing, like a real serial device
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = PlantDatabase(os.path.join(tmp_dir, "ingest.db"))
+        database.enable_write_buffer(durability)
+        ingestor = SerialIngestor(database, slave)
+
+        def write_lines():
+            interval = 1.0 / rate if rate else 0.0
+            batch = max(1, int(rate / 100)) if rate else 64  # write in 10 ms slices when paced
+            next_time = time.perf_counter()
+            for offset in range(0, len(lines), batch):
+                os.write(master, b''.join(lines[offset:offset + batch]))
+                if interval:
+                    next_time += interval * batch
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+        writer = threading.Thread(target=write_lines)
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        ingestor.start()
+        writer.start()
+        writer.join()
+
+        # Wait until the reader has drained the pty
+        sent = len(lines)
+        deadline = time.monotonic() + 10
+        while ingestor.parser.samples + ingestor.parser.corrupted < sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        database.flush()
+        cpu = time.process_time() - cpu_start
+        ingestor.stop()
+        written = sum(record_count for _, _, record_count, _ in database.get_devices())
+        database.close()
+    os.close(master)
+    os.close(slave)
+
+    stats = ingestor.stats()
+    label = f"{rate:,.0f} samples/s" if rate else "unpaced burst"
+    print(f"pty -> database ({label}, {durability.value}):")
+    print(f"  sent {sent}, parsed {stats['samples']}, written {written} in {elapsed:.2f} s "
+          f"({stats['samples'] / elapsed:,.0f} samples/s, CPU {cpu / elapsed * 100:.0f}% of one core, all threads)")
+    print(f"  corrupted {stats['corrupted']} (injected {expected_corrupted}), "
+          f"sequence gaps {stats['lost_in_transit']}, dropped (buffer full) {stats['dropped']}")
+
+
+def main():
+    """Runs the parser and pty benchmarks"""
+    parser = argparse.ArgumentParser(description="Measure serial ingestion throughput")
+    parser.add_argument('--samples', type=int, default=20000, help="lines to send")
+    parser.add_argument('--devices', type=int, default=4, help="interleaved devices")
+    parser.add_argument('--rate', type=float, default=2000, help="aggregate samples/s (0 = unpaced)")
+    parser.add_argument('--corrupt', type=float, default=0.01, help="fraction of corrupted lines")
+    parser.add_argument('--durability', choices=[d.value for d in Durability if d != Durability.IMMEDIATE],
+                        default=Durability.GROUP.value)
+    args = parser.parse_args()
+
+    lines, corrupted = make_lines(args.samples, args.devices, args.corrupt)
+    parser_throughput(lines)
+    pty_throughput(lines, corrupted, args.rate, Durability(args.durability))
+    pty_throughput(lines, corrupted, 0, Durability(args.durability))
+
+
+if __name__ == "__main__":
+    main()
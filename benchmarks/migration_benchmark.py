@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Schema migration benchmark
+Builds a pre-migration (version 0) database, then compares query plans and
+latencies of the hot read queries before and after running the migrations
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db.migrations import migrate
+
+# Version 0 schema, as created by the original PlantDatabase.init_database
+BASE_SCHEMA = '''
+    CREATE TABLE sensor_readings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        moisture INTEGER NOT NULL,
+        light INTEGER NOT NULL,
+        temperature INTEGER NOT NULL,
+        time_of_day INTEGER NOT NULL
+    );
+    CREATE TABLE weather_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        time TEXT,
+        temperature REAL,
+        humidity REAL,
+        pressure REAL,
+        wind_speed REAL,
+        wind_direction REAL,
+        precipitation REAL,
+        visibility REAL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(date, time)
+    );
+'''
+
+START = datetime(2024, 1, 1)
+
+# (label, query before migration, query after migration, parameters)
+QUERIES = [
+    ("recent readings (LIMIT 100)",
+     "SELECT timestamp, moisture, light, temperature, time_of_day FROM sensor_readings "
+     "ORDER BY timestamp DESC LIMIT 100",
+     "SELECT timestamp, moisture, light, temperature, time_of_day FROM sensor_readings "
+     "WHERE device_id = 1 ORDER BY ts DESC LIMIT 100",
+     ()),
+    ("one hour range",
+     "SELECT timestamp, moisture, light, temperature, time_of_day FROM sensor_readings "
+     "WHERE timestamp BETWEEN '2024-01-10 12:00:00' AND '2024-01-10 13:00:00' ORDER BY timestamp",
+     "SELECT timestamp, moisture, light, temperature, time_of_day FROM sensor_readings "
+     "WHERE device_id = 1 AND ts BETWEEN strftime('%s', '2024-01-10 12:00:00') "
+     "AND strftime('%s', '2024-01-10 13:00:00') ORDER BY ts",
+     ()),
+    ("stats date range",
+     "SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings",
+     "SELECT (SELECT timestamp FROM sensor_readings WHERE device_id = 1 ORDER BY ts LIMIT 1), "
+     "(SELECT timestamp FROM sensor_readings WHERE device_id = 1 ORDER BY ts DESC LIMIT 1)",
+     ()),
+    ("latest weather (LIMIT 10)",
+     "SELECT * FROM weather_data ORDER BY date DESC, time DESC LIMIT 10",
+     "SELECT * FROM weather_data WHERE location_id = 1 ORDER BY ts DESC LIMIT 10",
+     ()),
+]
+
+
+def populate(conn: sqlite3.Connection, sensor_rows: int, weather_rows: int):
+    """Fills the version 0 tables with one reading per second and hourly weather"""
+    def readings():
+        for i in range(sensor_rows):
+            dt = START + timedelta(seconds=i)
+            yield (dt.strftime("%Y-%m-%d %H:%M:%S"), i % 90 + 10, i % 80 + 20, i % 15 + 15, dt.hour)
+
+    def weather():
+        for i in range(weather_rows):
+            dt = START + timedelta(hours=i)
+            yield (dt.date().isoformat(), dt.time().isoformat(), 10.0, 60.0, 1013.0, 3.0, 180.0, 0.0, 24000.0)
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO sensor_readings (timestamp, moisture, light, temperature, time_of_day)
+            VALUES (?, ?, ?, ?, ?)
+        ''', readings())
+        conn.executemany('''
+            INSERT INTO weather_data (date, time, temperature, humidity, pressure, wind_speed,
+                                      wind_direction, precipitation, visibility)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', weather())
+
+
+def report(conn: sqlite3.Connection, use_migrated: bool, repeat: int):
+    """Prints query plan and mean latency for every benchmark query"""
+    for label, before_sql, after_sql, params in QUERIES:
+        sql = after_sql if use_migrated else before_sql
+        plan = "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"  {label:<28} {elapsed * 1000:10.3f} ms   plan: {plan}")
+
+
+def main():
+    """Runs the benchmark in a temporary directory"""
+    parser = argparse.ArgumentParser(description="Query plans and latency before/after schema migrations")
+    parser.add_argument('--rows', type=int, default=2000000, help="sensor_readings rows")
+    parser.add_argument('--weather-rows', type=int, default=24 * 365 * 3, help="weather_data rows")
+    parser.add_argument('--repeat', type=int, default=5, help="executions per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "migration.db"))
+        conn.executescript(BASE_SCHEMA)
+
+        start = time.perf_counter()
+        populate(conn, args.rows, args.weather_rows)
+        print(f"Populated {args.rows} readings and {args.weather_rows} weather rows "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        print("Before migration (schema version 0)")
+        report(conn, use_migrated=False, repeat=args.repeat)
+
+        start = time.perf_counter()
+        version = migrate(conn)
+        print(f"Migrated to version {version} in {time.perf_counter() - start:.1f} s")
+
+        print(f"After migration (schema version {version})")
+        report(conn, use_migrated=True, repeat=args.repeat)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Multi-location collection benchmark
+Collects the same range for a growing number of locations from the local stub
+Open-Meteo server, with one request per location and with the locations
+batched into multi-coordinate requests
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from db.combined_database import PlantDatabase
+from meteo_data.backfill import Backfill
+from meteo_data.locations import Location
+from meteo_data.open_meteo_client import OpenMeteoClient
+from meteo_data.stub_server import StubOpenMeteoServer
+
+
+def make_locations(database: PlantDatabase, count: int):
+    """count sites spread over northern Poland, registered in the database"""
+    locations = []
+    for i in range(count):
+        location = Location(f"site-{i}", 52.0 + (i % 10) * 0.25, 16.0 + (i // 10) * 0.25)
+        locations.append(location._replace(id=database.ensure_location(*location[:4])))
+    return locations
+
+
+def main():
+    """Runs both strategies for each location count against a fresh database"""
+    parser = argparse.ArgumentParser(description="Compare per-location and batched weather requests")
+    parser.add_argument('--days', type=int, default=60, help="length of the collected range")
+    parser.add_argument('--locations', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--latency', type=float, default=0.15, help="simulated seconds per response")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    end_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=args.days)
+    print(f"Collecting {args.days} days, {args.latency * 1000:.0f} ms latency, {args.workers} workers")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.locations:
+            for label, per_request in (("one request per location", 1), ("batched", count)):
+                with StubOpenMeteoServer(latency=args.latency) as server, \
+                        PlantDatabase(os.path.join(tmp_dir, f"{count}_{label[0]}.db")) as database, \
+                        OpenMeteoClient(server.forecast_url, server.archive_url,
+                                        pool_size=args.workers) as client:
+                    backfill = Backfill(database, client, make_locations(database, count),
+                                        max_workers=args.workers, locations_per_request=per_request)
+                    result = backfill.run(start_time, end_time)
+                    print(f"  {count:3d} locations, {label:<26} {result.seconds:6.2f} s  "
+                          f"({server.stats()['requests']} requests, {result.new} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Statistics benchmark for PlantDatabase
+Shows get_database_stats latency staying flat as sensor_readings grows,
+compared with the previous full-table aggregate queries
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db.combined_database import PlantDatabase
+
+LEGACY_QUERIES = [
+    'SELECT COUNT(*) FROM sensor_readings',
+    'SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings',
+    'SELECT AVG(moisture), AVG(light), AVG(temperature) FROM sensor_readings',
+]
+
+
+def grow_to(database: PlantDatabase, current: int, target: int, start: datetime = datetime(2024, 1, 1)):
+    """Appends one reading per second until the table holds target rows"""
+    rows = (
+        ((start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"), i % 90 + 10, i % 80 + 20, i % 15 + 15, 12, 1)
+        for i in range(current, target)
+    )
+    started = time.perf_counter()
+    database.save_readings(rows)
+    return time.perf_counter() - started
+
+
+def mean_latency(func, repeat: int) -> float:
+    """Returns the mean latency of func in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    """Runs the benchmark in a temporary directory"""
+    parser = argparse.ArgumentParser(description="get_database_stats latency versus table size")
+    parser.add_argument('--sizes', default="1000,100000,1000000",
+                        help="comma-separated row counts, measured in increasing order")
+    parser.add_argument('--repeat', type=int, default=20, help="executions per measurement")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = PlantDatabase(os.path.join(tmp_dir, "stats.db"))
+        conn = database._connections.get_connection()
+        current = 0
+
+        print(f"{'rows':>12} {'insert rows/s':>14} {'running stats':>14} {'full scan':>12}")
+        for size in sizes:
+            elapsed = grow_to(database, current, size)
+            inserted = size - current
+            current = size
+
+            running = mean_latency(database.get_database_stats, args.repeat)
+            full_scan = mean_latency(lambda: [conn.execute(sql).fetchall() for sql in LEGACY_QUERIES],
+                                     max(1, args.repeat // 10))
+            print(f"{size:>12} {inserted / elapsed:>14.0f} {running:>11.3f} ms {full_scan:>9.1f} ms")
+
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
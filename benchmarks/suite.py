@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite with stored results and regression checks
+
+`run` measures the main database paths against synthetic datasets of each
+size (benchmarks/datasets.py) and writes the results to JSON; `compare`
+checks a result file against a baseline and exits with status 1 when a
+metric got worse by more than the threshold:
+
+    python -m benchmarks.suite run --sizes 10k 1m --output baseline.json
+    python -m benchmarks.suite run --sizes 10k 1m --output current.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.25
+
+Latencies are medians over --repeat calls after one warm-up call; writes
+run on a copy of the dataset, so the cached file stays unchanged.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from db.combined_database import PlantDatabase
+from db.rollups import SENSOR_VALUES, WEATHER_VALUES
+from db.timestamps import from_epoch, to_epoch
+from Plant.downsample import downsample_series
+from Plant.readings_pager import ReadingsPager
+from meteo_data.stub_server import hourly_value
+from .datasets import DATASET_END, DEFAULT_CACHE_DIR, DatasetSpec, get_dataset, parse_count
+
+# Chart ranges of the analytics window (Plant/chart_panel.RANGES, which needs Tk) and its plot width
+CHART_RANGES = {'1d': 86400, '1w': 7 * 86400, '30d': 30 * 86400, '365d': 365 * 86400}
+CHART_POINTS = 700
+
+# Differences below these are measurement noise, whatever the relative change
+NOISE_FLOOR = {'ms': 0.05}
+
+Metric = Dict[str, object]
+
+
+def _latency(func: Callable, repeat: int) -> Metric:
+    """Median and p95 latency of func in milliseconds, after one warm-up call"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {'value': samples[len(samples) // 2], 'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'unit': 'ms', 'better': 'lower'}
+
+
+def _throughput(rows: int, seconds: float) -> Metric:
+    return {'value': rows / seconds, 'unit': 'rows/s', 'better': 'higher'}
+
+
+def measure_reads(database: PlantDatabase, repeat: int) -> Dict[str, Metric]:
+    """Latency of the read paths used by the main window and the analytics window (headless)"""
+    results = {
+        'get_recent_readings': _latency(lambda: database.get_recent_readings(100), repeat),
+        'get_database_stats': _latency(database.get_database_stats, repeat),
+    }
+
+    # Table: row count and first page, then a jump to the middle and a sort change, as ReadingsPager does them
+    def first_page():
+        pager = ReadingsPager(database, visible_rows=30)
+        pager.reload()
+        return pager
+
+    results['analytics.first_page'] = _latency(first_page, repeat)
+    pager = first_page()
+    # Alternating far jumps, so every call seeks instead of staying in place
+    positions = iter([0.25, 0.75] * (repeat + 1))
+    results['analytics.seek'] = _latency(lambda: pager.seek(next(positions)), repeat)
+
+    def sort_moisture():
+        # What AnalyticsWindow.sort_column runs on the worker thread
+        sorted_pager = pager.copy()
+        sorted_pager.order_by, sorted_pager.descending = 'moisture', False
+        sorted_pager.reload()
+        return sorted_pager
+
+    results['analytics.sort_moisture'] = _latency(sort_moisture, repeat)
+
+    # Charts: series query plus downsampling to the plot width, for each range ending at the newest data
+    end_ts = to_epoch(DATASET_END)
+    for name, seconds in CHART_RANGES.items():
+        start, end = from_epoch(end_ts - seconds), from_epoch(end_ts)
+
+        def load_chart():
+            resolution, rows = database.get_sensor_series(start, end, max_points=4 * CHART_POINTS)
+            downsample_series(resolution, rows, SENSOR_VALUES, CHART_POINTS)
+            weather_resolution, weather = database.get_weather_series(start, end, 4 * CHART_POINTS)
+            downsample_series(weather_resolution, weather, WEATHER_VALUES, CHART_POINTS)
+
+        results[f'analytics.chart_{name}'] = _latency(load_chart, repeat)
+    return results
+
+
+def measure_writes(path: str, save_count: int) -> Dict[str, Metric]:
+    """Write throughput on a copy of the dataset at path"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy = os.path.join(tmp_dir, "writes.db")
+        shutil.copyfile(path, copy)
+        with PlantDatabase(copy) as database:
+            # One transaction per reading, as without the write buffer
+            started = time.perf_counter()
+            for i in range(save_count):
+                database.save_reading(40 + i % 50, 50, 21, 12)
+            results['save_reading'] = _throughput(save_count, time.perf_counter() - started)
+
+            # Queued readings committed in groups by the write-behind buffer
+            database.enable_write_buffer()
+            started = time.perf_counter()
+            for i in range(save_count * 10):
+                database.save_reading(40 + i % 50, 50, 21, 12)
+            database.flush()
+            results['save_reading.buffered'] = _throughput(save_count * 10, time.perf_counter() - started)
+            database.disable_write_buffer()
+
+            # A month of new hours after the dataset, then the same hours revised
+            records = [_weather_record(DATASET_END + timedelta(hours=hour)) for hour in range(1, 31 * 24 + 1)]
+            started = time.perf_counter()
+            database.store_weather_data(records)
+            results['store_weather_data.new'] = _throughput(len(records), time.perf_counter() - started)
+            for record in records:
+                record['temp'] += 0.5
+            started = time.perf_counter()
+            database.store_weather_data(records, update_changed=True)
+            results['store_weather_data.update'] = _throughput(len(records), time.perf_counter() - started)
+    return results
+
+
+def _weather_record(moment: datetime) -> dict:
+    """A record in the form store_weather_data takes"""
+    return {
+        'date': moment.strftime('%Y-%m-%d'), 'time': moment.strftime('%H:%M:%S'),
+        'temp': hourly_value('temperature_2m', moment), 'rhum': hourly_value('relative_humidity_2m', moment),
+        'pres': hourly_value('surface_pressure', moment), 'wspd': hourly_value('wind_speed_10m', moment),
+        'wdir': hourly_value('wind_direction_10m', moment), 'prcp': hourly_value('precipitation', moment),
+        'visibility': hourly_value('visibility', moment),
+    }
+
+
+def run(sizes: List[str], plants: int, repeat: int, save_count: int, cache_dir: str) -> dict:
+    """Measures every size and returns the results document"""
+    results = {}
+    for size in sizes:
+        spec = DatasetSpec(parse_count(size), plants)
+        path = get_dataset(spec, cache_dir)
+        print(f"{size}: {spec.readings} readings, {spec.weather_hours} weather hours")
+        with PlantDatabase(path) as database:
+            measured = measure_reads(database, repeat)
+        measured.update(measure_writes(path, save_count))
+        for name, metric in measured.items():
+            print(f"  {name:<28} {metric['value']:>12.3f} {metric['unit']}")
+        results[size] = measured
+    return {'meta': _environment(repeat, plants), 'results': results}
+
+
+def _environment(repeat: int, plants: int) -> dict:
+    """Where the results were measured; comparisons across machines are only indicative"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+        'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(), 'cpus': os.cpu_count(), 'repeat': repeat, 'plants': plants,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Prints a comparison table and returns the regressed metrics (size/name)"""
+    regressions = []
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for size, metrics in current['results'].items():
+        for name, metric in metrics.items():
+            key = f"{size}/{name}"
+            base = baseline['results'].get(size, {}).get(name)
+            if base is None:
+                print(f"{key:<40} {'-':>12} {metric['value']:>12.3f} {'new':>8}")
+                continue
+            change = (metric['value'] - base['value']) / base['value'] if base['value'] else 0.0
+            worse = change if metric['better'] == 'lower' else -change
+            noise = abs(metric['value'] - base['value']) < NOISE_FLOOR.get(metric['unit'], 0.0)
+            status = ""
+            if worse > threshold and not noise:
+                status = "  REGRESSION"
+                regressions.append(key)
+            print(f"{key:<40} {base['value']:>12.3f} {metric['value']:>12.3f} {change:>+7.0%} {metric['unit']}{status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for PlantDatabase")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="measure and write results to JSON")
+    run_parser.add_argument('--sizes', nargs='+', default=['10k', '1m'], help="readings per dataset, e.g. 10k 1m 10m")
+    run_parser.add_argument('--plants', type=int, default=1)
+    run_parser.add_argument('--repeat', type=int, default=20, help="calls per latency measurement")
+    run_parser.add_argument('--save-count', type=int, default=2000, help="unbuffered save_reading calls")
+    run_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="where datasets are kept")
+    run_parser.add_argument('--output', default="benchmarks/results/latest.json")
+
+    compare_parser = commands.add_parser('compare', help="fail on regressions against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.25,
+                                help="largest accepted relative slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('db.migrations').setLevel(logging.WARNING)
+
+    if args.command == 'run':
+        document = run(args.sizes, args.plants, args.repeat, args.save_count, args.cache_dir)
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=1)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Weather conversion benchmark
+Compares the previous DataFrame/iterrows conversion of an Open-Meteo response
+with the columnar hourly_rows path, on a 92-day response
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from db.combined_database import PlantDatabase
+from meteo_data.conversion import HOURLY_VARIABLES, hourly_rows
+
+
+def make_response(past_days: int, forecast_days: int = 1, seed: int = 1) -> dict:
+    """Builds an Open-Meteo-shaped response, round-tripped through JSON like a real one"""
+    rng = random.Random(seed)
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=past_days)
+    hours = (past_days + forecast_days) * 24
+    hourly = {'time': [(start + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M') for i in range(hours)]}
+    for name in HOURLY_VARIABLES:
+        hourly[name] = [round(rng.uniform(0, 100), 1) for _ in range(hours)]
+    return json.loads(json.dumps({'latitude': 53.12, 'longitude': 18.0, 'hourly': hourly}))
+
+
+def legacy_records(hourly: dict, start_time: datetime, end_time: datetime) -> list:
+    """Previous collect_data_range conversion: DataFrame, iterrows and one dict per row"""
+    df = pd.DataFrame({
+        'time': pd.to_datetime(hourly['time']),
+        'temp': hourly['temperature_2m'],
+        'rhum': hourly['relative_humidity_2m'],
+        'pres': hourly['surface_pressure'],
+        'wspd': hourly['wind_speed_10m'],
+        'wdir': hourly['wind_direction_10m'],
+        'prcp': hourly['precipitation'],
+        'visibility': hourly['visibility']
+    })
+    df = df[(df['time'] >= start_time) & (df['time'] <= end_time)]
+    records = []
+    for _, row in df.iterrows():
+        dt = row['time'].to_pydatetime()
+        records.append({
+            'date': dt.date().isoformat(), 'time': dt.time().isoformat(),
+            'temp': row['temp'], 'rhum': row['rhum'], 'pres': row['pres'], 'wspd': row['wspd'],
+            'wdir': row['wdir'], 'prcp': row['prcp'], 'visibility': row['visibility']
+        })
+    return records
+
+
+def pandas_vectorized_rows(hourly: dict, start_time: datetime, end_time: datetime) -> list:
+    """Vectorized pandas variant: boolean mask and dt.strftime"""
+    df = pd.DataFrame({'time': pd.to_datetime(hourly['time']),
+                       **{name: hourly[name] for name in HOURLY_VARIABLES}})
+    df = df[(df['time'] >= start_time) & (df['time'] <= end_time)]
+    return list(zip(df['time'].dt.strftime('%Y-%m-%d'), df['time'].dt.strftime('%H:%M:%S'),
+                    *(df[name].tolist() for name in HOURLY_VARIABLES)))
+
+
+def numpy_vectorized_rows(hourly: dict, start_time: datetime, end_time: datetime) -> list:
+    """Vectorized numpy variant: datetime64 mask and datetime_as_string"""
+    times = np.array(hourly['time'], dtype='datetime64[s]')
+    mask = (times >= np.datetime64(start_time, 's')) & (times <= np.datetime64(end_time, 's'))
+    texts = np.datetime_as_string(times[mask], unit='s').tolist()
+    return list(zip([text[:10] for text in texts], [text[11:] for text in texts],
+                    *(np.asarray(hourly[name])[mask].tolist() for name in HOURLY_VARIABLES)))
+
+
+def best_of(func, repeat: int) -> float:
+    """Best wall time of repeat runs in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    """Times conversion alone and conversion plus bulk insert"""
+    parser = argparse.ArgumentParser(description="Compare weather response conversions")
+    parser.add_argument('--days', type=int, default=92, help="past days in the response")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    hourly = make_response(args.days)['hourly']
+    end_time = datetime.now()
+    start_time = end_time - timedelta(days=args.days)
+
+    expected = [tuple(record.values()) for record in legacy_records(hourly, start_time, end_time)]
+    variants = [
+        ("DataFrame + iterrows + dicts", lambda: legacy_records(hourly, start_time, end_time)),
+        ("pandas vectorized", lambda: pandas_vectorized_rows(hourly, start_time, end_time)),
+        ("numpy vectorized", lambda: numpy_vectorized_rows(hourly, start_time, end_time)),
+        ("hourly_rows (columnar)", lambda: list(hourly_rows(hourly, start_time, end_time))),
+    ]
+    for label, func in variants[1:]:
+        assert func() == expected, f"{label} differs from the previous conversion"
+
+    print(f"{len(hourly['time'])} hours in the response, {len(expected)} in range")
+    print("Conversion only:")
+    baseline = None
+    for label, func in variants:
+        elapsed = best_of(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"  {label:<30} {elapsed:8.2f} ms  ({baseline / elapsed:6.1f}x)")
+
+    print("Conversion + bulk insert into an empty database:")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def store(path, convert_and_store):
+            database = PlantDatabase(os.path.join(tmp_dir, path))
+            start = time.perf_counter()
+            convert_and_store(database)
+            elapsed = (time.perf_counter() - start) * 1000
+            database.close()
+            return elapsed
+
+        legacy = store("legacy.db", lambda database: database.store_weather_data(
+            legacy_records(hourly, start_time, end_time), update_changed=True))
+        columnar = store("columnar.db", lambda database: database.upsert_weather_data(
+            hourly_rows(hourly, start_time, end_time), update_changed=True))
+        print(f"  {'DataFrame + store_weather_data':<30} {legacy:8.2f} ms")
+        print(f"  {'hourly_rows + upsert':<30} {columnar:8.2f} ms  ({legacy / columnar:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Weather upsert benchmark for PlantDatabase
+Compares the previous per-record SELECT + INSERT loop with the set-based bulk upsert
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db.combined_database import PlantDatabase
+
+
+def make_records(count: int, start: datetime = datetime(2024, 1, 1), offset: float = 0.0):
+    """Generates hourly weather records in the collector's dict format"""
+    records = []
+    for i in range(count):
+        dt = start + timedelta(hours=i)
+        records.append({
+            'date': dt.date().isoformat(),
+            'time': dt.time().isoformat(),
+            'temp': 10.0 + (i % 24) * 0.5 + offset,
+            'rhum': 60.0 + (i % 10),
+            'pres': 1013.0,
+            'wspd': 3.5,
+            'wdir': 180.0,
+            'prcp': 0.0,
+            'visibility': 24000.0
+        })
+    return records
+
+
+def store_weather_data_per_record(db_path: str, records):
+    """Previous store_weather_data behaviour: one SELECT and one INSERT per record"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            cursor = conn.cursor()
+            new_records_count = 0
+            duplicate_count = 0
+            for record in records:
+                cursor.execute('''
+                    SELECT COUNT(*) FROM weather_data 
+                    WHERE date = ? AND time = ?
+                ''', (record['date'], record['time']))
+                if cursor.fetchone()[0] == 0:
+                    cursor.execute('''
+                        INSERT INTO weather_data 
+                        (date, time, temperature, humidity, pressure, wind_speed, 
+                         wind_direction, precipitation, visibility)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (record['date'], record['time'], record.get('temp'), record.get('rhum'),
+                          record.get('pres'), record.get('wspd'), record.get('wdir'),
+                          record.get('prcp'), record.get('visibility')))
+                    new_records_count += 1
+                else:
+                    duplicate_count += 1
+            return new_records_count, duplicate_count
+    finally:
+        conn.close()
+
+
+def measure(label: str, func):
+    """Runs func once and prints its duration and result"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<36} {elapsed * 1000:9.1f} ms  -> {result}")
+    return elapsed
+
+
+def main():
+    """Runs the benchmark in a temporary directory"""
+    parser = argparse.ArgumentParser(description="Compare per-record and bulk weather upserts")
+    parser.add_argument('--records', type=int, default=10000, help="records per batch")
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    revised = [
+        (r['date'], r['time'], r['temp'], r['rhum'], r['pres'], r['wspd'], r['wdir'], r['prcp'], r['visibility'])
+        for r in make_records(args.records, offset=0.1)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, "legacy.db")
+        PlantDatabase(legacy_path).close()
+        database = PlantDatabase(os.path.join(tmp_dir, "bulk.db"))
+
+        print(f"Batch of {args.records} new records")
+        legacy = measure("per-record SELECT + INSERT", lambda: store_weather_data_per_record(legacy_path, records))
+        bulk = measure("bulk INSERT OR IGNORE", lambda: database.store_weather_data(records))
+        print(f"  speedup: {legacy / bulk:.1f}x")
+
+        print("Same batch again (all duplicates)")
+        legacy = measure("per-record SELECT + INSERT", lambda: store_weather_data_per_record(legacy_path, records))
+        bulk = measure("bulk INSERT OR IGNORE", lambda: database.store_weather_data(records))
+        print(f"  speedup: {legacy / bulk:.1f}x")
+
+        print("Revised values -> (new, updated, unchanged)")
+        measure("bulk upsert, all rows changed", lambda: database.upsert_weather_data(revised, update_changed=True))
+        measure("bulk upsert, no rows changed", lambda: database.upsert_weather_data(revised, update_changed=True))
+
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
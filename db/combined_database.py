@@ -1,22 +1,55 @@
-import sqlite3
+import math
 import os
 from datetime import datetime
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
+
+from metrics.registry import timed
+
+from .connection import ConnectionManager
+from .coverage import rebuild_weather_coverage, refresh_weather_coverage
+from .migrations import migrate
+from .retention import apply_retention, enable_incremental_vacuum, incremental_vacuum, retention_report
+from .rollups import (SENSOR_RESOLUTIONS, SENSOR_VALUES, WEATHER_RESOLUTIONS, WEATHER_VALUES,
+                      refresh_weather_rollups)
+from .timestamps import from_epoch, to_epoch
+from .write_buffer import Durability, ReadingWriteBuffer, WriteBufferFull
+
+# Location of weather rows stored without one (Bydgoszcz, created by migration 8)
+DEFAULT_LOCATION_ID = 1
+
+# Device of readings stored without one (the original single plant, created by migration 9)
+DEFAULT_DEVICE_ID = 1
 
 
 class PlantDatabase:
     """Class for managing database with plant and weather data"""
     
-    def __init__(self, db_path: str = "data/plant_data.db"):
+    def __init__(self, db_path: str = "data/plant_data.db", **connection_options):
         self.db_path = db_path
+        # Ensure the data directory exists before the first connection is opened
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._connections = ConnectionManager(self.db_path, **connection_options)
+        self._write_buffer: Optional[ReadingWriteBuffer] = None
+        # IMMEDIATE durability: direct reading commits are fsync'd (synchronous=FULL)
+        self._synchronous_readings = False
         self.init_database()
     
+    def close(self):
+        """Flushes buffered readings and closes all pooled connections"""
+        self.disable_write_buffer()
+        self._connections.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def init_database(self):
         """Initializes database and creates tables if they don't exist"""
-        # Ensure the data directory exists
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
             
             # Plant sensor readings table
@@ -50,165 +83,533 @@ class PlantDatabase:
             ''')
             
             conn.commit()
+            
+            # Bring older database files up to the current schema version
+            migrate(conn)
+    
+    def enable_write_buffer(self, durability: Durability = Durability.GROUP, **buffer_options):
+        """Switches save_reading to buffered ingest with the given durability level"""
+        self.disable_write_buffer()
+        self._synchronous_readings = durability == Durability.IMMEDIATE
+        if durability != Durability.IMMEDIATE:
+            self._write_buffer = ReadingWriteBuffer(self, durability, **buffer_options)
+            self._write_buffer.start()
     
-    def save_reading(self, moisture: int, light: int, temperature: int, time_of_day: int):
-        """Saves sensor reading to database"""
+    def disable_write_buffer(self):
+        """Flushes and stops the write buffer; save_reading commits directly again"""
+        if self._write_buffer is not None:
+            self._write_buffer.close()
+            self._write_buffer = None
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all buffered readings are committed"""
+        if self._write_buffer is None:
+            return True
+        return self._write_buffer.flush(timeout)
+    
+    def save_reading(self, moisture: int, light: int, temperature: int, time_of_day: int,
+                     device_id: int = DEFAULT_DEVICE_ID):
+        """Saves sensor reading to database (queued when the write buffer is enabled)"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row = (timestamp, moisture, light, temperature, time_of_day, device_id)
         
-        with sqlite3.connect(self.db_path) as conn:
+        if self._write_buffer is not None:
+            self._write_buffer.put(row)
+        else:
+            self.save_readings([row])
+    
+    @timed('db.queue_readings', rows=lambda count: count)
+    def queue_readings(self, rows: Iterable[Tuple], timeout: Optional[float] = None) -> int:
+        """Queues (timestamp, moisture, light, temperature, time_of_day, device_id) rows without waiting for the commit
+        
+        Returns the number of rows accepted; the rest did not fit in the write
+        buffer within timeout. Without a write buffer the rows are saved directly.
+        """
+        if self._write_buffer is None:
+            rows = list(rows)
+            self.save_readings(rows)
+            return len(rows)
+        accepted = 0
+        try:
+            for row in rows:
+                self._write_buffer.put(row, timeout)
+                accepted += 1
+        except WriteBufferFull:
+            pass
+        return accepted
+    
+    @timed('db.save_readings', rows=lambda count: count)
+    def save_readings(self, rows: Iterable[Tuple]) -> int:
+        """Saves (timestamp, moisture, light, temperature, time_of_day, device_id) rows in one
+        transaction and returns their number"""
+        conn = self._connections.get_connection()
+        if self._synchronous_readings:
+            conn.execute("PRAGMA synchronous = FULL")
+        try:
+            with conn:
+                cursor = conn.executemany('''
+                    INSERT INTO sensor_readings (device_id, timestamp, ts, moisture, light, temperature, time_of_day)
+                    VALUES (?6, ?1, CAST(strftime('%s', ?1) AS INTEGER), ?2, ?3, ?4, ?5)
+                ''', rows)
+        finally:
+            if self._synchronous_readings:
+                conn.execute(f"PRAGMA synchronous = {self._connections.pragmas['synchronous']}")
+        return cursor.rowcount
+    
+    @timed('db.get_all_readings', rows=len)
+    def get_all_readings(self, device_id: int = DEFAULT_DEVICE_ID) -> List[Tuple]:
+        """Gets all readings of a device from database"""
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO sensor_readings (timestamp, moisture, light, temperature, time_of_day)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (timestamp, moisture, light, temperature, time_of_day))
-            conn.commit()
+                SELECT timestamp, moisture, light, temperature, time_of_day
+                FROM sensor_readings
+                WHERE device_id = ?
+                ORDER BY ts DESC, id DESC
+            ''', (device_id,))
+            return cursor.fetchall()
     
-    def get_all_readings(self) -> List[Tuple]:
-        """Gets all readings from database"""
-        with sqlite3.connect(self.db_path) as conn:
+    @timed('db.get_recent_readings', rows=len)
+    def get_recent_readings(self, limit: int = 100, device_id: int = DEFAULT_DEVICE_ID) -> List[Tuple]:
+        """Gets last N readings of a device from database"""
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT timestamp, moisture, light, temperature, time_of_day
                 FROM sensor_readings
-                ORDER BY timestamp DESC
-            ''')
+                WHERE device_id = ?
+                ORDER BY ts DESC, id DESC
+                LIMIT ?
+            ''', (device_id, limit))
+            return cursor.fetchall()
+    
+    # Columns get_readings_page can order by; each is indexed after device_id and before id
+    SORTABLE_COLUMNS = ('ts', 'moisture', 'light', 'temperature', 'time_of_day')
+    
+    @timed('db.get_readings_page', rows=len)
+    def get_readings_page(self, limit: int, after: Optional[Tuple] = None, descending: bool = True,
+                          order_by: str = 'ts', device_id: int = DEFAULT_DEVICE_ID) -> List[Tuple]:
+        """Gets up to limit readings of a device that follow the (order_by value, id) key (keyset pagination)
+        
+        Rows are (id, ts, timestamp, moisture, light, temperature, time_of_day);
+        pass the (value, id) of the last row of a page to get the next page.
+        id breaks ties, so the order is stable.
+        """
+        if order_by not in self.SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort readings by {order_by!r}")
+        
+        comparison, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+        where = f"AND ({order_by}, id) {comparison} (?, ?)" if after is not None else ""
+        params = (device_id, *after, limit) if after is not None else (device_id, limit)
+        
+        with self._connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, ts, timestamp, moisture, light, temperature, time_of_day
+                FROM sensor_readings
+                WHERE device_id = ? {where}
+                ORDER BY {order_by} {direction}, id {direction}
+                LIMIT ?
+            ''', params)
             return cursor.fetchall()
     
-    def get_recent_readings(self, limit: int = 100) -> List[Tuple]:
-        """Gets last N readings from database"""
-        with sqlite3.connect(self.db_path) as conn:
+    @timed('db.get_value_bounds')
+    def get_value_bounds(self, column: str = 'ts',
+                         device_id: int = DEFAULT_DEVICE_ID) -> Tuple[Optional[int], Optional[int]]:
+        """Returns (min, max) of a sortable column of a device using its index"""
+        if column not in self.SORTABLE_COLUMNS:
+            raise ValueError(f"No index for column {column!r}")
+        if column == 'ts':
+            return self.get_time_bounds(device_id)
+        
+        with self._connections.transaction() as conn:
+            # Two lookups at the ends of the device's range of the (device_id, column) index
+            return conn.execute(f'''
+                SELECT (SELECT {column} FROM sensor_readings WHERE device_id = ?1 ORDER BY {column} LIMIT 1),
+                       (SELECT {column} FROM sensor_readings WHERE device_id = ?1 ORDER BY {column} DESC LIMIT 1)
+            ''', (device_id,)).fetchone()
+    
+    def get_time_bounds(self, device_id: int = DEFAULT_DEVICE_ID) -> Tuple[Optional[int], Optional[int]]:
+        """Returns the (min_ts, max_ts) of a device's readings in constant time"""
+        with self._connections.transaction() as conn:
+            row = conn.execute('SELECT min_ts, max_ts FROM sensor_stats WHERE device_id = ?',
+                               (device_id,)).fetchone()
+            return (row[0], row[1]) if row else (None, None)
+    
+    @timed('db.get_readings_between', rows=len)
+    def get_readings_between(self, start: datetime, end: datetime,
+                             device_id: int = DEFAULT_DEVICE_ID) -> List[Tuple]:
+        """Gets readings of a device with start <= time <= end, oldest first"""
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT timestamp, moisture, light, temperature, time_of_day
                 FROM sensor_readings
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (limit,))
+                WHERE device_id = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts
+            ''', (device_id, to_epoch(start), to_epoch(end)))
             return cursor.fetchall()
     
+    @timed('db.get_sensor_series', rows=lambda series: len(series[1]))
+    def get_sensor_series(self, start: datetime, end: datetime, max_points: int = 1000,
+                          device_id: int = DEFAULT_DEVICE_ID) -> Tuple[int, List[Tuple]]:
+        """Returns (resolution, rows) for the sensor readings of a device between start and end
+        
+        Uses raw rows when at most max_points exist in the range, otherwise the
+        finest rollup resolution (60, 3600 or 86400 seconds) that fits in
+        max_points buckets. Resolution 0 means raw rows. Rows are
+        (ts, count, min, avg, max, last for moisture, light and temperature).
+        """
+        value_columns = ', '.join(f'{name}, {name}, {name}, {name}' for name in SENSOR_VALUES)
+        rollup_columns = ', '.join(
+            f'min_{name}, CAST(sum_{name} AS REAL) / record_count, max_{name}, last_{name}'
+            for name in SENSOR_VALUES
+        )
+        return self._get_series(
+            start, end, max_points,
+            raw_sql=f'''
+                SELECT ts, 1, {value_columns}
+                FROM sensor_readings
+                WHERE device_id = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts, id
+            ''',
+            raw_table='sensor_readings', rollup_table='sensor_rollups', rollup_columns=rollup_columns,
+            resolutions=SENSOR_RESOLUTIONS,
+            scope=('device_id', device_id)
+        )
+    
+    @timed('db.get_weather_series', rows=lambda series: len(series[1]))
+    def get_weather_series(self, start: datetime, end: datetime, max_points: int = 1000,
+                           location_id: int = DEFAULT_LOCATION_ID) -> Tuple[int, List[Tuple]]:
+        """Returns (resolution, rows) for weather data of a location between start and end
+        
+        Same selection rule as get_sensor_series, with day and week rollups.
+        Rows are (ts, count, min, avg, max, last for temperature, humidity,
+        pressure, wind_speed and precipitation).
+        """
+        value_columns = ', '.join(f'{name}, {name}, {name}, {name}' for name in WEATHER_VALUES)
+        rollup_columns = ', '.join(
+            f'min_{name}, avg_{name}, max_{name}, last_{name}' for name in WEATHER_VALUES
+        )
+        return self._get_series(
+            start, end, max_points,
+            raw_sql=f'''
+                SELECT ts, 1, {value_columns}
+                FROM weather_data
+                WHERE location_id = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts
+            ''',
+            raw_table='weather_data', rollup_table='weather_rollups', rollup_columns=rollup_columns,
+            resolutions=WEATHER_RESOLUTIONS,
+            scope=('location_id', location_id)
+        )
+    
+    def _get_series(self, start: datetime, end: datetime, max_points: int, raw_sql: str, raw_table: str,
+                    rollup_table: str, rollup_columns: str, resolutions: Tuple[int, ...],
+                    scope: Optional[Tuple[str, int]] = None) -> Tuple[int, List[Tuple]]:
+        """Picks the finest resolution with at most max_points points and reads it
+
+        scope is an optional (column, value) pair, e.g. ('device_id', 1), that
+        restricts both raw_table and rollup_table; raw_sql, which reads
+        raw_table, then takes the value as its first parameter.
+        """
+        start_ts, end_ts = to_epoch(start), to_epoch(end)
+        scope_sql = f"{scope[0]} = ? AND " if scope else ''
+        scope_params = (scope[1],) if scope else ()
+        
+        with self._connections.transaction() as conn:
+            # Counting is capped at max_points + 1, so probing costs O(max_points)
+            raw_count = conn.execute(f'''
+                SELECT COUNT(*) FROM (SELECT 1 FROM {raw_table} WHERE {scope_sql}ts BETWEEN ? AND ? LIMIT ?)
+            ''', scope_params + (start_ts, end_ts, max_points + 1)).fetchone()[0]
+            if raw_count <= max_points and not self._rolled_up_before_raw(
+                    conn, raw_table, rollup_table, resolutions[0], scope_sql, scope_params, start_ts, end_ts):
+                return 0, conn.execute(raw_sql, scope_params + (start_ts, end_ts)).fetchall()
+            
+            for resolution in resolutions:
+                first_bucket = start_ts - start_ts % resolution
+                bucket_count = conn.execute(f'''
+                    SELECT COUNT(*) FROM (
+                        SELECT 1 FROM {rollup_table}
+                        WHERE {scope_sql}resolution = ? AND bucket BETWEEN ? AND ?
+                        LIMIT ?
+                    )
+                ''', scope_params + (resolution, first_bucket, end_ts, max_points + 1)).fetchone()[0]
+                # The coarsest resolution is used even if it still has too many buckets
+                if bucket_count <= max_points or resolution == resolutions[-1]:
+                    rows = conn.execute(f'''
+                        SELECT bucket, record_count, {rollup_columns}
+                        FROM {rollup_table}
+                        WHERE {scope_sql}resolution = ? AND bucket BETWEEN ? AND ?
+                        ORDER BY bucket
+                    ''', scope_params + (resolution, first_bucket, end_ts)).fetchall()
+                    return resolution, rows
+    
+    @staticmethod
+    def _rolled_up_before_raw(conn, raw_table: str, rollup_table: str, resolution: int, scope_sql: str,
+                              scope_params: tuple, start_ts: int, end_ts: int) -> bool:
+        """Whether the range has rollup buckets older than the oldest raw row (raw rows deleted by retention)"""
+        oldest = conn.execute(f'''
+            SELECT ts FROM {raw_table} WHERE {scope_sql}ts IS NOT NULL ORDER BY ts LIMIT 1
+        ''', scope_params).fetchone()
+        raw_start = oldest[0] - oldest[0] % resolution if oldest else end_ts + 1
+        if raw_start <= start_ts:
+            return False
+        return conn.execute(f'''
+            SELECT 1 FROM {rollup_table}
+            WHERE {scope_sql}resolution = ? AND bucket >= ? AND bucket < ? LIMIT 1
+        ''', scope_params + (resolution, start_ts - start_ts % resolution,
+                             min(raw_start, end_ts + 1))).fetchone() is not None
+    
     def clear_database(self):
         """Clears all data from database"""
-        with sqlite3.connect(self.db_path) as conn:
+        # Commit queued readings first so they don't reappear after the clear
+        self.flush()
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM sensor_readings')
+            cursor.execute('DELETE FROM sensor_rollups')
+            cursor.execute('DELETE FROM sensor_stats')
             conn.commit()
     
-    def get_database_stats(self) -> dict:
-        """Returns database statistics"""
-        with sqlite3.connect(self.db_path) as conn:
+    def apply_retention(self, policy: dict, stop=None) -> dict:
+        """Deletes rows older than the max age in days per table of policy, in short batches (see db/retention.py)"""
+        try:
+            return apply_retention(self._connections.get_connection(), policy, stop=stop)
+        except Exception as e:
+            raise Exception(f"Error applying retention: {e}")
+    
+    def get_retention_report(self, policy: dict) -> dict:
+        """Rows and pages apply_retention would delete (dry run)"""
+        return retention_report(self._connections.get_connection(), policy)
+    
+    def incremental_vacuum(self, max_pages: Optional[int] = None, stop=None) -> int:
+        """Hands free pages back to the file system in small steps; returns the pages freed"""
+        return incremental_vacuum(self._connections.get_connection(), max_pages, stop=stop)
+    
+    def enable_incremental_vacuum(self) -> bool:
+        """Converts an older file to auto_vacuum=INCREMENTAL with one full VACUUM (blocks writers)"""
+        self.flush()
+        return enable_incremental_vacuum(self._connections.get_connection())
+    
+    def rebuild_stats(self):
+        """Recomputes the running aggregates of every device from sensor_readings (repairs drift)"""
+        with self._connections.transaction() as conn:
+            conn.execute('DELETE FROM sensor_stats')
+            conn.execute('''
+                INSERT INTO sensor_stats
+                SELECT device_id, COUNT(*),
+                       SUM(moisture), SUM(light), SUM(temperature),
+                       SUM(moisture * moisture), SUM(light * light), SUM(temperature * temperature),
+                       MIN(ts), MAX(ts),
+                       (SELECT timestamp FROM sensor_readings AS r
+                        WHERE r.device_id = s.device_id ORDER BY ts LIMIT 1),
+                       (SELECT timestamp FROM sensor_readings AS r
+                        WHERE r.device_id = s.device_id ORDER BY ts DESC LIMIT 1)
+                FROM sensor_readings AS s
+                GROUP BY device_id
+            ''')
+    
+    @timed('db.get_database_stats')
+    def get_database_stats(self, device_id: int = DEFAULT_DEVICE_ID) -> dict:
+        """Returns statistics of a device's readings from the running aggregates (constant time)"""
+        with self._connections.transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM sensor_readings')
-            total_records = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT record_count, sum_moisture, sum_light, sum_temperature,
+                       sumsq_moisture, sumsq_light, sumsq_temperature,
+                       min_timestamp, max_timestamp
+                FROM sensor_stats
+                WHERE device_id = ?
+            ''', (device_id,))
+            row = cursor.fetchone()
             
-            if total_records > 0:
-                cursor.execute('''
-                    SELECT MIN(timestamp), MAX(timestamp)
-                    FROM sensor_readings
-                ''')
-                min_date, max_date = cursor.fetchone()
+            if row and row[0] > 0:
+                total_records = row[0]
+                sums = dict(zip(('moisture', 'light', 'temperature'), row[1:4]))
+                sums_of_squares = dict(zip(('moisture', 'light', 'temperature'), row[4:7]))
+                min_date, max_date = row[7], row[8]
                 
-                cursor.execute('''
-                    SELECT AVG(moisture), AVG(light), AVG(temperature)
-                    FROM sensor_readings
-                ''')
-                avg_moisture, avg_light, avg_temp = cursor.fetchone()
+                averages = {}
+                std_devs = {}
+                for name in sums:
+                    mean = sums[name] / total_records
+                    # Population variance; clamp tiny negative values from rounding
+                    variance = max(sums_of_squares[name] / total_records - mean * mean, 0.0)
+                    averages[name] = round(mean, 1)
+                    std_devs[name] = round(math.sqrt(variance), 1)
                 
                 return {
                     'total_records': total_records,
                     'date_range': (min_date, max_date),
-                    'averages': {
-                        'moisture': round(avg_moisture, 1) if avg_moisture else 0,
-                        'light': round(avg_light, 1) if avg_light else 0,
-                        'temperature': round(avg_temp, 1) if avg_temp else 0
-                    }
+                    'averages': averages,
+                    'std_devs': std_devs
                 }
             else:
                 return {
                     'total_records': 0,
                     'date_range': (None, None),
-                    'averages': {'moisture': 0, 'light': 0, 'temperature': 0}
+                    'averages': {'moisture': 0, 'light': 0, 'temperature': 0},
+                    'std_devs': {'moisture': 0, 'light': 0, 'temperature': 0}
                 }
     
+    def get_devices(self) -> List[Tuple]:
+        """Returns (id, name, record_count, last_timestamp) of every registered device"""
+        with self._connections.transaction() as conn:
+            return conn.execute('''
+                SELECT d.id, d.name, COALESCE(s.record_count, 0), s.max_timestamp
+                FROM devices AS d
+                LEFT JOIN sensor_stats AS s ON s.device_id = d.id
+                ORDER BY d.id
+            ''').fetchall()
+    
+    def set_device_name(self, device_id: int, name: str):
+        """Registers a device or renames it (devices are also registered by their first reading)"""
+        try:
+            with self._connections.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO devices (id, name) VALUES (?, ?)
+                    ON CONFLICT (id) DO UPDATE SET name = excluded.name
+                ''', (device_id, name))
+                
+        except Exception as e:
+            raise Exception(f"Error saving device {device_id}: {e}")
+    
     # Weather data methods
-    def store_weather_data(self, records):
-        """Store weather data in SQLite database, preventing duplicates"""
+    def store_weather_data(self, records, update_changed: bool = False, location_id: int = DEFAULT_LOCATION_ID):
+        """Store weather data in SQLite database, preventing duplicates
+
+        Returns (new_records_count, updated_count, duplicate_count): rows
+        rewritten because update_changed is set and a value differed are
+        counted as updated, not as duplicates.
+        """
+        rows = [
+            (
+                record['date'],
+                record['time'],
+                record.get('temp'),
+                record.get('rhum'),
+                record.get('pres'),
+                record.get('wspd'),
+                record.get('wdir'),
+                record.get('prcp'),
+                record.get('visibility')
+            )
+            for record in records
+        ]
+        return self.upsert_weather_data(rows, update_changed, location_id)
+    
+    @timed('db.upsert_weather_data', rows=sum)
+    def upsert_weather_data(self, rows, update_changed: bool = False,
+                            location_id: int = DEFAULT_LOCATION_ID) -> Tuple[int, int, int]:
+        """Bulk insert of (date, time, temperature, humidity, pressure, wind_speed,
+        wind_direction, precipitation, visibility) rows of one location.
+
+        Existing (location, date, time) rows are skipped, or overwritten when
+        update_changed is set and any value differs. Returns (new, updated,
+        unchanged) counts.
+        """
+        # Materialized so the rows can be counted and reused for the update pass
+        rows = [tuple(row) + (location_id,) for row in rows]
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._connections.transaction() as conn:
+                # rowcount counts only the statement's own rows, not rows written by triggers
+                new_records_count = conn.executemany('''
+                    INSERT OR IGNORE INTO weather_data 
+                    (location_id, date, time, ts, temperature, humidity, pressure, wind_speed, 
+                     wind_direction, precipitation, visibility)
+                    VALUES (?10, ?1, ?2, CAST(strftime('%s', ?1 || ' ' || ?2) AS INTEGER),
+                            ?3, ?4, ?5, ?6, ?7, ?8, ?9)
+                ''', rows).rowcount
                 
-                new_records_count = 0
-                duplicate_count = 0
+                updated_count = 0
+                if update_changed:
+                    # Only rows whose values actually differ are rewritten
+                    updated_count = conn.executemany('''
+                        UPDATE weather_data
+                        SET temperature = ?3, humidity = ?4, pressure = ?5, wind_speed = ?6,
+                            wind_direction = ?7, precipitation = ?8, visibility = ?9
+                        WHERE location_id = ?10 AND date = ?1 AND time = ?2
+                          AND (temperature IS NOT ?3 OR humidity IS NOT ?4 OR pressure IS NOT ?5
+                               OR wind_speed IS NOT ?6 OR wind_direction IS NOT ?7
+                               OR precipitation IS NOT ?8 OR visibility IS NOT ?9)
+                    ''', rows).rowcount
                 
-                for record in records:
-                    # Check if record already exists
-                    cursor.execute('''
-                        SELECT COUNT(*) FROM weather_data 
-                        WHERE date = ? AND time = ?
-                    ''', (record['date'], record['time']))
-                    
-                    exists = cursor.fetchone()[0] > 0
-                    
-                    if not exists:
-                        cursor.execute('''
-                            INSERT INTO weather_data 
-                            (date, time, temperature, humidity, pressure, wind_speed, 
-                             wind_direction, precipitation, visibility)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            record['date'],
-                            record['time'],
-                            record.get('temp'),
-                            record.get('rhum'),
-                            record.get('pres'),
-                            record.get('wspd'),
-                            record.get('wdir'),
-                            record.get('prcp'),
-                            record.get('visibility')
-                        ))
-                        new_records_count += 1
-                    else:
-                        duplicate_count += 1
+                # Recompute only the rollup buckets and coverage spanned by this batch
+                if rows and new_records_count + updated_count > 0:
+                    first = to_epoch(datetime.fromisoformat(min(f"{row[0]} {row[1]}" for row in rows)))
+                    last = to_epoch(datetime.fromisoformat(max(f"{row[0]} {row[1]}" for row in rows)))
+                    refresh_weather_rollups(conn, location_id, first, last)
+                    if new_records_count > 0:
+                        refresh_weather_coverage(conn, location_id, first, last)
                 
-                conn.commit()
-                return new_records_count, duplicate_count
+                return new_records_count, updated_count, len(rows) - new_records_count - updated_count
                 
         except Exception as e:
             raise Exception(f"Error storing weather data: {e}")
     
-    def get_latest_weather_record_datetime(self):
-        """Get the datetime of the most recent weather record in the database"""
+    def get_latest_weather_record_datetime(self, location_id: int = DEFAULT_LOCATION_ID):
+        """Get the datetime of the most recent weather record of a location"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connections.transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT date, time FROM weather_data 
-                    ORDER BY date DESC, time DESC 
+                    SELECT ts FROM weather_data 
+                    WHERE location_id = ?
+                    ORDER BY ts DESC 
                     LIMIT 1
-                ''')
+                ''', (location_id,))
                 
                 row = cursor.fetchone()
                 
                 if row:
-                    # Combine date and time strings back to datetime
-                    date_str, time_str = row
-                    datetime_str = f"{date_str} {time_str}"
-                    return datetime.fromisoformat(datetime_str)
+                    return from_epoch(row[0])
                 else:
                     return None
                     
         except Exception as e:
             raise Exception(f"Error getting latest weather record datetime: {e}")
     
-    def get_latest_weather_data(self, limit: int = 10):
-        """Retrieve latest weather data from database"""
+    @timed('db.get_weather_coverage', rows=len)
+    def get_weather_coverage(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                             location_id: int = DEFAULT_LOCATION_ID) -> List[Tuple[int, int]]:
+        """Returns the stored [start_ts, end_ts) hour intervals of a location overlapping the given range
+        (default: all)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connections.transaction() as conn:
+                start_ts = start_ts if start_ts is not None else -2 ** 63
+                end_ts = end_ts if end_ts is not None else 2 ** 63 - 1
+                # Starts at the interval containing start_ts, so both ends are served by the primary key
+                return conn.execute('''
+                    SELECT start_ts, end_ts FROM weather_coverage
+                    WHERE location_id = ?3
+                      AND start_ts >= COALESCE((SELECT MAX(start_ts) FROM weather_coverage
+                                                WHERE location_id = ?3 AND start_ts <= ?1), ?1)
+                      AND start_ts < ?2 AND end_ts > ?1
+                    ORDER BY start_ts
+                ''', (start_ts, end_ts, location_id)).fetchall()
+                
+        except Exception as e:
+            raise Exception(f"Error getting weather coverage: {e}")
+    
+    def rebuild_weather_coverage(self):
+        """Recomputes the weather coverage index from weather_data (repairs drift)"""
+        with self._connections.transaction() as conn:
+            rebuild_weather_coverage(conn)
+    
+    @timed('db.get_latest_weather_data', rows=len)
+    def get_latest_weather_data(self, limit: int = 10, location_id: int = DEFAULT_LOCATION_ID):
+        """Retrieve latest weather data of a location from database"""
+        try:
+            with self._connections.transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT * FROM weather_data 
-                    ORDER BY date DESC, time DESC 
+                    WHERE location_id = ?
+                    ORDER BY ts DESC 
                     LIMIT ?
-                ''', (limit,))
+                ''', (location_id, limit))
                 
                 columns = [description[0] for description in cursor.description]
                 rows = cursor.fetchall()
@@ -222,4 +623,28 @@ class PlantDatabase:
                 return result
                 
         except Exception as e:
-            raise Exception(f"Error retrieving weather data: {e}")
\ No newline at end of file
+            raise Exception(f"Error retrieving weather data: {e}")
+    
+    def get_locations(self) -> List[Tuple]:
+        """Returns (id, name, latitude, longitude, timezone) of every weather location"""
+        with self._connections.transaction() as conn:
+            return conn.execute('''
+                SELECT id, name, latitude, longitude, timezone FROM locations ORDER BY id
+            ''').fetchall()
+    
+    def ensure_location(self, name: str, latitude: float, longitude: float,
+                        timezone: str = 'Europe/Warsaw') -> int:
+        """Adds a location or updates its coordinates by name and returns its id"""
+        try:
+            with self._connections.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO locations (name, latitude, longitude, timezone)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET
+                        latitude = excluded.latitude, longitude = excluded.longitude,
+                        timezone = excluded.timezone
+                ''', (name, latitude, longitude, timezone))
+                return conn.execute('SELECT id FROM locations WHERE name = ?', (name,)).fetchone()[0]
+                
+        except Exception as e:
+            raise Exception(f"Error saving location {name}: {e}")
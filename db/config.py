@@ -0,0 +1,25 @@
+"""
+Configuration for data retention of the plant database
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+def _days(name: str):
+    """Max age in days from the environment; unset or 0 keeps the data forever"""
+    value = float(os.getenv(name, '0'))
+    return value if value > 0 else None
+
+
+# Max age of raw sensor readings, weather records and their rollups (days)
+RETENTION_SENSOR_DAYS = _days('RETENTION_SENSOR_DAYS')
+RETENTION_SENSOR_ROLLUP_DAYS = _days('RETENTION_SENSOR_ROLLUP_DAYS')
+RETENTION_WEATHER_DAYS = _days('RETENTION_WEATHER_DAYS')
+RETENTION_WEATHER_ROLLUP_DAYS = _days('RETENTION_WEATHER_ROLLUP_DAYS')
+
+# Seconds between retention runs of the background worker
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', '3600'))
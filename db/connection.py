@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Pragmas applied to every new connection. WAL lets readers (GUI) and the
+# writer (sensor ingest) work concurrently; NORMAL sync is durable across
+# application crashes and only risks the last commits on power loss.
+# auto_vacuum only takes effect in a new file (or at the next VACUUM) and
+# must be set before journal_mode; see db/retention.py.
+DEFAULT_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,        # negative value = size in KiB (~16 MB)
+    'mmap_size': 268435456,      # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionManager:
+    """Keeps one long-lived SQLite connection per thread"""
+
+    def __init__(self, db_path: str, timeout: float = 5.0, cached_statements: int = 256,
+                 pragmas: Optional[dict] = None):
+        self.db_path = db_path
+        self.timeout = timeout  # busy timeout in seconds
+        self.cached_statements = cached_statements
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # thread ident -> (weak reference to thread, connection)
+        self._connections: Dict[int, tuple] = {}
+        self._closed = False
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Returns the connection owned by the calling thread, opening it on first use"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"Connection manager for {self.db_path} is closed")
+            self._close_dead_threads()
+            conn = self._open()
+            self._connections[threading.get_ident()] = (weakref.ref(threading.current_thread()), conn)
+
+        self._local.connection = conn
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        """Opens and configures a new connection"""
+        # check_same_thread=False only so close() can release connections of
+        # other threads at shutdown; each connection is still used by one thread.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _close_dead_threads(self):
+        """Closes connections whose owning thread has finished"""
+        for ident, (thread_ref, conn) in list(self._connections.items()):
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+
+    @contextmanager
+    def transaction(self):
+        """Yields the thread's connection inside a transaction (commit or rollback on exit)"""
+        conn = self.get_connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        """Closes all connections; further use raises ProgrammingError"""
+        with self._lock:
+            self._closed = True
+            for thread_ref, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def open_connections(self) -> int:
+        """Returns the number of currently open connections"""
+        with self._lock:
+            return len(self._connections)
@@ -0,0 +1,109 @@
+"""
+Coverage index of weather_data: the hours for which a row is stored
+
+weather_coverage holds, per location, disjoint and non-adjacent
+[start_ts, end_ts) intervals of whole hours, so the collector can find missing
+ranges without scanning weather_data. Like the weather rollups, it is
+refreshed for the span of every batch stored by upsert_weather_data (a
+per-row insert trigger doubled the cost of bulk inserts); deletes from any
+path are cut out by a trigger created in migration 8.
+"""
+
+import sqlite3
+
+# Width of one coverage step in seconds
+COVERAGE_STEP = 3600
+
+# Hour of the deleted row
+_OLD_HOUR = f"(OLD.ts - OLD.ts % {COVERAGE_STEP})"
+
+
+def _interval_start(row: str, hour: str) -> str:
+    """Subquery for the start of the last interval of the row's location starting at or before hour"""
+    return (f"(SELECT MAX(start_ts) FROM weather_coverage "
+            f"WHERE location_id = {row}.location_id AND start_ts <= {hour})")
+
+
+def _at(row: str, start: str) -> str:
+    """Condition selecting the interval of the row's location that starts at start"""
+    return f"location_id = {row}.location_id AND start_ts = {start}"
+
+
+# The hour of a deleted row is cut out of its interval once no other row of that hour is left
+COVERAGE_DELETE_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS weather_coverage_after_delete
+    AFTER DELETE ON weather_data
+    WHEN OLD.ts IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM weather_data
+                     WHERE location_id = OLD.location_id
+                       AND ts >= {_OLD_HOUR} AND ts < {_OLD_HOUR} + {COVERAGE_STEP})
+    BEGIN
+        INSERT INTO weather_coverage (location_id, start_ts, end_ts)
+        SELECT location_id, {_OLD_HOUR} + {COVERAGE_STEP}, end_ts FROM weather_coverage
+        WHERE {_at('OLD', _interval_start('OLD', _OLD_HOUR))}
+          AND end_ts > {_OLD_HOUR} + {COVERAGE_STEP};
+
+        UPDATE weather_coverage SET end_ts = {_OLD_HOUR}
+        WHERE {_at('OLD', _interval_start('OLD', _OLD_HOUR))} AND end_ts > {_OLD_HOUR};
+        DELETE FROM weather_coverage WHERE {_at('OLD', _OLD_HOUR)} AND end_ts = {_OLD_HOUR};
+    END
+'''
+
+
+def _islands_sql(where: str) -> str:
+    """Runs of consecutive stored hours of the selected weather rows as (location_id, start_ts, end_ts)"""
+    # Consecutive hours share the same hour - step * row number ("gaps and islands")
+    return f'''
+        SELECT location_id, MIN(hour), MAX(hour) + {COVERAGE_STEP}
+        FROM (
+            SELECT location_id, hour,
+                   hour - {COVERAGE_STEP} * ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY hour) AS island
+            FROM (SELECT DISTINCT location_id, ts - ts % {COVERAGE_STEP} AS hour
+                  FROM weather_data WHERE ts IS NOT NULL AND {where})
+        )
+        GROUP BY location_id, island
+    '''
+
+
+def refresh_weather_coverage(conn: sqlite3.Connection, location_id: int, min_ts: int, max_ts: int):
+    """Recomputes the coverage of a location inside [min_ts, max_ts] from the raw rows
+
+    Only the span is read from weather_data; the stored intervals touching it
+    keep their parts outside the span and are merged with it by endpoints.
+    """
+    low = min_ts - min_ts % COVERAGE_STEP
+    high = max_ts - max_ts % COVERAGE_STEP + COVERAGE_STEP
+    touching = conn.execute('''
+        SELECT start_ts, end_ts FROM weather_coverage
+        WHERE location_id = ?1 AND start_ts <= ?3
+          AND start_ts >= COALESCE((SELECT MAX(start_ts) FROM weather_coverage
+                                    WHERE location_id = ?1 AND start_ts <= ?2), ?2)
+          AND end_ts >= ?2
+    ''', (location_id, low, high)).fetchall()
+
+    pieces = [(start, end) for _, start, end in conn.execute(
+        _islands_sql("location_id = ? AND ts >= ? AND ts < ?"), (location_id, low, high))]
+    for start, end in touching:
+        if start < low:
+            pieces.append((start, low))
+        if end > high:
+            pieces.append((high, end))
+    merged = []
+    for start, end in sorted(pieces):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    conn.executemany('''
+        DELETE FROM weather_coverage WHERE location_id = ? AND start_ts = ?
+    ''', [(location_id, start) for start, _ in touching])
+    conn.executemany('''
+        INSERT INTO weather_coverage (location_id, start_ts, end_ts) VALUES (?, ?, ?)
+    ''', [(location_id, start, end) for start, end in merged])
+
+
+def rebuild_weather_coverage(conn: sqlite3.Connection):
+    """Recomputes the coverage intervals from the stored weather rows (one pass over the ts index)"""
+    conn.execute('DELETE FROM weather_coverage')
+    conn.execute(f"INSERT INTO weather_coverage (location_id, start_ts, end_ts) {_islands_sql('1')}")
@@ -0,0 +1,802 @@
+"""
+Versioned schema migrations for the plant database
+The applied version is tracked in PRAGMA user_version
+"""
+
+import logging
+import sqlite3
+from typing import Callable, Collection, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per transaction during backfills, so writers are never blocked for long
+BACKFILL_CHUNK_SIZE = 50000
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    drops_indexes: Tuple[str, ...] = ()  # indexes of earlier migrations that this one replaces
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, drops_indexes: Tuple[str, ...] = ()):
+    """Registers a migration function; versions must be added in increasing order"""
+    def register(func):
+        if MIGRATIONS and MIGRATIONS[-1].version >= version:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append(Migration(version, description, func, drops_indexes))
+        return func
+    return register
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Returns the schema version stored in the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version() -> int:
+    """Returns the newest schema version known to this code"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def migrate(conn: sqlite3.Connection, target_version: Optional[int] = None) -> int:
+    """Applies pending migrations up to target_version (default: latest) and returns the new version"""
+    current = get_schema_version(conn)
+    target = latest_version() if target_version is None else target_version
+
+    pending = [step for step in MIGRATIONS if current < step.version <= target]
+    for position, step in enumerate(pending):
+        # Indexes that a later pending migration drops are not built at all, so an
+        # upgrade over several versions builds each final index of a large table once.
+        # Only indexes no intermediate migration reads through are declared as dropped.
+        replaced = {name for later in pending[position + 1:] for name in later.drops_indexes}
+        logger.info(f"Applying schema migration {step.version}: {step.description}")
+        conn.commit()
+        conn.set_authorizer(_skip_index_builds(replaced) if replaced else None)
+        try:
+            step.apply(conn)
+        finally:
+            conn.set_authorizer(None)
+        # PRAGMA statements cannot take parameters; version is an int from MIGRATIONS
+        conn.execute(f"PRAGMA user_version = {step.version}")
+        conn.commit()
+        current = step.version
+
+    return current
+
+
+def _skip_index_builds(names: Collection[str]):
+    """SQLite authorizer turning CREATE INDEX statements for the given index names into no-ops"""
+    def authorize(action, name, table, database, trigger):
+        if action == sqlite3.SQLITE_CREATE_INDEX and name in names:
+            return sqlite3.SQLITE_IGNORE
+        return sqlite3.SQLITE_OK
+    return authorize
+
+
+def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """Checks whether a column exists (makes interrupted migrations re-runnable)"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def backfill_in_chunks(conn: sqlite3.Connection, table: str, set_clause: str, where_clause: str,
+                       chunk_size: int = BACKFILL_CHUNK_SIZE):
+    """Runs UPDATE table SET set_clause over rowid ranges, committing after every chunk"""
+    max_id = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+    if max_id is None:
+        return
+
+    first_id = conn.execute(f"SELECT MIN(rowid) FROM {table} WHERE {where_clause}").fetchone()[0]
+    if first_id is None:
+        return
+
+    for low in range(first_id, max_id + 1, chunk_size):
+        with conn:
+            conn.execute(f'''
+                UPDATE {table} SET {set_clause}
+                WHERE rowid >= ? AND rowid < ? AND {where_clause}
+            ''', (low, low + chunk_size))
+    logger.info(f"Backfilled {table} up to rowid {max_id}")
+
+
+@migration(1, "integer epoch time and covering time index on sensor_readings")
+def _add_sensor_readings_ts(conn: sqlite3.Connection):
+    if not column_exists(conn, 'sensor_readings', 'ts'):
+        conn.execute("ALTER TABLE sensor_readings ADD COLUMN ts INTEGER")
+        conn.commit()
+
+    backfill_in_chunks(conn, 'sensor_readings',
+                       "ts = CAST(strftime('%s', timestamp) AS INTEGER)", "ts IS NULL")
+
+    # Covers recent-readings, time-range and MIN/MAX queries without touching the table
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sensor_readings_ts
+        ON sensor_readings (ts, timestamp, moisture, light, temperature, time_of_day)
+    ''')
+
+
+@migration(2, "integer epoch time and time index on weather_data")
+def _add_weather_data_ts(conn: sqlite3.Connection):
+    if not column_exists(conn, 'weather_data', 'ts'):
+        conn.execute("ALTER TABLE weather_data ADD COLUMN ts INTEGER")
+        conn.commit()
+
+    backfill_in_chunks(conn, 'weather_data',
+                       "ts = CAST(strftime('%s', date || ' ' || time) AS INTEGER)", "ts IS NULL")
+
+    # Latest-record lookups read the index only; latest-N rows need N table lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_data_ts ON weather_data (ts)")
+
+
+@migration(3, "running aggregates table for sensor_readings statistics")
+def _add_sensor_stats(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sensor_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            record_count INTEGER NOT NULL,
+            sum_moisture INTEGER NOT NULL,
+            sum_light INTEGER NOT NULL,
+            sum_temperature INTEGER NOT NULL,
+            sumsq_moisture INTEGER NOT NULL,
+            sumsq_light INTEGER NOT NULL,
+            sumsq_temperature INTEGER NOT NULL,
+            min_ts INTEGER,
+            max_ts INTEGER,
+            min_timestamp TEXT,
+            max_timestamp TEXT
+        )
+    ''')
+
+    # Every insert path (including external tools) keeps the aggregates current;
+    # deletes are accounted for by the code that performs them.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sensor_stats_after_insert
+        AFTER INSERT ON sensor_readings
+        BEGIN
+            UPDATE sensor_stats SET
+                record_count = record_count + 1,
+                sum_moisture = sum_moisture + NEW.moisture,
+                sum_light = sum_light + NEW.light,
+                sum_temperature = sum_temperature + NEW.temperature,
+                sumsq_moisture = sumsq_moisture + NEW.moisture * NEW.moisture,
+                sumsq_light = sumsq_light + NEW.light * NEW.light,
+                sumsq_temperature = sumsq_temperature + NEW.temperature * NEW.temperature,
+                min_timestamp = CASE WHEN min_ts IS NULL OR NEW.ts < min_ts THEN NEW.timestamp ELSE min_timestamp END,
+                min_ts = CASE WHEN min_ts IS NULL OR NEW.ts < min_ts THEN NEW.ts ELSE min_ts END,
+                max_timestamp = CASE WHEN max_ts IS NULL OR NEW.ts >= max_ts THEN NEW.timestamp ELSE max_timestamp END,
+                max_ts = CASE WHEN max_ts IS NULL OR NEW.ts >= max_ts THEN NEW.ts ELSE max_ts END
+            WHERE id = 1;
+        END
+    ''')
+
+    # Initial values from the existing rows (one full scan, like rebuild_stats)
+    conn.execute('''
+        INSERT OR REPLACE INTO sensor_stats
+        SELECT 1, COUNT(*),
+               COALESCE(SUM(moisture), 0), COALESCE(SUM(light), 0), COALESCE(SUM(temperature), 0),
+               COALESCE(SUM(moisture * moisture), 0), COALESCE(SUM(light * light), 0),
+               COALESCE(SUM(temperature * temperature), 0),
+               (SELECT ts FROM sensor_readings ORDER BY ts LIMIT 1),
+               (SELECT ts FROM sensor_readings ORDER BY ts DESC LIMIT 1),
+               (SELECT timestamp FROM sensor_readings ORDER BY ts LIMIT 1),
+               (SELECT timestamp FROM sensor_readings ORDER BY ts DESC LIMIT 1)
+        FROM sensor_readings
+    ''')
+
+
+# Frozen copies of the rollup SQL of schema version 4 (one device, one location).
+# Released migrations keep building the schema they shipped with; rollups.py
+# follows the current schema, whose changes are made by later migrations.
+
+_V4_SENSOR_RESOLUTIONS = (60, 3600, 86400)
+_V4_WEATHER_RESOLUTIONS = (86400, 7 * 86400)
+_V4_SENSOR_VALUES = ('moisture', 'light', 'temperature')
+_V4_WEATHER_VALUES = ('temperature', 'humidity', 'pressure', 'wind_speed', 'precipitation')
+
+
+def _v4_sensor_rollup_upsert_sql(resolution: int) -> str:
+    """UPSERT merging the NEW row into its sensor bucket (runs inside the insert trigger)"""
+    columns = ['resolution', 'bucket', 'record_count', 'last_ts']
+    values = [str(resolution), f"NEW.ts - NEW.ts % {resolution}", '1', 'NEW.ts']
+    updates = []
+    for name in _V4_SENSOR_VALUES:
+        columns += [f'sum_{name}', f'min_{name}', f'max_{name}', f'last_{name}']
+        values += [f'NEW.{name}'] * 4
+        updates += [
+            f'sum_{name} = sum_{name} + excluded.sum_{name}',
+            f'min_{name} = MIN(min_{name}, excluded.min_{name})',
+            f'max_{name} = MAX(max_{name}, excluded.max_{name})',
+            f'last_{name} = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_{name} ELSE last_{name} END',
+        ]
+    # SET expressions all see the pre-update row, so the CASEs above compare with the old last_ts
+    updates += ['record_count = record_count + 1', 'last_ts = MAX(last_ts, excluded.last_ts)']
+    return f'''
+            INSERT INTO sensor_rollups ({', '.join(columns)})
+            VALUES ({', '.join(values)})
+            ON CONFLICT (resolution, bucket) DO UPDATE SET
+                {', '.join(updates)};'''
+
+
+def _v4_rebuild_sensor_rollups(conn: sqlite3.Connection):
+    """Recomputes every sensor bucket from the raw rows (one pass per resolution)"""
+    conn.execute('DELETE FROM sensor_rollups')
+    aggregates = ', '.join(
+        f'SUM({name}) AS sum_{name}, MIN({name}) AS min_{name}, MAX({name}) AS max_{name}'
+        for name in _V4_SENSOR_VALUES
+    )
+    outputs = ', '.join(f'g.sum_{name}, g.min_{name}, g.max_{name}, r.{name}' for name in _V4_SENSOR_VALUES)
+    columns = ', '.join(f'sum_{name}, min_{name}, max_{name}, last_{name}' for name in _V4_SENSOR_VALUES)
+    for resolution in _V4_SENSOR_RESOLUTIONS:
+        # "last" values come from the newest row of each bucket
+        conn.execute(f'''
+            INSERT INTO sensor_rollups (resolution, bucket, record_count, last_ts, {columns})
+            SELECT {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT ts - ts % {resolution} AS bucket, COUNT(*) AS record_count, MAX(ts) AS last_ts,
+                       {aggregates}
+                FROM sensor_readings
+                WHERE ts IS NOT NULL
+                GROUP BY bucket
+            ) AS g
+            JOIN sensor_readings AS r
+              ON r.id = (SELECT MAX(id) FROM sensor_readings WHERE ts = g.last_ts)
+        ''')
+
+
+def _v4_refresh_weather_rollups(conn: sqlite3.Connection, min_ts: int, max_ts: int):
+    """Recomputes the weather buckets overlapping [min_ts, max_ts] from the raw rows"""
+    aggregates = ', '.join(
+        f'MIN({name}) AS min_{name}, AVG({name}) AS avg_{name}, MAX({name}) AS max_{name}'
+        for name in _V4_WEATHER_VALUES
+    )
+    outputs = ', '.join(f'g.min_{name}, g.avg_{name}, g.max_{name}, w.{name}' for name in _V4_WEATHER_VALUES)
+    columns = ', '.join(f'min_{name}, avg_{name}, max_{name}, last_{name}' for name in _V4_WEATHER_VALUES)
+    for resolution in _V4_WEATHER_RESOLUTIONS:
+        start = min_ts - min_ts % resolution
+        end = max_ts - max_ts % resolution + resolution
+        conn.execute(f'''
+            INSERT OR REPLACE INTO weather_rollups (resolution, bucket, record_count, last_ts, {columns})
+            SELECT {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT ts - ts % {resolution} AS bucket, COUNT(*) AS record_count, MAX(ts) AS last_ts,
+                       {aggregates}
+                FROM weather_data
+                WHERE ts >= ? AND ts < ?
+                GROUP BY bucket
+            ) AS g
+            JOIN weather_data AS w ON w.ts = g.last_ts
+        ''', (start, end))
+
+
+@migration(4, "minute/hour/day rollups of sensor_readings, day/week rollups of weather_data")
+def _add_rollups(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sensor_rollups (
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            record_count INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            sum_moisture INTEGER, min_moisture INTEGER, max_moisture INTEGER, last_moisture INTEGER,
+            sum_light INTEGER, min_light INTEGER, max_light INTEGER, last_light INTEGER,
+            sum_temperature INTEGER, min_temperature INTEGER, max_temperature INTEGER, last_temperature INTEGER,
+            PRIMARY KEY (resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weather_rollups (
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            record_count INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            min_temperature REAL, avg_temperature REAL, max_temperature REAL, last_temperature REAL,
+            min_humidity REAL, avg_humidity REAL, max_humidity REAL, last_humidity REAL,
+            min_pressure REAL, avg_pressure REAL, max_pressure REAL, last_pressure REAL,
+            min_wind_speed REAL, avg_wind_speed REAL, max_wind_speed REAL, last_wind_speed REAL,
+            min_precipitation REAL, avg_precipitation REAL, max_precipitation REAL, last_precipitation REAL,
+            PRIMARY KEY (resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+    upserts = ''.join(_v4_sensor_rollup_upsert_sql(resolution) for resolution in _V4_SENSOR_RESOLUTIONS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS sensor_rollups_after_insert
+        AFTER INSERT ON sensor_readings
+        WHEN NEW.ts IS NOT NULL
+        BEGIN
+            {upserts}
+        END
+    ''')
+
+    _v4_rebuild_sensor_rollups(conn)
+    bounds = conn.execute("SELECT MIN(ts), MAX(ts) FROM weather_data").fetchone()
+    if bounds[0] is not None:
+        _v4_refresh_weather_rollups(conn, bounds[0], bounds[1])
+
+
+@migration(5, "time index ordered by (ts, id) for keyset pagination")
+def _add_sensor_readings_ts_id_index(conn: sqlite3.Connection):
+    # Same covering columns as idx_sensor_readings_ts, but with id right after ts so
+    # "ORDER BY ts, id" and "(ts, id) < (?, ?)" are served by the index without sorting
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sensor_readings_ts_id
+        ON sensor_readings (ts, id, timestamp, moisture, light, temperature, time_of_day)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_sensor_readings_ts")
+
+
+@migration(6, "indexes for sorting sensor_readings by value columns")
+def _add_sensor_readings_sort_indexes(conn: sqlite3.Connection):
+    # Index entries end with the rowid, so each index also orders by (value, id)
+    for column in ('moisture', 'light', 'temperature', 'time_of_day'):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_sensor_readings_{column} ON sensor_readings ({column})")
+
+
+# Frozen copies of the coverage SQL of schema version 7 (one location), like the
+# rollup SQL of version 4 above
+
+_V7_COVERAGE_STEP = 3600
+_V7_NEW_HOUR = f"(NEW.ts - NEW.ts % {_V7_COVERAGE_STEP})"
+_V7_OLD_HOUR = f"(OLD.ts - OLD.ts % {_V7_COVERAGE_STEP})"
+
+
+def _v7_interval_start_at_or_before(hour: str) -> str:
+    """Subquery for the start of the last interval starting at or before hour"""
+    return f"(SELECT MAX(start_ts) FROM weather_coverage WHERE start_ts <= {hour})"
+
+
+# A new hour becomes its own interval and is merged with the neighbours it touches
+_V7_COVERAGE_INSERT_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS weather_coverage_after_insert
+    AFTER INSERT ON weather_data
+    WHEN NEW.ts IS NOT NULL
+    BEGIN
+        INSERT INTO weather_coverage (start_ts, end_ts)
+        SELECT {_V7_NEW_HOUR}, {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP}
+        WHERE NOT EXISTS (
+            SELECT 1 FROM weather_coverage
+            WHERE start_ts = {_v7_interval_start_at_or_before(_V7_NEW_HOUR)} AND end_ts > {_V7_NEW_HOUR}
+        );
+
+        UPDATE weather_coverage
+        SET end_ts = (SELECT end_ts FROM weather_coverage WHERE start_ts = {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP})
+        WHERE start_ts = {_V7_NEW_HOUR} AND end_ts = {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP}
+          AND EXISTS (SELECT 1 FROM weather_coverage WHERE start_ts = {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP});
+        DELETE FROM weather_coverage
+        WHERE start_ts = {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP}
+          AND EXISTS (SELECT 1 FROM weather_coverage
+                      WHERE start_ts = {_V7_NEW_HOUR} AND end_ts > {_V7_NEW_HOUR} + {_V7_COVERAGE_STEP});
+
+        UPDATE weather_coverage
+        SET end_ts = (SELECT end_ts FROM weather_coverage WHERE start_ts = {_V7_NEW_HOUR})
+        WHERE end_ts = {_V7_NEW_HOUR}
+          AND start_ts = (SELECT MAX(start_ts) FROM weather_coverage WHERE start_ts < {_V7_NEW_HOUR})
+          AND EXISTS (SELECT 1 FROM weather_coverage WHERE start_ts = {_V7_NEW_HOUR});
+        DELETE FROM weather_coverage
+        WHERE start_ts = {_V7_NEW_HOUR}
+          AND EXISTS (SELECT 1 FROM weather_coverage
+                      WHERE start_ts = (SELECT MAX(start_ts) FROM weather_coverage WHERE start_ts < {_V7_NEW_HOUR})
+                        AND end_ts > {_V7_NEW_HOUR});
+    END
+'''
+
+# The hour of a deleted row is cut out of its interval once no other row of that hour is left
+_V7_COVERAGE_DELETE_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS weather_coverage_after_delete
+    AFTER DELETE ON weather_data
+    WHEN OLD.ts IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM weather_data
+                     WHERE ts >= {_V7_OLD_HOUR} AND ts < {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP})
+    BEGIN
+        INSERT INTO weather_coverage (start_ts, end_ts)
+        SELECT {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP}, end_ts FROM weather_coverage
+        WHERE start_ts = {_v7_interval_start_at_or_before(_V7_OLD_HOUR)}
+          AND end_ts > {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP};
+
+        UPDATE weather_coverage SET end_ts = {_V7_OLD_HOUR}
+        WHERE start_ts = {_v7_interval_start_at_or_before(_V7_OLD_HOUR)} AND end_ts > {_V7_OLD_HOUR};
+        DELETE FROM weather_coverage WHERE start_ts = {_V7_OLD_HOUR} AND end_ts = {_V7_OLD_HOUR};
+    END
+'''
+
+
+def _v7_rebuild_weather_coverage(conn: sqlite3.Connection):
+    """Recomputes the coverage intervals from the stored weather rows (one pass over the ts index)"""
+    conn.execute('DELETE FROM weather_coverage')
+    # Consecutive hours share the same hour - step * row number ("gaps and islands")
+    conn.execute(f'''
+        INSERT INTO weather_coverage (start_ts, end_ts)
+        SELECT MIN(hour), MAX(hour) + {_V7_COVERAGE_STEP}
+        FROM (
+            SELECT hour, hour - {_V7_COVERAGE_STEP} * ROW_NUMBER() OVER (ORDER BY hour) AS island
+            FROM (SELECT DISTINCT ts - ts % {_V7_COVERAGE_STEP} AS hour FROM weather_data WHERE ts IS NOT NULL)
+        )
+        GROUP BY island
+    ''')
+
+
+@migration(7, "coverage index of the hours stored in weather_data")
+def _add_weather_coverage(conn: sqlite3.Connection):
+    # Half-open [start_ts, end_ts) intervals of whole hours; the rowid is the interval start
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weather_coverage (
+            start_ts INTEGER PRIMARY KEY,
+            end_ts INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(_V7_COVERAGE_INSERT_TRIGGER)
+    conn.execute(_V7_COVERAGE_DELETE_TRIGGER)
+    _v7_rebuild_weather_coverage(conn)
+
+
+# Frozen copies of the weather rollup and coverage SQL of schema version 8 (keyed
+# by location), like the SQL of versions 4 and 7 above
+
+
+def _v8_refresh_weather_rollups(conn: sqlite3.Connection, location_id: int, min_ts: int, max_ts: int):
+    """Recomputes the weather buckets of a location overlapping [min_ts, max_ts] from the raw rows"""
+    aggregates = ', '.join(
+        f'MIN({name}) AS min_{name}, AVG({name}) AS avg_{name}, MAX({name}) AS max_{name}'
+        for name in _V4_WEATHER_VALUES
+    )
+    outputs = ', '.join(f'g.min_{name}, g.avg_{name}, g.max_{name}, w.{name}' for name in _V4_WEATHER_VALUES)
+    columns = ', '.join(f'min_{name}, avg_{name}, max_{name}, last_{name}' for name in _V4_WEATHER_VALUES)
+    for resolution in _V4_WEATHER_RESOLUTIONS:
+        start = min_ts - min_ts % resolution
+        end = max_ts - max_ts % resolution + resolution
+        conn.execute(f'''
+            INSERT OR REPLACE INTO weather_rollups
+                (location_id, resolution, bucket, record_count, last_ts, {columns})
+            SELECT ?1, {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT ts - ts % {resolution} AS bucket, COUNT(*) AS record_count, MAX(ts) AS last_ts,
+                       {aggregates}
+                FROM weather_data
+                WHERE location_id = ?1 AND ts >= ?2 AND ts < ?3
+                GROUP BY bucket
+            ) AS g
+            JOIN weather_data AS w ON w.location_id = ?1 AND w.ts = g.last_ts
+        ''', (location_id, start, end))
+
+
+def _v8_rebuild_weather_rollups(conn: sqlite3.Connection):
+    """Recomputes every weather bucket of every location from the raw rows"""
+    conn.execute('DELETE FROM weather_rollups')
+    bounds = conn.execute('''
+        SELECT location_id, MIN(ts), MAX(ts) FROM weather_data
+        WHERE ts IS NOT NULL
+        GROUP BY location_id
+    ''').fetchall()
+    for location_id, min_ts, max_ts in bounds:
+        _v8_refresh_weather_rollups(conn, location_id, min_ts, max_ts)
+
+
+def _v8_interval_start(row: str, hour: str) -> str:
+    """Subquery for the start of the last interval of the row's location starting at or before hour"""
+    return (f"(SELECT MAX(start_ts) FROM weather_coverage "
+            f"WHERE location_id = {row}.location_id AND start_ts <= {hour})")
+
+
+def _v8_at(row: str, start: str) -> str:
+    """Condition selecting the interval of the row's location that starts at start"""
+    return f"location_id = {row}.location_id AND start_ts = {start}"
+
+
+# The hour of a deleted row is cut out of its interval once no other row of that hour is left
+_V8_COVERAGE_DELETE_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS weather_coverage_after_delete
+    AFTER DELETE ON weather_data
+    WHEN OLD.ts IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM weather_data
+                     WHERE location_id = OLD.location_id
+                       AND ts >= {_V7_OLD_HOUR} AND ts < {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP})
+    BEGIN
+        INSERT INTO weather_coverage (location_id, start_ts, end_ts)
+        SELECT location_id, {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP}, end_ts FROM weather_coverage
+        WHERE {_v8_at('OLD', _v8_interval_start('OLD', _V7_OLD_HOUR))}
+          AND end_ts > {_V7_OLD_HOUR} + {_V7_COVERAGE_STEP};
+
+        UPDATE weather_coverage SET end_ts = {_V7_OLD_HOUR}
+        WHERE {_v8_at('OLD', _v8_interval_start('OLD', _V7_OLD_HOUR))} AND end_ts > {_V7_OLD_HOUR};
+        DELETE FROM weather_coverage WHERE {_v8_at('OLD', _V7_OLD_HOUR)} AND end_ts = {_V7_OLD_HOUR};
+    END
+'''
+
+
+def _v8_rebuild_weather_coverage(conn: sqlite3.Connection):
+    """Recomputes the coverage intervals of every location from the stored weather rows"""
+    conn.execute('DELETE FROM weather_coverage')
+    # Consecutive hours share the same hour - step * row number ("gaps and islands")
+    conn.execute(f'''
+        INSERT INTO weather_coverage (location_id, start_ts, end_ts)
+        SELECT location_id, MIN(hour), MAX(hour) + {_V7_COVERAGE_STEP}
+        FROM (
+            SELECT location_id, hour,
+                   hour - {_V7_COVERAGE_STEP} * ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY hour) AS island
+            FROM (SELECT DISTINCT location_id, ts - ts % {_V7_COVERAGE_STEP} AS hour
+                  FROM weather_data WHERE ts IS NOT NULL)
+        )
+        GROUP BY location_id, island
+    ''')
+
+
+@migration(8, "locations table; weather_data, its rollups and coverage keyed by location")
+def _add_locations(conn: sqlite3.Connection):
+    # Table rebuilds are not re-runnable halfway, so the whole step is one
+    # transaction; migrate() commits it together with the new user_version
+    conn.execute("BEGIN IMMEDIATE")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            timezone TEXT NOT NULL DEFAULT 'Europe/Warsaw',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Existing weather rows were all collected for Bydgoszcz
+    conn.execute('''
+        INSERT OR IGNORE INTO locations (id, name, latitude, longitude)
+        VALUES (1, 'Bydgoszcz', 53.1235, 18.0084)
+    ''')
+
+    # SQLite cannot change a UNIQUE constraint in place: copy into a new table
+    if not column_exists(conn, 'weather_data', 'location_id'):
+        conn.execute('''
+            CREATE TABLE weather_data_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                location_id INTEGER NOT NULL DEFAULT 1 REFERENCES locations (id),
+                date TEXT,
+                time TEXT,
+                temperature REAL,
+                humidity REAL,
+                pressure REAL,
+                wind_speed REAL,
+                wind_direction REAL,
+                precipitation REAL,
+                visibility REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                ts INTEGER,
+                UNIQUE (location_id, date, time)
+            )
+        ''')
+        conn.execute('''
+            INSERT INTO weather_data_new
+                (id, location_id, date, time, temperature, humidity, pressure, wind_speed,
+                 wind_direction, precipitation, visibility, created_at, ts)
+            SELECT id, 1, date, time, temperature, humidity, pressure, wind_speed,
+                   wind_direction, precipitation, visibility, created_at, ts
+            FROM weather_data
+        ''')
+        conn.execute("DROP TABLE weather_data")  # also drops its indexes and triggers
+        conn.execute("ALTER TABLE weather_data_new RENAME TO weather_data")
+    # Every weather query is per location; latest-record lookups read the index only
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_data_location_ts ON weather_data (location_id, ts)")
+
+    conn.execute("DROP TABLE IF EXISTS weather_rollups")
+    conn.execute('''
+        CREATE TABLE weather_rollups (
+            location_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            record_count INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            min_temperature REAL, avg_temperature REAL, max_temperature REAL, last_temperature REAL,
+            min_humidity REAL, avg_humidity REAL, max_humidity REAL, last_humidity REAL,
+            min_pressure REAL, avg_pressure REAL, max_pressure REAL, last_pressure REAL,
+            min_wind_speed REAL, avg_wind_speed REAL, max_wind_speed REAL, last_wind_speed REAL,
+            min_precipitation REAL, avg_precipitation REAL, max_precipitation REAL, last_precipitation REAL,
+            PRIMARY KEY (location_id, resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+    _v8_rebuild_weather_rollups(conn)
+
+    # Half-open [start_ts, end_ts) intervals of whole hours per location
+    conn.execute("DROP TABLE IF EXISTS weather_coverage")
+    conn.execute('''
+        CREATE TABLE weather_coverage (
+            location_id INTEGER NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            PRIMARY KEY (location_id, start_ts)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(_V8_COVERAGE_DELETE_TRIGGER)
+    _v8_rebuild_weather_coverage(conn)
+
+
+# Frozen copies of the sensor rollup SQL of schema version 9 (keyed by device)
+
+
+def _v9_sensor_rollup_upsert_sql(resolution: int) -> str:
+    """UPSERT merging the NEW row into its device's sensor bucket (runs inside the insert trigger)"""
+    columns = ['device_id', 'resolution', 'bucket', 'record_count', 'last_ts']
+    values = ['NEW.device_id', str(resolution), f"NEW.ts - NEW.ts % {resolution}", '1', 'NEW.ts']
+    updates = []
+    for name in _V4_SENSOR_VALUES:
+        columns += [f'sum_{name}', f'min_{name}', f'max_{name}', f'last_{name}']
+        values += [f'NEW.{name}'] * 4
+        updates += [
+            f'sum_{name} = sum_{name} + excluded.sum_{name}',
+            f'min_{name} = MIN(min_{name}, excluded.min_{name})',
+            f'max_{name} = MAX(max_{name}, excluded.max_{name})',
+            f'last_{name} = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_{name} ELSE last_{name} END',
+        ]
+    # SET expressions all see the pre-update row, so the CASEs above compare with the old last_ts
+    updates += ['record_count = record_count + 1', 'last_ts = MAX(last_ts, excluded.last_ts)']
+    return f'''
+            INSERT INTO sensor_rollups ({', '.join(columns)})
+            VALUES ({', '.join(values)})
+            ON CONFLICT (device_id, resolution, bucket) DO UPDATE SET
+                {', '.join(updates)};'''
+
+
+def _v9_rebuild_sensor_rollups(conn: sqlite3.Connection):
+    """Recomputes every sensor bucket of every device from the raw rows (one pass per resolution)"""
+    conn.execute('DELETE FROM sensor_rollups')
+    aggregates = ', '.join(
+        f'SUM({name}) AS sum_{name}, MIN({name}) AS min_{name}, MAX({name}) AS max_{name}'
+        for name in _V4_SENSOR_VALUES
+    )
+    outputs = ', '.join(f'g.sum_{name}, g.min_{name}, g.max_{name}, r.{name}' for name in _V4_SENSOR_VALUES)
+    columns = ', '.join(f'sum_{name}, min_{name}, max_{name}, last_{name}' for name in _V4_SENSOR_VALUES)
+    for resolution in _V4_SENSOR_RESOLUTIONS:
+        # "last" values come from the newest row of each bucket
+        conn.execute(f'''
+            INSERT INTO sensor_rollups (device_id, resolution, bucket, record_count, last_ts, {columns})
+            SELECT g.device_id, {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT device_id, ts - ts % {resolution} AS bucket, COUNT(*) AS record_count,
+                       MAX(ts) AS last_ts, {aggregates}
+                FROM sensor_readings
+                WHERE ts IS NOT NULL
+                GROUP BY device_id, bucket
+            ) AS g
+            JOIN sensor_readings AS r
+              ON r.id = (SELECT MAX(id) FROM sensor_readings WHERE device_id = g.device_id AND ts = g.last_ts)
+        ''')
+
+
+@migration(9, "devices table; sensor_readings, their stats and rollups keyed by device",
+           drops_indexes=('idx_sensor_readings_ts_id', 'idx_sensor_readings_moisture', 'idx_sensor_readings_light',
+                          'idx_sensor_readings_temperature', 'idx_sensor_readings_time_of_day'))
+def _add_devices(conn: sqlite3.Connection):
+    # One transaction, like migration 8; migrate() commits it with the new user_version
+    conn.execute("BEGIN IMMEDIATE")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS devices (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Existing readings all come from the single original plant
+    conn.execute("INSERT OR IGNORE INTO devices (id, name) VALUES (1, 'Plant 1')")
+
+    # A constant default is stored in the schema only, so this does not rewrite the table
+    if not column_exists(conn, 'sensor_readings', 'device_id'):
+        conn.execute("ALTER TABLE sensor_readings ADD COLUMN device_id INTEGER NOT NULL DEFAULT 1")
+
+    # Every reading query is per device: with device_id first, a device's rows are one
+    # contiguous index range whatever the number of other devices
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sensor_readings_device_ts_id
+        ON sensor_readings (device_id, ts, id, timestamp, moisture, light, temperature, time_of_day)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_sensor_readings_ts_id")
+    for column in ('moisture', 'light', 'temperature', 'time_of_day'):
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_device_{column} ON sensor_readings (device_id, {column})
+        ''')
+        conn.execute(f"DROP INDEX IF EXISTS idx_sensor_readings_{column}")
+
+    # Aggregates per device; the single row of migration 3 becomes device 1's
+    conn.execute("DROP TRIGGER IF EXISTS sensor_stats_after_insert")
+    conn.execute('''
+        CREATE TABLE sensor_stats_new (
+            device_id INTEGER PRIMARY KEY,
+            record_count INTEGER NOT NULL,
+            sum_moisture INTEGER NOT NULL,
+            sum_light INTEGER NOT NULL,
+            sum_temperature INTEGER NOT NULL,
+            sumsq_moisture INTEGER NOT NULL,
+            sumsq_light INTEGER NOT NULL,
+            sumsq_temperature INTEGER NOT NULL,
+            min_ts INTEGER,
+            max_ts INTEGER,
+            min_timestamp TEXT,
+            max_timestamp TEXT
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO sensor_stats_new
+        SELECT 1, record_count, sum_moisture, sum_light, sum_temperature,
+               sumsq_moisture, sumsq_light, sumsq_temperature, min_ts, max_ts, min_timestamp, max_timestamp
+        FROM sensor_stats
+        WHERE record_count > 0
+    ''')
+    conn.execute("DROP TABLE sensor_stats")
+    conn.execute("ALTER TABLE sensor_stats_new RENAME TO sensor_stats")
+    conn.execute('''
+        CREATE TRIGGER sensor_stats_after_insert
+        AFTER INSERT ON sensor_readings
+        BEGIN
+            INSERT INTO sensor_stats (device_id, record_count, sum_moisture, sum_light, sum_temperature,
+                                      sumsq_moisture, sumsq_light, sumsq_temperature,
+                                      min_ts, max_ts, min_timestamp, max_timestamp)
+            VALUES (NEW.device_id, 1, NEW.moisture, NEW.light, NEW.temperature,
+                    NEW.moisture * NEW.moisture, NEW.light * NEW.light, NEW.temperature * NEW.temperature,
+                    NEW.ts, NEW.ts, NEW.timestamp, NEW.timestamp)
+            ON CONFLICT (device_id) DO UPDATE SET
+                record_count = record_count + 1,
+                sum_moisture = sum_moisture + excluded.sum_moisture,
+                sum_light = sum_light + excluded.sum_light,
+                sum_temperature = sum_temperature + excluded.sum_temperature,
+                sumsq_moisture = sumsq_moisture + excluded.sumsq_moisture,
+                sumsq_light = sumsq_light + excluded.sumsq_light,
+                sumsq_temperature = sumsq_temperature + excluded.sumsq_temperature,
+                min_timestamp = CASE WHEN min_ts IS NULL OR excluded.min_ts < min_ts
+                                     THEN excluded.min_timestamp ELSE min_timestamp END,
+                min_ts = CASE WHEN min_ts IS NULL OR excluded.min_ts < min_ts THEN excluded.min_ts ELSE min_ts END,
+                max_timestamp = CASE WHEN max_ts IS NULL OR excluded.max_ts >= max_ts
+                                     THEN excluded.max_timestamp ELSE max_timestamp END,
+                max_ts = CASE WHEN max_ts IS NULL OR excluded.max_ts >= max_ts THEN excluded.max_ts ELSE max_ts END;
+        END
+    ''')
+    # A device's first reading creates its stats row, which registers unknown devices
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS devices_after_first_reading
+        AFTER INSERT ON sensor_stats
+        BEGIN
+            INSERT OR IGNORE INTO devices (id, name) VALUES (NEW.device_id, 'Plant ' || NEW.device_id);
+        END
+    ''')
+
+    # Rollups per device. Databases created before this version had their buckets
+    # maintained by a trigger and are copied; otherwise they are built from the rows.
+    maintained = conn.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'sensor_rollups_after_insert'
+    ''').fetchone() is not None
+    conn.execute("DROP TRIGGER IF EXISTS sensor_rollups_after_insert")
+    conn.execute('''
+        CREATE TABLE sensor_rollups_new (
+            device_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            record_count INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            sum_moisture INTEGER, min_moisture INTEGER, max_moisture INTEGER, last_moisture INTEGER,
+            sum_light INTEGER, min_light INTEGER, max_light INTEGER, last_light INTEGER,
+            sum_temperature INTEGER, min_temperature INTEGER, max_temperature INTEGER, last_temperature INTEGER,
+            PRIMARY KEY (device_id, resolution, bucket)
+        ) WITHOUT ROWID
+    ''')
+    if maintained:
+        conn.execute('''
+            INSERT INTO sensor_rollups_new
+            SELECT 1, resolution, bucket, record_count, last_ts,
+                   sum_moisture, min_moisture, max_moisture, last_moisture,
+                   sum_light, min_light, max_light, last_light,
+                   sum_temperature, min_temperature, max_temperature, last_temperature
+            FROM sensor_rollups
+        ''')
+    conn.execute("DROP TABLE sensor_rollups")
+    conn.execute("ALTER TABLE sensor_rollups_new RENAME TO sensor_rollups")
+
+    upserts = ''.join(_v9_sensor_rollup_upsert_sql(resolution) for resolution in _V4_SENSOR_RESOLUTIONS)
+    conn.execute(f'''
+        CREATE TRIGGER sensor_rollups_after_insert
+        AFTER INSERT ON sensor_readings
+        WHEN NEW.ts IS NOT NULL
+        BEGIN
+            {upserts}
+        END
+    ''')
+    if not maintained:
+        _v9_rebuild_sensor_rollups(conn)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Time-based retention of sensor readings, weather data and their rollups
+
+A policy maps each table to a max age in days (None keeps it forever).
+Expired rows are deleted per device or location, oldest first, in small
+batches: every batch is its own short write transaction followed by a pause,
+so the ingest writer never waits long for the lock, and the batch size adapts
+to keep each transaction under MAX_BATCH_SECONDS. Cutoffs of the raw tables
+are rounded down to their coarsest rollup bucket, so no kept rollup is left
+half backed by raw rows. sensor_stats is adjusted with every batch; weather
+coverage is cut by its delete trigger.
+
+Deleted pages go to the freelist. Files with auto_vacuum=INCREMENTAL (the
+default for new databases, see db/connection.py) hand them back to the file
+system in paced incremental_vacuum steps; older files are converted once by
+--convert, which rewrites the whole file with VACUUM.
+
+    python -m db.retention --sensor-days 30 --dry-run
+    python -m db.retention --sensor-days 30 --weather-days 730
+    python -m db.retention --convert
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .config import (RETENTION_INTERVAL, RETENTION_SENSOR_DAYS, RETENTION_SENSOR_ROLLUP_DAYS,
+                     RETENTION_WEATHER_DAYS, RETENTION_WEATHER_ROLLUP_DAYS)
+from .rollups import SENSOR_RESOLUTIONS, SENSOR_VALUES, WEATHER_RESOLUTIONS
+from .timestamps import from_epoch, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted by the first batch of a scope, and the range the batch size adapts in
+BATCH_ROWS = 2000
+MIN_BATCH_ROWS = 100
+MAX_BATCH_ROWS = 50000
+
+# Longest write transaction of one batch and the pause after it (seconds)
+MAX_BATCH_SECONDS = 0.05
+BATCH_PAUSE = 0.05
+
+# Free pages handed back to the file system per incremental_vacuum step
+VACUUM_STEP_PAGES = 256
+
+# Delay of the first background run, so it does not compete with the startup
+RETENTION_START_DELAY = 60.0
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class RetentionTable(NamedTuple):
+    name: str
+    time_column: str               # integer wall-clock epoch the age is measured on
+    scope_column: str              # deletes run per device or location, on its index
+    scopes_sql: str                # lists the ids of the scope column
+    align: int = 1                 # cutoffs are rounded down to a multiple of this (seconds)
+    resolutions: Tuple[int, ...] = ()  # rollup tables: also scoped by resolution, cutoffs aligned to it
+
+
+TABLES: Dict[str, RetentionTable] = {
+    'sensor_readings': RetentionTable('sensor_readings', 'ts', 'device_id', 'SELECT id FROM devices',
+                                      align=SENSOR_RESOLUTIONS[-1]),
+    'sensor_rollups': RetentionTable('sensor_rollups', 'bucket', 'device_id', 'SELECT id FROM devices',
+                                     resolutions=SENSOR_RESOLUTIONS),
+    'weather_data': RetentionTable('weather_data', 'ts', 'location_id', 'SELECT id FROM locations',
+                                   align=WEATHER_RESOLUTIONS[-1]),
+    'weather_rollups': RetentionTable('weather_rollups', 'bucket', 'location_id', 'SELECT id FROM locations',
+                                      resolutions=WEATHER_RESOLUTIONS),
+}
+
+# Max age in days per table from the environment (see db/config.py)
+DEFAULT_POLICY: Dict[str, Optional[float]] = {
+    'sensor_readings': RETENTION_SENSOR_DAYS,
+    'sensor_rollups': RETENTION_SENSOR_ROLLUP_DAYS,
+    'weather_data': RETENTION_WEATHER_DAYS,
+    'weather_rollups': RETENTION_WEATHER_ROLLUP_DAYS,
+}
+
+
+class TableReport(NamedTuple):
+    table: str
+    max_age_days: Optional[float]
+    cutoff: Optional[datetime]      # rows older than this are deleted
+    rows: int
+    expired_rows: int
+    pages: Optional[int]            # pages of the table and its indexes (None without dbstat)
+    expired_pages: Optional[int]    # estimated in proportion to the expired rows
+
+
+def _scopes(conn: sqlite3.Connection, table: RetentionTable, cutoff: int) -> List[Tuple[tuple, int]]:
+    """(scope values, aligned cutoff) pairs; scope values are (id,) or (id, resolution)"""
+    ids = [row[0] for row in conn.execute(table.scopes_sql)]
+    if not table.resolutions:
+        return [((scope_id,), cutoff - cutoff % table.align) for scope_id in ids]
+    # A bucket is deleted once it ends at or before the cutoff
+    return [((scope_id, resolution), cutoff - cutoff % resolution)
+            for scope_id in ids for resolution in table.resolutions]
+
+
+def _scope_sql(table: RetentionTable) -> str:
+    return f"{table.scope_column} = ?" + (" AND resolution = ?" if table.resolutions else "")
+
+
+def _cutoff(now: datetime, days: float) -> int:
+    return to_epoch(now) - int(days * 86400)
+
+
+@contextmanager
+def _immediate(conn: sqlite3.Connection):
+    """Write transaction that takes the lock up front (a deferred one could fail to upgrade under WAL)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _subtract_sensor_stats(conn: sqlite3.Connection, device_id: int, bound: int):
+    """Takes the readings of a device older than bound out of its running aggregates (before deleting them)"""
+    sums = ', '.join(f'SUM({name}), SUM({name} * {name})' for name in SENSOR_VALUES)
+    row = conn.execute(f'''
+        SELECT COUNT(*), {sums} FROM sensor_readings WHERE device_id = ? AND ts < ?
+    ''', (device_id, bound)).fetchone()
+    if not row[0]:
+        return
+    updates = ', '.join(
+        f'sum_{name} = sum_{name} - ?, sumsq_{name} = sumsq_{name} - ?' for name in SENSOR_VALUES
+    )
+    conn.execute(f'''
+        UPDATE sensor_stats SET record_count = record_count - ?, {updates}
+        WHERE device_id = ?
+    ''', tuple(row) + (device_id,))
+
+
+def _refresh_sensor_stats_start(conn: sqlite3.Connection, device_id: int):
+    """Moves the first timestamp of a device to its oldest kept reading (after deleting older ones)"""
+    conn.execute('''
+        UPDATE sensor_stats SET
+            min_ts = (SELECT ts FROM sensor_readings WHERE device_id = ?1 ORDER BY ts LIMIT 1),
+            min_timestamp = (SELECT timestamp FROM sensor_readings WHERE device_id = ?1 ORDER BY ts LIMIT 1)
+        WHERE device_id = ?1
+    ''', (device_id,))
+    # No readings left: same state as after rebuild_stats
+    conn.execute('DELETE FROM sensor_stats WHERE device_id = ? AND record_count <= 0', (device_id,))
+
+
+def _delete_batch(conn: sqlite3.Connection, table: RetentionTable, scope: tuple, cutoff: int,
+                  batch_rows: int) -> Tuple[int, bool]:
+    """Deletes about batch_rows of the oldest expired rows of a scope; returns (rows, whether the scope is done)"""
+    where = _scope_sql(table)
+    time_column = table.time_column
+    oldest = conn.execute(f'''
+        SELECT {time_column} FROM {table.name} WHERE {where} AND {time_column} < ?
+        ORDER BY {time_column} LIMIT 1
+    ''', scope + (cutoff,)).fetchone()
+    if oldest is None:
+        return 0, True
+    following = conn.execute(f'''
+        SELECT {time_column} FROM {table.name} WHERE {where} AND {time_column} < ?
+        ORDER BY {time_column} LIMIT 1 OFFSET ?
+    ''', scope + (cutoff, batch_rows)).fetchone()
+    # Rows with the same time stay in one batch, which holds at least the oldest time
+    bound = cutoff if following is None else max(following[0], oldest[0] + 1)
+
+    if table.name == 'sensor_readings':
+        _subtract_sensor_stats(conn, scope[0], bound)
+    deleted = conn.execute(f'''
+        DELETE FROM {table.name} WHERE {where} AND {time_column} < ?
+    ''', scope + (bound,)).rowcount
+    if table.name == 'sensor_readings':
+        _refresh_sensor_stats_start(conn, scope[0])
+    return deleted, bound >= cutoff
+
+
+def apply_retention(conn: sqlite3.Connection, policy: Dict[str, Optional[float]],
+                    now: Optional[datetime] = None, stop: Optional[threading.Event] = None,
+                    max_batch_seconds: float = MAX_BATCH_SECONDS, pause: float = BATCH_PAUSE) -> Dict[str, int]:
+    """Deletes the rows older than the policy's max age of their table; returns deleted rows per table
+
+    Setting stop ends the run after the current batch.
+    """
+    now = now or datetime.now()
+    deleted = {}
+    for name, days in policy.items():
+        if days is None:
+            continue
+        table = TABLES[name]
+        deleted[name] = 0
+        for scope, cutoff in _scopes(conn, table, _cutoff(now, days)):
+            batch_rows = BATCH_ROWS
+            done = False
+            while not done:
+                with _immediate(conn):
+                    started = time.perf_counter()
+                    count, done = _delete_batch(conn, table, scope, cutoff, batch_rows)
+                    elapsed = time.perf_counter() - started
+                deleted[name] += count
+                if elapsed > max_batch_seconds:
+                    batch_rows = max(batch_rows // 2, MIN_BATCH_ROWS)
+                elif elapsed < max_batch_seconds / 4:
+                    batch_rows = min(batch_rows * 2, MAX_BATCH_ROWS)
+                # Gives waiting writers the lock between batches
+                if stop is not None:
+                    if stop.wait(pause):
+                        return deleted
+                elif not done:
+                    time.sleep(pause)
+        if deleted[name]:
+            logger.info(f"Retention deleted {deleted[name]} rows from {name} older than {days:g} days")
+    return deleted
+
+
+def auto_vacuum_mode(conn: sqlite3.Connection) -> str:
+    return AUTO_VACUUM_MODES[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+
+
+def incremental_vacuum(conn: sqlite3.Connection, max_pages: Optional[int] = None,
+                       step_pages: int = VACUUM_STEP_PAGES, pause: float = BATCH_PAUSE,
+                       stop: Optional[threading.Event] = None) -> int:
+    """Hands free pages back to the file system in small steps; returns the pages freed
+
+    Does nothing unless the file uses auto_vacuum=INCREMENTAL.
+    """
+    if auto_vacuum_mode(conn) != 'incremental':
+        return 0
+    freed = 0
+    while max_pages is None or freed < max_pages:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free == 0:
+            break
+        step = min(step_pages, free) if max_pages is None else min(step_pages, free, max_pages - freed)
+        # The pragma frees one page per step of the statement; execute() would step it once
+        conn.executescript(f"PRAGMA incremental_vacuum({step})")
+        left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if left >= free:
+            break
+        freed += free - left
+        if stop is not None:
+            if stop.wait(pause):
+                break
+        else:
+            time.sleep(pause)
+    # The file shrinks when the WAL is checkpointed; PASSIVE never waits for readers or writers
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return freed
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Converts a file to auto_vacuum=INCREMENTAL; returns False if it already was
+
+    Runs a full VACUUM, which rewrites the file and blocks writers while it runs.
+    """
+    if auto_vacuum_mode(conn) == 'incremental':
+        return False
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def _table_pages(conn: sqlite3.Connection) -> Optional[Dict[str, int]]:
+    """Pages per table including its indexes, or None if SQLite was built without dbstat (reads every page)"""
+    try:
+        rows = conn.execute('''
+            SELECT m.tbl_name, COUNT(*) FROM dbstat AS s
+            JOIN sqlite_master AS m ON m.name = s.name
+            GROUP BY m.tbl_name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return dict(rows)
+
+
+def retention_report(conn: sqlite3.Connection, policy: Dict[str, Optional[float]],
+                     now: Optional[datetime] = None) -> dict:
+    """What apply_retention would delete and reclaim (dry run)"""
+    now = now or datetime.now()
+    pages = _table_pages(conn)
+    tables = []
+    for name, table in TABLES.items():
+        days = policy.get(name)
+        if name == 'sensor_readings':
+            # Running aggregates instead of a scan of the largest table
+            rows = conn.execute('SELECT COALESCE(SUM(record_count), 0) FROM sensor_stats').fetchone()[0]
+        else:
+            rows = conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+        expired = 0
+        cutoff = None
+        if days is not None:
+            cutoff = _cutoff(now, days)
+            for scope, scope_cutoff in _scopes(conn, table, cutoff):
+                expired += conn.execute(f'''
+                    SELECT COUNT(*) FROM {name} WHERE {_scope_sql(table)} AND {table.time_column} < ?
+                ''', scope + (scope_cutoff,)).fetchone()[0]
+            cutoff = from_epoch(cutoff - cutoff % table.align)
+        table_pages = pages.get(name, 0) if pages is not None else None
+        expired_pages = round(table_pages * expired / rows) if table_pages is not None and rows else \
+            (0 if table_pages is not None else None)
+        tables.append(TableReport(name, days, cutoff, rows, expired, table_pages, expired_pages))
+
+    return {
+        'tables': tables,
+        'page_size': conn.execute("PRAGMA page_size").fetchone()[0],
+        'page_count': conn.execute("PRAGMA page_count").fetchone()[0],
+        'free_pages': conn.execute("PRAGMA freelist_count").fetchone()[0],
+        'auto_vacuum': auto_vacuum_mode(conn),
+    }
+
+
+def run_retention(database, policy: Dict[str, Optional[float]] = DEFAULT_POLICY,
+                  stop: Optional[threading.Event] = None) -> Tuple[Dict[str, int], int]:
+    """One retention run: expired rows, then their pages; returns (deleted rows per table, pages freed)"""
+    deleted = database.apply_retention(policy, stop=stop)
+    freed = 0
+    if stop is None or not stop.is_set():
+        freed = database.incremental_vacuum(stop=stop)
+    return deleted, freed
+
+
+def start_retention(database, policy: Dict[str, Optional[float]] = DEFAULT_POLICY,
+                    interval: float = RETENTION_INTERVAL) -> Optional[threading.Event]:
+    """Runs retention every interval seconds on a daemon thread (nothing to do if every table is kept forever)"""
+    if all(days is None for days in policy.values()):
+        return None
+    stop = threading.Event()
+
+    def loop():
+        delay = RETENTION_START_DELAY
+        while not stop.wait(delay):
+            delay = interval
+            try:
+                deleted, freed = run_retention(database, policy, stop)
+                logger.info(f"Retention run deleted {sum(deleted.values())} rows and freed {freed} pages")
+            except Exception as e:
+                if stop.is_set():
+                    return
+                logger.warning(f"Retention run failed: {e}")
+
+    thread = threading.Thread(target=loop, name="retention", daemon=True)
+    thread.start()
+    ages = ', '.join(f"{name} {days:g}d" for name, days in policy.items() if days is not None)
+    logger.info(f"Retention every {interval:.0f}s: {ages}")
+    return stop
+
+
+def print_report(report: dict):
+    print(f"{'table':<18}{'max age':>9}  {'cutoff':<17}{'rows':>12}{'expired':>12}{'pages':>10}{'expired':>10}")
+    for table in report['tables']:
+        age = f"{table.max_age_days:g}d" if table.max_age_days is not None else 'forever'
+        cutoff = f"{table.cutoff:%Y-%m-%d %H:%M}" if table.cutoff is not None else '-'
+        pages = f"{table.pages:,}" if table.pages is not None else '-'
+        expired_pages = f"{table.expired_pages:,}" if table.expired_pages is not None else '-'
+        print(f"{table.table:<18}{age:>9}  {cutoff:<17}{table.rows:>12,}{table.expired_rows:>12,}"
+              f"{pages:>10}{expired_pages:>10}")
+    page_size = report['page_size']
+    print(f"File: {report['page_count']:,} pages of {page_size} bytes "
+          f"({report['page_count'] * page_size / 1e6:.1f} MB), {report['free_pages']:,} free "
+          f"({report['free_pages'] * page_size / 1e6:.1f} MB), auto_vacuum={report['auto_vacuum']}")
+    if report['auto_vacuum'] != 'incremental':
+        print("Free pages stay in the file until it is converted with --convert (one full VACUUM)")
+
+
+def main():
+    from .combined_database import PlantDatabase
+
+    parser = argparse.ArgumentParser(description="Delete data older than a max age and reclaim its space")
+    parser.add_argument('--database', default='data/plant_data.db')
+    for name, option in (('sensor_readings', '--sensor-days'), ('sensor_rollups', '--sensor-rollup-days'),
+                         ('weather_data', '--weather-days'), ('weather_rollups', '--weather-rollup-days')):
+        parser.add_argument(option, type=float, default=DEFAULT_POLICY[name],
+                            help=f"max age of {name} (default from the environment; 0 keeps it forever)")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would be deleted")
+    parser.add_argument('--convert', action='store_true',
+                        help="switch the file to auto_vacuum=INCREMENTAL (full VACUUM, blocks writers)")
+    parser.add_argument('--vacuum-pages', type=int, default=None, help="free at most this many pages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    policy = {
+        'sensor_readings': args.sensor_days, 'sensor_rollups': args.sensor_rollup_days,
+        'weather_data': args.weather_days, 'weather_rollups': args.weather_rollup_days,
+    }
+    policy = {name: days if days else None for name, days in policy.items()}
+    with PlantDatabase(args.database) as database:
+        print_report(database.get_retention_report(policy))
+        if args.dry_run:
+            return
+        started = time.perf_counter()
+        deleted = database.apply_retention(policy)
+        print(f"Deleted {sum(deleted.values()):,} rows in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        # Converting after the deletes compacts the file in the same pass
+        if args.convert and database.enable_incremental_vacuum():
+            print(f"Converted to auto_vacuum=INCREMENTAL in {time.perf_counter() - started:.1f}s")
+        else:
+            freed = database.incremental_vacuum(max_pages=args.vacuum_pages)
+            print(f"Freed {freed:,} pages in {time.perf_counter() - started:.1f}s")
+        print_report(database.get_retention_report(policy))
+
+
+if __name__ == "__main__":
+    main()
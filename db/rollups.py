@@ -0,0 +1,125 @@
+"""
+Multi-resolution rollups of sensor_readings and weather_data
+
+Sensor readings are append-only, so their per-device rollups are merged
+incrementally by an insert trigger (created in migration 9). Weather rows are
+revised by the collector, so their rollups are recomputed from the raw rows,
+but only for the location and buckets spanned by each stored batch.
+"""
+
+import sqlite3
+from typing import List, Sequence
+
+# Bucket widths in seconds, finest first
+SENSOR_RESOLUTIONS = (60, 3600, 86400)
+WEATHER_RESOLUTIONS = (86400, 7 * 86400)
+
+SENSOR_VALUES = ('moisture', 'light', 'temperature')
+WEATHER_VALUES = ('temperature', 'humidity', 'pressure', 'wind_speed', 'precipitation')
+
+# Series rows returned by PlantDatabase.get_sensor_series / get_weather_series are
+# (ts, count) followed by (min, avg, max, last) for every value column.
+SERIES_AGGREGATES = ('min', 'avg', 'max', 'last')
+
+
+def series_columns(values: Sequence[str]) -> List[str]:
+    """Returns the column names of series rows for the given value columns"""
+    columns = ['ts', 'count']
+    for value in values:
+        columns.extend(f"{aggregate}_{value}" for aggregate in SERIES_AGGREGATES)
+    return columns
+
+
+def sensor_rollup_upsert_sql(resolution: int) -> str:
+    """UPSERT merging the NEW row into its device's sensor bucket (runs inside the insert trigger)"""
+    columns = ['device_id', 'resolution', 'bucket', 'record_count', 'last_ts']
+    values = ['NEW.device_id', str(resolution), f"NEW.ts - NEW.ts % {resolution}", '1', 'NEW.ts']
+    updates = []
+    for name in SENSOR_VALUES:
+        columns += [f'sum_{name}', f'min_{name}', f'max_{name}', f'last_{name}']
+        values += [f'NEW.{name}'] * 4
+        updates += [
+            f'sum_{name} = sum_{name} + excluded.sum_{name}',
+            f'min_{name} = MIN(min_{name}, excluded.min_{name})',
+            f'max_{name} = MAX(max_{name}, excluded.max_{name})',
+            f'last_{name} = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_{name} ELSE last_{name} END',
+        ]
+    # SET expressions all see the pre-update row, so the CASEs above compare with the old last_ts
+    updates += ['record_count = record_count + 1', 'last_ts = MAX(last_ts, excluded.last_ts)']
+    return f'''
+            INSERT INTO sensor_rollups ({', '.join(columns)})
+            VALUES ({', '.join(values)})
+            ON CONFLICT (device_id, resolution, bucket) DO UPDATE SET
+                {', '.join(updates)};'''
+
+
+def rebuild_sensor_rollups(conn: sqlite3.Connection):
+    """Recomputes every sensor bucket of every device from the raw rows (one pass per resolution)"""
+    conn.execute('DELETE FROM sensor_rollups')
+    aggregates = ', '.join(
+        f'SUM({name}) AS sum_{name}, MIN({name}) AS min_{name}, MAX({name}) AS max_{name}'
+        for name in SENSOR_VALUES
+    )
+    outputs = ', '.join(
+        f'g.sum_{name}, g.min_{name}, g.max_{name}, r.{name}' for name in SENSOR_VALUES
+    )
+    columns = ', '.join(
+        f'sum_{name}, min_{name}, max_{name}, last_{name}' for name in SENSOR_VALUES
+    )
+    for resolution in SENSOR_RESOLUTIONS:
+        # "last" values come from the newest row of each bucket
+        conn.execute(f'''
+            INSERT INTO sensor_rollups (device_id, resolution, bucket, record_count, last_ts, {columns})
+            SELECT g.device_id, {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT device_id, ts - ts % {resolution} AS bucket, COUNT(*) AS record_count,
+                       MAX(ts) AS last_ts, {aggregates}
+                FROM sensor_readings
+                WHERE ts IS NOT NULL
+                GROUP BY device_id, bucket
+            ) AS g
+            JOIN sensor_readings AS r
+              ON r.id = (SELECT MAX(id) FROM sensor_readings WHERE device_id = g.device_id AND ts = g.last_ts)
+        ''')
+
+
+def refresh_weather_rollups(conn: sqlite3.Connection, location_id: int, min_ts: int, max_ts: int):
+    """Recomputes the weather buckets of a location overlapping [min_ts, max_ts] from the raw rows"""
+    aggregates = ', '.join(
+        f'MIN({name}) AS min_{name}, AVG({name}) AS avg_{name}, MAX({name}) AS max_{name}'
+        for name in WEATHER_VALUES
+    )
+    outputs = ', '.join(
+        f'g.min_{name}, g.avg_{name}, g.max_{name}, w.{name}' for name in WEATHER_VALUES
+    )
+    columns = ', '.join(
+        f'min_{name}, avg_{name}, max_{name}, last_{name}' for name in WEATHER_VALUES
+    )
+    for resolution in WEATHER_RESOLUTIONS:
+        start = min_ts - min_ts % resolution
+        end = max_ts - max_ts % resolution + resolution
+        conn.execute(f'''
+            INSERT OR REPLACE INTO weather_rollups
+                (location_id, resolution, bucket, record_count, last_ts, {columns})
+            SELECT ?1, {resolution}, g.bucket, g.record_count, g.last_ts, {outputs}
+            FROM (
+                SELECT ts - ts % {resolution} AS bucket, COUNT(*) AS record_count, MAX(ts) AS last_ts,
+                       {aggregates}
+                FROM weather_data
+                WHERE location_id = ?1 AND ts >= ?2 AND ts < ?3
+                GROUP BY bucket
+            ) AS g
+            JOIN weather_data AS w ON w.location_id = ?1 AND w.ts = g.last_ts
+        ''', (location_id, start, end))
+
+
+def rebuild_weather_rollups(conn: sqlite3.Connection):
+    """Recomputes every weather bucket of every location from the raw rows"""
+    conn.execute('DELETE FROM weather_rollups')
+    bounds = conn.execute('''
+        SELECT location_id, MIN(ts), MAX(ts) FROM weather_data
+        WHERE ts IS NOT NULL
+        GROUP BY location_id
+    ''').fetchall()
+    for location_id, min_ts, max_ts in bounds:
+        refresh_weather_rollups(conn, location_id, min_ts, max_ts)
@@ -0,0 +1,19 @@
+import calendar
+from datetime import datetime, timedelta
+
+# Integer time columns (ts) hold the naive local wall-clock time expressed as
+# seconds since 1970-01-01 00:00:00, i.e. the value SQLite's strftime('%s', ...)
+# returns for the stored TEXT timestamps. This keeps ts ordering identical to
+# the text ordering and lets migrations backfill in pure SQL.
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(dt: datetime) -> int:
+    """Converts a naive wall-clock datetime to an integer ts value"""
+    return calendar.timegm(dt.timetuple())
+
+
+def from_epoch(ts: int) -> datetime:
+    """Converts an integer ts value back to a naive wall-clock datetime"""
+    return _EPOCH + timedelta(seconds=ts)
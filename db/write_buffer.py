@@ -0,0 +1,163 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Durability(Enum):
+    """How sensor readings are committed"""
+    IMMEDIATE = 'immediate'  # one fsync'd commit (synchronous=FULL) per call, before save_reading returns
+    GROUP = 'group'          # samples batched into one fsync'd commit per flush
+    RELAXED = 'relaxed'      # batched like GROUP, but without fsync (may lose the last batches on power loss)
+
+
+class WriteBufferFull(Exception):
+    """Raised when the write queue stays full longer than the put timeout"""
+
+
+class _FlushRequest:
+    """Queue marker asking the writer to commit everything queued before it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_TIME_THRESHOLD = object()
+
+
+class ReadingWriteBuffer:
+    """Bounded in-memory queue drained by a background writer thread"""
+
+    def __init__(self, database, durability: Durability = Durability.GROUP, max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0, put_timeout: float = 5.0):
+        if durability == Durability.IMMEDIATE:
+            raise ValueError("IMMEDIATE durability writes directly and does not use a write buffer")
+
+        self.database = database
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # seconds a sample may wait before being committed
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # Counters
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        """Starts the background writer thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="reading-writer", daemon=True)
+        self._thread.start()
+        # Last-resort flush if the owner forgets to call close()
+        atexit.register(self.close)
+
+    def put(self, row: Tuple, timeout: Optional[float] = None):
+        """Queues a reading row, blocking while the queue is full (backpressure)
+
+        timeout overrides put_timeout; 0 fails at once instead of blocking.
+        """
+        if self._stopping:
+            raise WriteBufferFull("Write buffer is closed")
+        if timeout is None:
+            timeout = self.put_timeout
+        try:
+            self._queue.put(row, timeout=timeout)
+        except queue.Full:
+            raise WriteBufferFull(f"Write queue full ({self._queue.maxsize} readings) for {timeout}s")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every reading queued before this call is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 30.0):
+        """Flushes the queue and stops the writer thread"""
+        if self._thread is None or self._stopping:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        # A dead writer never drains a full queue, so the stop marker must not wait for space
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                logger.error(f"Write buffer did not drain; {self._queue.qsize()} readings not written")
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def pending(self) -> int:
+        """Returns the approximate number of queued readings"""
+        return self._queue.qsize()
+
+    def _run(self):
+        """Writer loop: collects a batch until the size or time threshold is hit, then commits it"""
+        conn = self.database._connections.get_connection()
+        synchronous = 'OFF' if self.durability == Durability.RELAXED else 'FULL'
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+
+        batch: List[Tuple] = []
+        waiters: List[_FlushRequest] = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _TIME_THRESHOLD
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            elif isinstance(item, _FlushRequest):
+                waiters.append(item)
+
+            # Size threshold, time threshold, flush request or shutdown: commit now
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            deadline = None
+            for waiter in waiters:
+                waiter.done.set()
+            waiters = []
+
+            if item is None:
+                break
+
+    def _write_batch(self, batch: List[Tuple]):
+        """Commits one batch, retrying briefly if the database is locked"""
+        for attempt in range(3):
+            try:
+                self.database.save_readings(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Reading batch write failed (attempt {attempt + 1}/3): {e}")
+                time.sleep(0.1 * (attempt + 1))
+            except Exception as e:
+                logger.error(f"Error writing reading batch: {e}")
+                break
+        self.failed += len(batch)
+        logger.error(f"Dropped {len(batch)} readings after failed writes")
@@ -6,42 +6,47 @@ Combines plant monitoring and weather data collection functionality
 
 import sys
 from Plant.controller import SystemController
+from Plant.startup_timer import StartupTimer
 from meteo_data.weather_collector import WeatherCollector
 from db.combined_database import PlantDatabase
+from db.retention import start_retention
+from metrics.export import start_exporter
+from sensors.config import SERIAL_PORT, SERIAL_BAUDRATE, SERIAL_PROTOCOL
+from sensors.serial_ingest import make_parser, open_serial
 
 
 def main():
     """Main function to run the application"""
+    timer = StartupTimer()
     print("Starting Plant Monitoring System...")
     
+    # Latency metrics are written periodically when METRICS_FILE is set
+    start_exporter()
+    
     # Initialize shared database
     database = PlantDatabase()
+    timer.mark("database ready")
+    
+    # Old rows are deleted in the background when RETENTION_*_DAYS are set
+    start_retention(database)
     
     # Initialize weather collector with shared database
     weather_collector = WeatherCollector(database)
     
-    # Collect weather data on startup
-    print("Collecting weather data...")
-    try:
-        weather_collector.collect_missing_data()
-        weather_collector.collect_hourly_data(hours_back=1)
-        
-        # Show latest weather data
-        latest_weather = database.get_latest_weather_data(3)
-        if latest_weather and len(latest_weather) > 0:
-            print(f"Latest weather data collected: {len(latest_weather)} records")
-            latest = latest_weather[0]
-            print(f"Most recent: {latest['date']} {latest['time']} - Temp: {latest['temperature']}°C, Humidity: {latest['humidity']}%")
-        else:
-            print("No weather data available")
-    except Exception as e:
-        print(f"Weather data collection failed: {e}")
-    
-    # Start the plant monitoring GUI
+    # Start the plant monitoring GUI; weather data is collected in the background
     print("Starting Plant Monitoring GUI...")
-    app = SystemController()
+    app = SystemController(database, startup_timer=timer)
+    app.start_weather_catch_up(weather_collector)
+    
+    # Read the Arduino when a serial port is configured, otherwise readings are simulated
+    if SERIAL_PORT:
+        try:
+            app.start_sensor_ingestion(open_serial(SERIAL_PORT, SERIAL_BAUDRATE), make_parser(SERIAL_PROTOCOL))
+            print(f"Reading sensors from {SERIAL_PORT}")
+        except Exception as e:
+            print(f"Could not open serial port {SERIAL_PORT}: {e}")
     app.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
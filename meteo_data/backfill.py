@@ -0,0 +1,151 @@
+"""
+Chunked, concurrent historical weather backfill
+
+A range of any length is split into API-sized chunks of whole days, which are
+fetched in parallel over the client's pooled session. Each request carries the
+coordinates of up to locations_per_request locations, so the number of
+requests grows with the length of the range, not with the number of sites.
+At most max_workers requests are in flight, and every response is written to
+the database as soon as it arrives, so memory use does not grow with the
+length of the range.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from metrics.registry import timed, timer
+from .config import BACKFILL_CHUNK_DAYS, BACKFILL_WORKERS, LOCATIONS_PER_REQUEST
+from .conversion import hourly_rows
+from .locations import Location
+from .open_meteo_client import FORECAST_HISTORY_DAYS, OpenMeteoClient
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillResult(NamedTuple):
+    """Outcome of Backfill.run"""
+    new: int
+    updated: int
+    unchanged: int
+    requests: int
+    failed_chunks: List[Tuple[date, date, str]]  # (start, end, error) of requests that were not stored
+    seconds: float
+
+
+def split_range(start_date: date, end_date: date, chunk_days: int, today: Optional[date] = None) -> List[Tuple[date, date]]:
+    """Splits start_date..end_date (inclusive) into chunks of at most chunk_days days
+
+    Chunks never straddle the boundary between archive and forecast data, so
+    each one is served by a single endpoint.
+    """
+    today = today or date.today()
+    boundary = today - timedelta(days=FORECAST_HISTORY_DAYS)
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        if chunk_start < boundary <= chunk_end:
+            chunk_end = boundary - timedelta(days=1)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def batch_locations(locations: Sequence[Location], size: int) -> List[List[Location]]:
+    """Groups locations into batches of at most size that share a timezone (one request each)"""
+    batches = []
+    by_timezone = sorted(locations, key=lambda location: location.timezone)
+    for _, group in groupby(by_timezone, key=lambda location: location.timezone):
+        group = list(group)
+        batches.extend(group[i:i + size] for i in range(0, len(group), size))
+    return batches
+
+
+class Backfill:
+    """Fetches a time range in parallel chunks and streams each chunk into the database"""
+
+    def __init__(self, database, client: OpenMeteoClient, locations: Sequence[Location],
+                 chunk_days: int = BACKFILL_CHUNK_DAYS, max_workers: int = BACKFILL_WORKERS,
+                 locations_per_request: int = LOCATIONS_PER_REQUEST):
+        self.database = database
+        self.client = client
+        self.locations = list(locations)  # with database ids
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.locations_per_request = locations_per_request
+
+    @timed('weather.backfill', rows=lambda result: result.new + result.updated + result.unchanged)
+    def run(self, start_time: datetime, end_time: datetime,
+            progress: Optional[Callable[[int, int], None]] = None,
+            chunks: Optional[List[Tuple[date, date, Sequence[Location]]]] = None,
+            stop: Optional[threading.Event] = None) -> BackfillResult:
+        """Stores the hourly data between start_time and end_time; progress(done, total) after each request
+
+        chunks are (start_date, end_date, locations) to fetch, e.g. from the
+        FetchPlanner; by default the whole range of every location is split
+        into chunk_days chunks. Once stop is set no further request is sent;
+        the ones in flight are still stored.
+        """
+        started = time.perf_counter()
+        if chunks is None:
+            chunks = [(chunk_start, chunk_end, self.locations) for chunk_start, chunk_end
+                      in split_range(start_time.date(), end_time.date(), self.chunk_days)]
+        requests = [(chunk_start, chunk_end, batch) for chunk_start, chunk_end, locations in chunks
+                    for batch in batch_locations(locations, self.locations_per_request)]
+        new = updated = unchanged = 0
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backfill") as pool:
+            remaining = iter(requests)
+            in_flight = {}
+
+            def submit_next():
+                if stop is not None and stop.is_set():
+                    return
+                request = next(remaining, None)
+                if request is not None:
+                    chunk_start, chunk_end, batch = request
+                    coordinates = [(location.latitude, location.longitude) for location in batch]
+                    future = pool.submit(self.client.fetch_hourly_many, coordinates, chunk_start, chunk_end,
+                                         batch[0].timezone)
+                    in_flight[future] = request
+
+            for _ in range(self.max_workers):
+                submit_next()
+
+            done_count = 0
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_start, chunk_end, batch = in_flight.pop(future)
+                    submit_next()
+                    done_count += 1
+                    try:
+                        # Writes stay on this thread, so SQLite sees one writer
+                        for location, hourly in zip(batch, future.result()):
+                            with timer('weather.convert') as conversion:
+                                rows = list(hourly_rows(hourly, start_time, end_time))
+                                conversion.rows = len(rows)
+                            counts = self.database.upsert_weather_data(rows, update_changed=True,
+                                                                       location_id=location.id)
+                            new += counts[0]
+                            updated += counts[1]
+                            unchanged += counts[2]
+                    except Exception as e:
+                        logger.error(f"Backfill chunk {chunk_start} - {chunk_end} ({len(batch)} locations) "
+                                     f"failed: {e}")
+                        failed.append((chunk_start, chunk_end, str(e)))
+                    if progress is not None:
+                        progress(done_count, len(requests))
+
+        if done_count < len(requests):
+            logger.info(f"Backfill stopped after {done_count} of {len(requests)} requests")
+        result = BackfillResult(new, updated, unchanged, done_count, failed, time.perf_counter() - started)
+        logger.info(f"Backfill {start_time} - {end_time}: {new} new, {updated} updated, {unchanged} unchanged "
+                    f"in {result.requests} requests ({len(failed)} failed) in {result.seconds:.1f}s")
+        return result
@@ -15,8 +15,33 @@ DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/weather_data.db')
 BYDGOSZCZ_LAT = 53.1235
 BYDGOSZCZ_LON = 18.0084
 
-# Collection settings
-COLLECTION_INTERVAL_HOURS = 1
+# Collected locations as "name:latitude:longitude[:timezone]" separated by ";"
+# (default: Bydgoszcz only), and coordinates sent in one multi-location request
+WEATHER_LOCATIONS = os.getenv('WEATHER_LOCATIONS', '')
+LOCATIONS_PER_REQUEST = int(os.getenv('LOCATIONS_PER_REQUEST', '50'))
+
+# Open-Meteo endpoints (point them at meteo_data.stub_server for offline testing)
+OPEN_METEO_URL = os.getenv('OPEN_METEO_URL', 'https://api.open-meteo.com/v1/forecast')
+OPEN_METEO_ARCHIVE_URL = os.getenv('OPEN_METEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
+TIMEZONE = 'Europe/Warsaw'
+
+# Historical backfill: days per request and parallel requests
+BACKFILL_CHUNK_DAYS = int(os.getenv('BACKFILL_CHUNK_DAYS', '31'))
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '4'))
+
+# On-disk response cache (empty WEATHER_CACHE_DIR disables it; WEATHER_OFFLINE=1 serves from the cache only)
+WEATHER_CACHE_DIR = os.getenv('WEATHER_CACHE_DIR', 'data/http_cache')
+WEATHER_CACHE_FORECAST_TTL = float(os.getenv('WEATHER_CACHE_FORECAST_TTL', '900'))
+WEATHER_CACHE_SETTLE_HOURS = float(os.getenv('WEATHER_CACHE_SETTLE_HOURS', '48'))
+WEATHER_CACHE_SWEEP_HOURS = float(os.getenv('WEATHER_CACHE_SWEEP_HOURS', '24'))
+WEATHER_CACHE_OFFLINE = os.getenv('WEATHER_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+
+# Collection settings: the daemon runs every COLLECTION_INTERVAL_HOURS on the wall clock,
+# COLLECTION_OFFSET_MINUTES past the hour plus up to COLLECTION_JITTER_SECONDS of random delay
+COLLECTION_INTERVAL_HOURS = float(os.getenv('COLLECTION_INTERVAL_HOURS', '1'))
+COLLECTION_OFFSET_MINUTES = float(os.getenv('COLLECTION_OFFSET_MINUTES', '5'))
+COLLECTION_JITTER_SECONDS = float(os.getenv('COLLECTION_JITTER_SECONDS', '120'))
+COLLECTOR_LOCK_FILE = os.getenv('COLLECTOR_LOCK_FILE', 'data/weather_collector.lock')
 INITIAL_BACKFILL_HOURS = 24
 
 # Logging configuration
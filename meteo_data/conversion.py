@@ -0,0 +1,63 @@
+"""
+Columnar conversion of Open-Meteo responses into weather_data rows
+
+Open-Meteo returns hourly data as one list per variable plus a list of ISO
+local times ("2024-05-01T13:00"). The rows for PlantDatabase.upsert_weather_data
+are built by zipping column slices, without DataFrames, datetime objects or
+per-row dicts: the ISO strings sort like the times they encode, so the
+requested range is found with a binary search, and the stored date and time
+texts are slices of the ISO strings.
+"""
+
+import bisect
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+# Hourly variables requested from Open-Meteo, in weather_data column order
+HOURLY_VARIABLES = (
+    'temperature_2m',
+    'relative_humidity_2m',
+    'surface_pressure',
+    'wind_speed_10m',
+    'wind_direction_10m',
+    'precipitation',
+    'visibility',
+)
+
+
+def _range_bounds(times: List[str], start_time: Optional[datetime], end_time: Optional[datetime]) -> Tuple[int, int]:
+    """Index range of the sorted ISO minute times within [start_time, end_time]"""
+    low, high = 0, len(times)
+    if start_time is not None:
+        key = start_time.strftime('%Y-%m-%dT%H:%M')
+        # A start with seconds lies after the minute it is formatted to
+        if start_time.second or start_time.microsecond:
+            low = bisect.bisect_right(times, key)
+        else:
+            low = bisect.bisect_left(times, key)
+    if end_time is not None:
+        high = bisect.bisect_right(times, end_time.strftime('%Y-%m-%dT%H:%M'))
+    return low, max(low, high)
+
+
+def hourly_rows(hourly: dict, start_time: Optional[datetime] = None,
+                end_time: Optional[datetime] = None) -> Iterator[Tuple]:
+    """Returns (date, time, temperature, humidity, pressure, wind_speed, wind_direction,
+    precipitation, visibility) tuples for the hours between start_time and end_time"""
+    times = hourly['time']
+    if all(earlier < later for earlier, later in zip(times, times[1:])):
+        low, high = _range_bounds(times, start_time, end_time)
+        times = times[low:high]
+        columns = [hourly.get(name, [None] * len(hourly['time']))[low:high] for name in HOURLY_VARIABLES]
+    else:
+        # Unsorted input: filter by comparing every time (not expected from the API)
+        start_key = start_time.strftime('%Y-%m-%dT%H:%M:%S') if start_time else ''
+        end_key = end_time.strftime('%Y-%m-%dT%H:%M:%S') if end_time else '\uffff'
+        keep = [i for i, time in enumerate(times) if start_key <= time + ':00' <= end_key]
+        times = [times[i] for i in keep]
+        columns = [[hourly[name][i] for i in keep] if name in hourly else [None] * len(keep)
+                   for name in HOURLY_VARIABLES]
+
+    dates = [time[:10] for time in times]
+    clock_times = [time[11:16] + ':00' for time in times]
+    return zip(dates, clock_times, *columns)
@@ -8,6 +8,7 @@ import sqlite3
 import os
 import logging
 from datetime import datetime
+from db.retention import auto_vacuum_mode, incremental_vacuum
 from .config import DATABASE_PATH
 
 # Configure logging
@@ -68,9 +69,14 @@ class DatabaseCleaner:
         """Vacuum the database to reclaim space after deletion"""
         try:
             conn = sqlite3.connect(self.db_path)
-            conn.execute("VACUUM")
+            # Incremental files hand free pages back without rewriting (and locking) the whole file
+            if auto_vacuum_mode(conn) == 'incremental':
+                pages = incremental_vacuum(conn, pause=0)
+                logger.info(f"Freed {pages} pages to reclaim space")
+            else:
+                conn.execute("VACUUM")
+                logger.info("Database has been vacuumed to reclaim space")
             conn.close()
-            logger.info("Database has been vacuumed to reclaim space")
         except Exception as e:
             logger.error(f"Error vacuuming database: {e}")
 
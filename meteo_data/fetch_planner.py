@@ -0,0 +1,161 @@
+"""
+Coverage-aware planning of Open-Meteo requests
+
+The planner compares the requested time range of each location with the
+weather_coverage index and returns only the hours that are missing, grouped
+into the fewest API calls: gaps close enough to share a request window are
+fetched together, every call carries all locations missing data in its
+window, and no call is planned at all when the ranges are already complete.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from db.coverage import COVERAGE_STEP
+from db.timestamps import from_epoch, to_epoch
+from .config import BACKFILL_CHUNK_DAYS, TIMEZONE
+from .locations import Location
+from .open_meteo_client import FORECAST_HISTORY_DAYS
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> Optional[ZoneInfo]:
+    try:
+        return ZoneInfo(name)
+    except ZoneInfoNotFoundError:
+        return None  # no tz database: daylight saving gaps are fetched like any other hour
+
+
+class FetchPlan(NamedTuple):
+    """Missing [start_ts, end_ts) hour intervals per location id and the
+    (start_date, end_date, locations) calls that fetch them"""
+    missing: Dict[int, List[Tuple[int, int]]]
+    requests: List[Tuple[date, date, List[Location]]]
+
+    @property
+    def missing_hours(self) -> int:
+        return sum(end - start for intervals in self.missing.values() for start, end in intervals) // COVERAGE_STEP
+
+
+def hour_range(start_time: datetime, end_time: datetime) -> Tuple[int, int]:
+    """[start_ts, end_ts) of the whole hours whose rows fall between start_time and end_time"""
+    start_ts = to_epoch(start_time)
+    if start_time.microsecond:
+        start_ts += 1
+    start_ts += -start_ts % COVERAGE_STEP
+    end_ts = to_epoch(end_time)
+    return start_ts, end_ts - end_ts % COVERAGE_STEP + COVERAGE_STEP
+
+
+def missing_intervals(covered: List[Tuple[int, int]], start_ts: int, end_ts: int,
+                      zone: str = TIMEZONE) -> List[Tuple[int, int]]:
+    """Parts of [start_ts, end_ts) outside the sorted, disjoint covered intervals
+
+    Times are wall-clock times of the location's time zone.
+    """
+    missing = []
+    position = start_ts
+    for covered_start, covered_end in covered:
+        if covered_end <= position:
+            continue
+        if covered_start >= end_ts:
+            break
+        if covered_start > position:
+            missing.append((position, covered_start))
+        position = max(position, covered_end)
+    if position < end_ts:
+        missing.append((position, end_ts))
+    return [interval for interval in missing if not _skipped_wall_clock_hour(*interval, zone)]
+
+
+def _skipped_wall_clock_hour(start_ts: int, end_ts: int, zone: str = TIMEZONE) -> bool:
+    """True for the single local hour skipped when daylight saving time starts
+
+    Times are stored as local wall-clock time, so that hour never gets a row
+    and would otherwise be fetched again on every run.
+    """
+    tz = _zone(zone)
+    if tz is None or end_ts - start_ts != COVERAGE_STEP:
+        return False
+    wall_clock = from_epoch(start_ts)
+    round_trip = wall_clock.replace(tzinfo=tz).astimezone(timezone.utc).astimezone(tz)
+    return round_trip.replace(tzinfo=None) != wall_clock
+
+
+def plan_requests(missing: List[Tuple[int, int]], chunk_days: int = BACKFILL_CHUNK_DAYS,
+                  today: Optional[date] = None) -> List[Tuple[date, date]]:
+    """Groups the missing intervals into the fewest calls of at most chunk_days days
+
+    Each call starts at the first missing day not yet planned and takes every
+    missing day within chunk_days of it (re-fetching the covered hours in
+    between is cheaper than another request). Like split_range, calls never
+    straddle the boundary between archive and forecast data.
+    """
+    today = today or date.today()
+    boundary = today - timedelta(days=FORECAST_HISTORY_DAYS)
+    days = [(from_epoch(start).date(), from_epoch(end - 1).date()) for start, end in missing]
+
+    requests = []
+    index = 0
+    while index < len(days):
+        first_day = days[index][0]
+        limit = first_day + timedelta(days=chunk_days - 1)
+        if first_day < boundary:
+            limit = min(limit, boundary - timedelta(days=1))
+        end_day = first_day
+        while index < len(days) and days[index][0] <= limit:
+            end_day = max(end_day, min(days[index][1], limit))
+            if days[index][1] > limit:
+                # The rest of this interval starts the next call
+                days[index] = (limit + timedelta(days=1), days[index][1])
+                break
+            index += 1
+        requests.append((first_day, end_day))
+    return requests
+
+
+def merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Union of intervals as a sorted list of disjoint intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class FetchPlanner:
+    """Plans the API calls needed to complete time ranges of weather_data"""
+
+    def __init__(self, database, chunk_days: int = BACKFILL_CHUNK_DAYS):
+        self.database = database
+        self.chunk_days = chunk_days
+
+    def plan(self, ranges: Sequence[Tuple[Location, datetime, datetime]], today: Optional[date] = None) -> FetchPlan:
+        """Returns the missing hours of each (location, start_time, end_time) and the calls that fetch them"""
+        missing = {}
+        for location, start_time, end_time in ranges:
+            start_ts, end_ts = hour_range(start_time, end_time)
+            if start_ts >= end_ts:
+                continue
+            covered = self.database.get_weather_coverage(start_ts, end_ts, location.id)
+            intervals = missing_intervals(covered, start_ts, end_ts, location.timezone)
+            if intervals:
+                missing[location.id] = intervals
+        if not missing:
+            return FetchPlan({}, [])
+
+        # Windows are planned over the union of all gaps; each call then takes
+        # only the locations that miss hours inside its days
+        locations = {location.id: location for location, _, _ in ranges}
+        requests = []
+        for first_day, last_day in plan_requests(merge_intervals(
+                [interval for intervals in missing.values() for interval in intervals]), self.chunk_days, today):
+            window_start = to_epoch(datetime.combine(first_day, datetime.min.time()))
+            window_end = to_epoch(datetime.combine(last_day, datetime.min.time())) + 86400
+            wanted = [locations[location_id] for location_id, intervals in missing.items()
+                      if any(start < window_end and end > window_start for start, end in intervals)]
+            requests.append((first_day, last_day, wanted))
+        return FetchPlan(missing, requests)
@@ -0,0 +1,34 @@
+"""
+Weather locations collected by WeatherCollector
+"""
+
+from typing import List, NamedTuple, Optional
+
+from .config import BYDGOSZCZ_LAT, BYDGOSZCZ_LON, TIMEZONE, WEATHER_LOCATIONS
+
+
+class Location(NamedTuple):
+    """A site whose weather is collected; id is the row in the locations table"""
+    name: str
+    latitude: float
+    longitude: float
+    timezone: str = TIMEZONE
+    id: Optional[int] = None
+
+
+def parse_locations(text: str) -> List[Location]:
+    """Parses "name:latitude:longitude[:timezone]" entries separated by ";" """
+    locations = []
+    for entry in text.split(';'):
+        if not entry.strip():
+            continue
+        fields = [field.strip() for field in entry.split(':')]
+        if len(fields) not in (3, 4):
+            raise ValueError(f"Invalid location {entry!r}, expected name:latitude:longitude[:timezone]")
+        locations.append(Location(fields[0], float(fields[1]), float(fields[2]),
+                                  fields[3] if len(fields) == 4 else TIMEZONE))
+    return locations
+
+
+# Bydgoszcz is also location 1 of existing databases (see db migration 8)
+LOCATIONS = parse_locations(WEATHER_LOCATIONS) or [Location('Bydgoszcz', BYDGOSZCZ_LAT, BYDGOSZCZ_LON)]
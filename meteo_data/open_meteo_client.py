@@ -0,0 +1,152 @@
+"""
+Open-Meteo HTTP client with a pooled keep-alive session and retries
+"""
+
+import logging
+import random
+import time
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics.registry import timed
+from .config import OPEN_METEO_ARCHIVE_URL, OPEN_METEO_URL, TIMEZONE
+from .conversion import HOURLY_VARIABLES
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# The forecast endpoint serves roughly the last three months; older days come from the archive
+FORECAST_HISTORY_DAYS = 85
+
+# Variables the archive (reanalysis) data has; it has no visibility
+ARCHIVE_VARIABLES = tuple(name for name in HOURLY_VARIABLES if name != 'visibility')
+
+# Responses worth retrying: rate limiting and temporary server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OpenMeteoError(Exception):
+    """Raised when a request fails for good (non-retryable status or retries exhausted)"""
+
+
+class OpenMeteoClient:
+    """Fetches hourly data over one pooled session, retrying with exponential backoff and jitter
+
+    The session keeps connections alive, so consecutive and parallel requests
+    reuse TCP/TLS connections instead of paying a handshake each. pool_size
+    should be at least the number of threads sharing the client. With a
+    cache, stored responses are served without a request; in offline mode a
+    response missing from the cache is an error.
+    """
+
+    def __init__(self, base_url: str = OPEN_METEO_URL, archive_url: str = OPEN_METEO_ARCHIVE_URL,
+                 timezone: str = TIMEZONE, timeout: float = 30.0, max_retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 30.0, pool_size: int = 8,
+                 cache: Optional[ResponseCache] = None):
+        self.base_url = base_url
+        self.archive_url = archive_url
+        self.timezone = timezone
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff          # first retry waits up to this many seconds
+        self.max_backoff = max_backoff
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Counters
+        self.requests = 0
+        self.retries = 0
+
+    def close(self):
+        """Closes the pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fetch_hourly(self, latitude: float, longitude: float, start_date: date, end_date: date,
+                     today: Optional[date] = None) -> dict:
+        """Returns the 'hourly' block for the days start_date..end_date (inclusive)"""
+        return self.fetch_hourly_many([(latitude, longitude)], start_date, end_date, today=today)[0]
+
+    @timed('weather.fetch', rows=lambda blocks: sum(len(hourly['time']) for hourly in blocks))
+    def fetch_hourly_many(self, coordinates: List[Tuple[float, float]], start_date: date, end_date: date,
+                          timezone: Optional[str] = None, today: Optional[date] = None) -> List[dict]:
+        """Returns the 'hourly' blocks of several (latitude, longitude) pairs from one request
+
+        The API takes comma-separated coordinate lists and answers with one
+        result per coordinate, in order. All coordinates share the timezone.
+        """
+        today = today or date.today()
+        archived = start_date < today - timedelta(days=FORECAST_HISTORY_DAYS)
+        params = {
+            "latitude": ",".join(f"{latitude:.4f}" for latitude, _ in coordinates),
+            "longitude": ",".join(f"{longitude:.4f}" for _, longitude in coordinates),
+            "hourly": ",".join(ARCHIVE_VARIABLES if archived else HOURLY_VARIABLES),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "timezone": timezone or self.timezone,
+        }
+        data = self.get_json(self.archive_url if archived else self.base_url, params)
+        results = data if isinstance(data, list) else [data]
+        if len(results) != len(coordinates) or any('hourly' not in result for result in results):
+            raise OpenMeteoError(f"No hourly data for {len(coordinates)} locations, {start_date} - {end_date}")
+        return [result['hourly'] for result in results]
+
+    def get_json(self, url: str, params: dict) -> dict:
+        """GET with retries on connection errors, timeouts, 429 and 5xx responses"""
+        if self.cache is not None:
+            data = self.cache.get(url, params)
+            if data is not None:
+                return data
+            if self.cache.offline:
+                raise OpenMeteoError(f"Offline and not cached: {url} {params}")
+
+        data = self._fetch_json(url, params)
+        if self.cache is not None:
+            self.cache.put(url, params, data)
+        return data
+
+    @timed('weather.http_request')
+    def _fetch_json(self, url: str, params: dict) -> dict:
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                self.requests += 1
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code >= 400:
+                        raise OpenMeteoError(f"HTTP {response.status_code} from {url}: {response.text[:200]}")
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get('Retry-After')
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+
+            if attempt == self.max_retries:
+                raise OpenMeteoError(f"Giving up on {url} after {attempt + 1} attempts: {error}")
+            self.retries += 1
+            delay = self.retry_delay(attempt, retry_after)
+            logger.warning(f"Open-Meteo request failed ({error}), retry {attempt + 1}/{self.max_retries} "
+                           f"in {delay:.1f}s")
+            time.sleep(delay)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with full jitter; a Retry-After header is respected"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass  # HTTP-date form, not sent by Open-Meteo
+        return delay
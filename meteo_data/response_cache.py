@@ -0,0 +1,191 @@
+"""
+On-disk cache of Open-Meteo JSON responses
+
+Responses are stored gzip-compressed, one file per request, under a key
+derived from the normalized request (endpoint plus sorted parameters, with
+coordinates rounded and variable lists sorted), so equivalent requests share
+an entry. How long an entry stays fresh depends on the data it holds: a
+response whose hours had all settled when it was fetched never changes again,
+while responses that include recent or forecast hours expire quickly.
+Expired entries are deleted when looked up and by periodic sweeps.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from .config import (WEATHER_CACHE_DIR, WEATHER_CACHE_FORECAST_TTL, WEATHER_CACHE_OFFLINE,
+                     WEATHER_CACHE_SETTLE_HOURS)
+
+logger = logging.getLogger(__name__)
+
+# Parameters whose comma-separated values are order-insensitive
+_LIST_PARAMS = {'hourly', 'daily', 'current'}
+
+
+def normalize_params(url: str, params: dict) -> str:
+    """Canonical text form of a request, used as the cache key"""
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, float):
+            value = f"{value:.4f}"  # ~10 m, finer than the model grid
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        elif name in _LIST_PARAMS:
+            value = ','.join(sorted(str(value).split(',')))
+        normalized[name] = str(value)
+    return json.dumps([url.rstrip('/'), normalized], sort_keys=True)
+
+
+class ResponseCache:
+    """gzip JSON files keyed on the normalized request, with hit/miss statistics
+
+    In offline mode every stored entry counts as fresh and nothing is fetched
+    or deleted, so the collector works from the cache alone.
+    """
+
+    def __init__(self, directory: str = WEATHER_CACHE_DIR, forecast_ttl: float = WEATHER_CACHE_FORECAST_TTL,
+                 settle_hours: float = WEATHER_CACHE_SETTLE_HOURS, offline: bool = WEATHER_CACHE_OFFLINE):
+        self.directory = directory
+        self.forecast_ttl = forecast_ttl    # seconds an entry with unsettled hours stays fresh
+        self.settle_hours = settle_hours    # hours after which past data no longer changes
+        self.offline = offline
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'stores': 0,
+                       'bytes_read': 0, 'bytes_written': 0}
+
+    def path(self, url: str, params: dict) -> str:
+        """File of the entry for a request"""
+        key = hashlib.sha256(normalize_params(url, params).encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def get(self, url: str, params: dict) -> Optional[dict]:
+        """Returns the cached response if present and fresh (any stored response when offline)"""
+        path = self.path(url, params)
+        try:
+            with open(path, 'rb') as file:
+                compressed = file.read()
+            entry = json.loads(gzip.decompress(compressed))
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            self._count('misses')
+            return None
+
+        if self._expired(entry):
+            self._count('expired')
+            self._count('misses')
+            self._evict(path)
+            return None
+        self._count('hits')
+        self._count('bytes_read', len(compressed))
+        return entry['data']
+
+    def put(self, url: str, params: dict, data: dict):
+        """Stores a response; it expires after forecast_ttl unless all its hours had settled"""
+        fetched_at = time.time()
+        expires = None if self.is_settled(params, fetched_at) else fetched_at + self.forecast_ttl
+        entry = {'request': normalize_params(url, params), 'fetched_at': fetched_at,
+                 'expires': expires, 'data': data}
+        compressed = gzip.compress(json.dumps(entry, separators=(',', ':')).encode(), compresslevel=6)
+
+        path = self.path(url, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temporary file and renamed, so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(compressed)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._count('stores')
+        self._count('bytes_written', len(compressed))
+
+    def is_settled(self, params: dict, fetched_at: float) -> bool:
+        """True if every hour of the request was older than the settling period at fetched_at"""
+        if 'forecast_days' in params or 'past_days' in params or 'end_date' not in params:
+            return False  # relative windows always reach up to now
+        end_date = params['end_date']
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        # Local end of the last requested day, compared with local fetch time
+        last_hour = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
+        return last_hour + timedelta(hours=self.settle_hours) <= datetime.fromtimestamp(fetched_at)
+
+    def stats(self) -> dict:
+        """Counters plus the hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def sweep(self) -> int:
+        """Deletes expired entries and leftover temporary files; returns the number of files removed"""
+        if self.offline:
+            return 0
+        now = time.time()
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    age = now - os.path.getmtime(path)
+                    if name.endswith('.tmp'):
+                        stale = age > self.forecast_ttl  # left by an interrupted put()
+                    elif name.endswith('.json.gz') and age >= self.forecast_ttl:
+                        # Younger files cannot have expired yet, so only older ones are read
+                        with open(path, 'rb') as file:
+                            stale = self._expired(json.loads(gzip.decompress(file.read())))
+                    else:
+                        continue
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Removing unreadable cache entry {path}: {e}")
+                    stale = True
+                if stale and self._evict(path):
+                    removed += 1
+        return removed
+
+    def clear(self):
+        """Removes every cached response"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json.gz'):
+                    os.remove(os.path.join(root, name))
+
+    def _expired(self, entry: dict) -> bool:
+        expires = entry.get('expires')
+        return not self.offline and expires is not None and time.time() >= expires
+
+    def _evict(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except OSError:
+            return False  # already removed by another thread
+        self._count('evicted')
+        return True
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
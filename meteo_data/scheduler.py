@@ -0,0 +1,151 @@
+"""
+Wall-clock scheduling for the weather collector daemon
+
+Run times lie on a fixed grid of the local wall clock (every interval,
+offset from the top of the hour), so they never drift however long each
+run takes. A random delay per run spreads the requests of many sites, and
+waiting in short steps against the wall clock notices a suspend or a clock
+change: the late run then happens at once and collects everything missed.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from db.timestamps import from_epoch, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep; also bounds how late a run starts after resume
+MAX_SLEEP = 30.0
+
+# Runs starting later than this after their time are reported as missed
+LATE_AFTER = 2 * MAX_SLEEP
+
+
+class WallClockSchedule:
+    """Run times every interval seconds of local wall-clock time, offset seconds past the grid, plus jitter"""
+
+    def __init__(self, interval: float, offset: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.offset = offset % interval
+        self.jitter = min(max(jitter, 0.0), interval / 2)  # a run never moves into the next slot
+        self._random = random.Random(seed)
+
+    def slot_after(self, moment: float) -> float:
+        """First grid time strictly after moment (both epoch seconds)"""
+        wall = to_epoch(datetime.fromtimestamp(moment))
+        slot = (wall - self.offset) // self.interval * self.interval + self.offset
+        while True:
+            # Wall-clock slots map to real time through the local timezone
+            # (a slot in the hour skipped by daylight saving maps past it)
+            slot += self.interval
+            real = from_epoch(slot).timestamp()
+            if real > moment:
+                return real
+
+    def delay(self) -> float:
+        """Random delay added to one run"""
+        return self._random.uniform(0, self.jitter) if self.jitter else 0.0
+
+
+def run_scheduled(job: Callable[[], None], schedule: WallClockSchedule, stop: threading.Event,
+                  clock: Callable[[], float] = time.time):
+    """Calls job at every run time of schedule until stop is set
+
+    Slots passed while a run was in progress or the machine was suspended
+    are merged into a single run, started as soon as the delay is noticed.
+    """
+    slot = schedule.slot_after(clock())
+    while not stop.is_set():
+        run_at = slot + schedule.delay()
+        logger.info(f"Next collection at {datetime.fromtimestamp(run_at):%Y-%m-%d %H:%M:%S}")
+        # Short waits re-read the wall clock; a monotonic sleep would pause during suspend
+        while True:
+            remaining = run_at - clock()
+            if remaining <= 0:
+                break
+            if stop.wait(min(remaining, MAX_SLEEP)):
+                return
+
+        late = clock() - run_at
+        if late > LATE_AFTER:
+            logger.warning(f"Collection started {late / 60:.0f} minutes late (suspend or clock change), "
+                           f"catching up")
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Scheduled collection failed: {e}")
+        slot = schedule.slot_after(max(clock(), slot))
+
+
+class InstanceLock:
+    """Exclusive lock on a file, so only one collector runs against a database
+
+    The operating system drops the lock when the process exits, even after a
+    crash, so a stale lock file never blocks the next start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Takes the lock without waiting; False if another process holds it"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file = open(self.path, 'a+')
+        try:
+            _lock_file(file)
+        except OSError:
+            file.close()
+            return False
+        # The holder's pid, for whoever finds the lock taken
+        file.seek(0)
+        file.truncate()
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f"Another weather collector holds {self.path}")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+try:
+    import fcntl
+
+    def _lock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Open-Meteo API
+
+Serves deterministic, Open-Meteo-shaped hourly JSON on /v1/forecast and
+/v1/archive (a list of results for comma-separated coordinates, like the real
+API), with optional latency and injected failures, so the collector and
+the backfill can be tested and benchmarked without network access:
+
+    python -m meteo_data.stub_server --port 8765
+    OPEN_METEO_URL=http://127.0.0.1:8765/v1/forecast \\
+    OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8765/v1/archive python main.py
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+
+def hourly_value(name: str, moment: datetime, latitude: float = 53.0) -> float:
+    """Smooth, deterministic value of a variable at a given hour (colder further north)"""
+    hours = (moment - datetime(2000, 1, 1)).total_seconds() / 3600
+    daily = math.sin(2 * math.pi * (hours % 24) / 24 - 2)
+    seasonal = math.sin(2 * math.pi * hours / (24 * 365.25) - 1.8)
+    if name == 'temperature_2m':
+        return round(8 - 0.6 * (latitude - 53.0) + 10 * seasonal + 4 * daily, 1)
+    if name == 'relative_humidity_2m':
+        return round(75 - 15 * daily, 0)
+    if name == 'surface_pressure':
+        return round(1005 + 8 * math.sin(hours / 37), 1)
+    if name == 'wind_speed_10m':
+        return round(10 + 6 * math.sin(hours / 11), 1)
+    if name == 'wind_direction_10m':
+        return round((hours * 7) % 360, 0)
+    if name == 'precipitation':
+        return round(max(0.0, 2 * math.sin(hours / 5)), 1)
+    if name == 'visibility':
+        return round(20000 + 10000 * daily, 0)
+    return 0.0
+
+
+def hourly_response(params: dict, today: date):
+    """Builds the response for start_date/end_date or past_days/forecast_days parameters
+
+    Returns one result, or a list of results when several coordinates are given.
+    Times are local to the timezone parameter (default GMT), so like the real
+    API the hour skipped when daylight saving time starts is missing and the
+    hour repeated when it ends appears twice.
+    """
+    if 'start_date' in params:
+        start = date.fromisoformat(params['start_date'])
+        end = date.fromisoformat(params['end_date'])
+    else:
+        start = today - timedelta(days=int(params.get('past_days', 0)))
+        end = today + timedelta(days=int(params.get('forecast_days', 7)) - 1)
+    variables = [name for name in params.get('hourly', '').split(',') if name]
+    zone = ZoneInfo(params.get('timezone', 'GMT'))
+
+    # Every UTC hour between local midnights, as local wall-clock time
+    first = datetime.combine(start, datetime.min.time(), zone).astimezone(timezone.utc)
+    last = datetime.combine(end + timedelta(days=1), datetime.min.time(), zone).astimezone(timezone.utc)
+    moments = [(first + timedelta(hours=i)).astimezone(zone).replace(tzinfo=None)
+               for i in range(int((last - first).total_seconds()) // 3600)]
+    times = [moment.strftime('%Y-%m-%dT%H:%M') for moment in moments]
+    latitudes = [float(value) for value in str(params.get('latitude', '0')).split(',')]
+    longitudes = [float(value) for value in str(params.get('longitude', '0')).split(',')]
+    if len(latitudes) != len(longitudes):
+        raise ValueError("latitude and longitude must have the same number of coordinates")
+
+    results = []
+    for latitude, longitude in zip(latitudes, longitudes):
+        hourly = {'time': times}
+        for name in variables:
+            hourly[name] = [hourly_value(name, moment, latitude) for moment in moments]
+        results.append({
+            'latitude': latitude,
+            'longitude': longitude,
+            'timezone': params.get('timezone', 'GMT'),
+            'utc_offset_seconds': int(first.astimezone(zone).utcoffset().total_seconds()),
+            'hourly_units': {name: '' for name in variables},
+            'hourly': hourly,
+        })
+    return results if len(results) > 1 else results[0]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    # Headers and body are separate writes; with Nagle on, keep-alive responses would stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.requests += 1
+            fail = server.fail_rate and server.random.random() < server.fail_rate
+        if server.latency:
+            time.sleep(server.latency)
+        if url.path not in ('/v1/forecast', '/v1/archive'):
+            self._send(404, {'error': True, 'reason': 'Not found'})
+        elif fail:
+            with server.lock:
+                server.failures += 1
+            self._send(503, {'error': True, 'reason': 'Injected failure'})
+        else:
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                self._send(200, hourly_response(params, server.today))
+            except (KeyError, ValueError) as e:
+                self._send(400, {'error': True, 'reason': str(e)})
+
+    def _send(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # keep test and benchmark output clean
+
+
+class StubOpenMeteoServer:
+    """Threaded stub server on 127.0.0.1; use as a context manager"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 1,
+                 today: date = None):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.latency = latency          # seconds added to every response
+        self.httpd.fail_rate = fail_rate      # fraction of requests answered with 503
+        self.httpd.random = random.Random(seed)
+        self.httpd.today = today or date.today()
+        self.httpd.requests = 0
+        self.httpd.connections = 0
+        self.httpd.failures = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def forecast_url(self) -> str:
+        return f"{self.url}/v1/forecast"
+
+    @property
+    def archive_url(self) -> str:
+        return f"{self.url}/v1/archive"
+
+    def stats(self) -> dict:
+        return {'requests': self.httpd.requests, 'connections': self.httpd.connections,
+                'failures': self.httpd.failures}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-open-meteo", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Open-Meteo-shaped test data locally")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per response")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of 503 responses")
+    args = parser.parse_args()
+
+    server = StubOpenMeteoServer(args.port, args.latency, args.fail_rate)
+    print(f"Stub Open-Meteo API on {server.forecast_url} and {server.archive_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
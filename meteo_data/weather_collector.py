@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
 """
-Weather Data Collector for Bydgoszcz using Open-Meteo API
+Weather Data Collector for the configured locations using Open-Meteo API
 Collects hourly weather data and stores it in SQLite database
 """
 
+import argparse
 from datetime import datetime, timedelta
-import requests
-import pandas as pd
 import logging
-from .config import BYDGOSZCZ_LAT, BYDGOSZCZ_LON
+import signal
+import sys
+import threading
+import time
+from .backfill import Backfill
+from db.combined_database import PlantDatabase
+from db.retention import start_retention
+from db.timestamps import from_epoch
+from metrics.export import start_exporter
+from metrics.registry import timed
+from .config import (BACKFILL_WORKERS, COLLECTION_INTERVAL_HOURS, COLLECTION_JITTER_SECONDS,
+                     COLLECTION_OFFSET_MINUTES, COLLECTOR_LOCK_FILE, WEATHER_CACHE_DIR,
+                     WEATHER_CACHE_SWEEP_HOURS)
+from .fetch_planner import FetchPlanner
+from .locations import LOCATIONS
+from .open_meteo_client import OpenMeteoClient
+from .response_cache import ResponseCache
+from .scheduler import InstanceLock, WallClockSchedule, run_scheduled
 
 # Configure logging
 logging.basicConfig(
@@ -22,87 +38,81 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class WeatherCollector:
-    def __init__(self, database=None):
-        """Initialize the weather collector with database instance"""
+    def __init__(self, database=None, locations=None):
+        """Initialize the weather collector with database instance and locations (default: configured)"""
         self.database = database
-        # Bydgoszcz coordinates
-        self.latitude = BYDGOSZCZ_LAT
-        self.longitude = BYDGOSZCZ_LON
+        # Locations get their database ids; rows are stored per location
+        self.locations = list(locations or LOCATIONS)
+        if database is not None:
+            self.locations = [location._replace(id=database.ensure_location(
+                location.name, location.latitude, location.longitude, location.timezone))
+                for location in self.locations]
+        # Responses are cached on disk, so restarts don't download the same data again
+        self.cache = ResponseCache() if WEATHER_CACHE_DIR else None
+        self._last_sweep = None  # monotonic time of the last removal of expired cache entries
+        # One keep-alive session for all requests, sized for the parallel backfill
+        self.client = OpenMeteoClient(pool_size=BACKFILL_WORKERS, cache=self.cache)
+        self.backfill = Backfill(database, self.client, self.locations)
+        self.planner = FetchPlanner(database)
+        self._stop = threading.Event()
     
-    def collect_data_range(self, start_time: datetime, end_time: datetime):
-        """Collect weather data for a specific date range"""
+    def stop(self):
+        """Makes a running collection return after the requests in flight, without sending more"""
+        self._stop.set()
+    
+    def close(self):
+        """Closes the HTTP session"""
+        self.client.close()
+    
+    @timed('weather.collect_data_range', rows=lambda count: count)
+    def collect_data_range(self, start_time: datetime, end_time: datetime) -> int:
+        """Collect weather data of all locations for a specific date range (only the hours not stored yet)
+        and return the number of new rows"""
+        logger.info(f"Collecting data from {start_time} to {end_time}")
+        return self._collect([(location, start_time, end_time) for location in self.locations])
+    
+    def _collect(self, ranges) -> int:
+        """Fetches the missing hours of (location, start_time, end_time) ranges; returns the number of new rows"""
         try:
-            logger.info(f"Collecting data from {start_time} to {end_time}")
-            
-            # Calculate the number of days needed for the API call
-            days_diff = (end_time - start_time).days + 1
-            past_days = min(days_diff, 92)  # Open-Meteo historical limit is ~3 months
-            
-            # Fetch hourly data from Open-Meteo API
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": self.latitude,
-                "longitude": self.longitude,
-                "hourly": "temperature_2m,relative_humidity_2m,surface_pressure,wind_speed_10m,wind_direction_10m,precipitation,visibility",
-                "past_days": past_days,
-                "forecast_days": 1,
-                "timezone": "Europe/Warsaw"
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'hourly' not in data:
-                logger.warning("No hourly data received from Open-Meteo")
-                return
-            
-            # Convert to pandas DataFrame
-            hourly_data = data['hourly']
-            df = pd.DataFrame({
-                'time': pd.to_datetime(hourly_data['time']),
-                'temp': hourly_data['temperature_2m'],
-                'rhum': hourly_data['relative_humidity_2m'],
-                'pres': hourly_data['surface_pressure'],
-                'wspd': hourly_data['wind_speed_10m'],
-                'wdir': hourly_data['wind_direction_10m'],
-                'prcp': hourly_data['precipitation'],
-                'visibility': hourly_data['visibility']
-            })
-            
-            # Filter data for the requested time range
-            df = df[(df['time'] >= start_time) & (df['time'] <= end_time)]
-            
-            if df.empty:
-                logger.warning("No data in requested time range")
-                return
+            if not self.database:
+                logger.error("No database instance provided")
+                return 0
             
-            # Convert DataFrame to list of dictionaries for processing
-            records = []
-            for _, row in df.iterrows():
-                dt = row['time'].to_pydatetime()  # Convert pandas Timestamp to Python datetime
-                record = {
-                    'date': dt.date().isoformat(),  # Convert date to string format
-                    'time': dt.time().isoformat(),  # Convert time to string format
-                    'temp': row['temp'],
-                    'rhum': row['rhum'],
-                    'pres': row['pres'],
-                    'wspd': row['wspd'],
-                    'wdir': row['wdir'],
-                    'prcp': row['prcp'],
-                    'visibility': row['visibility']
-                }
-                records.append(record)
+            # Only the missing hours are requested, grouped into as few calls as possible
+            plan = self.planner.plan(ranges)
+            if not plan.requests:
+                logger.info("Weather data for this range is complete, nothing to fetch")
+                return 0
+            logger.info(f"Missing {plan.missing_hours} hours at {len(plan.missing)} locations, "
+                        f"fetching them in {len(plan.requests)} time windows")
             
-            # Store data in database
-            if self.database:
-                new_count, duplicate_count = self.database.store_weather_data(records)
-                logger.info(f"Successfully collected and stored {new_count} new records, skipped {duplicate_count} duplicates for date range")
-            else:
-                logger.error("No database instance provided")
+            # Planned calls are fetched in parallel and stored as they arrive
+            start_time = min(start for _, start, _ in ranges)
+            end_time = max(end for _, _, end in ranges)
+            result = self.backfill.run(start_time, end_time, chunks=plan.requests, stop=self._stop)
+            if result.failed_chunks:
+                logger.warning(f"{len(result.failed_chunks)} of {result.requests} requests could not be collected")
+            if self.cache is not None:
+                self._sweep_cache()
+                stats = self.cache.stats()
+                logger.info(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                            f"({stats['expired']} expired, {stats['evicted']} files removed)")
+            return result.new
             
         except Exception as e:
             logger.error(f"Error collecting weather data for range: {e}")
+            return 0
+    
+    def _sweep_cache(self):
+        """Removes expired cache entries every WEATHER_CACHE_SWEEP_HOURS, which lookups alone never reach
+        for requests that are not repeated (e.g. forecast windows of past days)"""
+        now = time.monotonic()
+        if self._last_sweep is not None and now - self._last_sweep < WEATHER_CACHE_SWEEP_HOURS * 3600:
+            return
+        self._last_sweep = now
+        removed = self.cache.sweep()
+        if removed:
+            logger.info(f"Removed {removed} expired response cache files")
     
     def collect_hourly_data(self, hours_back: int = 1):
         """Collect weather data for the last specified hours"""
@@ -110,37 +120,92 @@ class WeatherCollector:
         start_time = end_time - timedelta(hours=hours_back)
         self.collect_data_range(start_time, end_time)
     
-
-    
-    def collect_missing_data(self):
-        """Collect any missing data since the last record"""
+    @timed('weather.collect_missing_data', rows=lambda count: count)
+    def collect_missing_data(self) -> int:
+        """Collect any missing data since the first record of each location, including holes inside the history;
+        returns the number of new rows"""
         try:
             if not self.database:
                 logger.error("No database instance provided")
-                return
-                
-            latest_record_time = self.database.get_latest_weather_record_datetime()
-            current_time = datetime.now()
+                return 0
             
-            if latest_record_time is None:
-                # No records exist, collect last 7 days
-                logger.info("No existing weather records found. Collecting last 7 days of data.")
-                start_time = current_time - timedelta(days=7)
-                self.collect_data_range(start_time, current_time)
-            else:
-                # Calculate time gap
-                time_gap = current_time - latest_record_time
-                
-                if time_gap > timedelta(hours=2):  # More than 2 hours gap
-                    logger.info(f"Found weather data gap of {time_gap}. Latest record: {latest_record_time}")
-                    # Start from the hour after the latest record
-                    start_time = latest_record_time + timedelta(hours=1)
-                    # Round down to the nearest hour
-                    start_time = start_time.replace(minute=0, second=0, microsecond=0)
-                    self.collect_data_range(start_time, current_time)
+            current_time = datetime.now()
+            ranges = []
+            for location in self.locations:
+                coverage = self.database.get_weather_coverage(location_id=location.id)
+                if not coverage:
+                    # No records exist, collect last 7 days
+                    logger.info(f"No existing weather records for {location.name}. Collecting last 7 days of data.")
+                    start_time = current_time - timedelta(days=7)
                 else:
-                    logger.info("No significant weather data gap found. Database is up to date.")
+                    # The coverage index finds interior holes as well as the gap up to now
+                    start_time = from_epoch(coverage[0][0])
+                    logger.info(f"{location.name}: weather data stored in {len(coverage)} intervals "
+                                f"since {start_time}")
+                ranges.append((location, start_time, current_time))
+            return self._collect(ranges)
                     
         except Exception as e:
             logger.error(f"Error collecting missing weather data: {e}")
-    
+            return 0
+
+
+def main():
+    """Runs the collector once (--once) or as a daemon on a wall-clock schedule"""
+    parser = argparse.ArgumentParser(description="Collect weather data for the configured locations")
+    parser.add_argument('--once', action='store_true', help="collect the missing data once and exit")
+    parser.add_argument('--database', default="data/plant_data.db", help="SQLite database file")
+    parser.add_argument('--interval-hours', type=float, default=COLLECTION_INTERVAL_HOURS)
+    parser.add_argument('--offset-minutes', type=float, default=COLLECTION_OFFSET_MINUTES,
+                        help="minutes past the hour of every run")
+    parser.add_argument('--jitter', type=float, default=COLLECTION_JITTER_SECONDS,
+                        help="largest random delay of a run in seconds")
+    parser.add_argument('--lock-file', default=COLLECTOR_LOCK_FILE)
+    args = parser.parse_args()
+
+    lock = InstanceLock(args.lock_file)
+    if not lock.acquire():
+        logger.error(f"Another weather collector is running (lock {args.lock_file} is held), exiting")
+        return 1
+    start_exporter()
+
+    # The first signal ends a running collection after its requests in flight (a catch-up
+    # can take hours); a second one stops at once
+    stop = threading.Event()
+    collector = None
+
+    def request_stop(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, stopping")
+        stop.set()
+        if collector is not None:
+            collector.stop()
+        signal.signal(signum, signal.SIG_DFL)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    try:
+        with PlantDatabase(args.database) as database:
+            collector = WeatherCollector(database)
+            if stop.is_set():
+                collector.stop()  # signalled while the database was opened
+            try:
+                # Every start catches up first; --once stops there
+                collector.collect_missing_data()
+                if not args.once:
+                    # Old rows are deleted alongside the collection when RETENTION_*_DAYS are set
+                    retention = start_retention(database)
+                    schedule = WallClockSchedule(args.interval_hours * 3600, args.offset_minutes * 60, args.jitter)
+                    run_scheduled(collector.collect_missing_data, schedule, stop)
+                    if retention is not None:
+                        retention.set()
+            finally:
+                collector.close()
+    finally:
+        lock.release()
+    logger.info("Weather collector stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Metrics package - latency and throughput instrumentation
\ No newline at end of file
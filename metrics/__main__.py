@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Prints latency percentiles and throughput per operation from JSON metrics snapshots
+
+    METRICS_FILE=data/metrics.json python main.py
+    python -m metrics data/metrics.json
+    python -m metrics data/metrics.json --prometheus > plant.prom
+
+Snapshots of several processes (e.g. the GUI and the collector daemon) are
+merged per operation.
+"""
+
+import argparse
+import json
+import sys
+
+from .config import METRICS_FILE
+from .export import to_prometheus
+from .registry import Histogram
+
+
+def _ms(seconds) -> str:
+    return f"{seconds * 1000:9.2f}" if seconds is not None else f"{'-':>9}"
+
+
+def load(paths) -> dict:
+    """Merged {operation: Histogram} of the snapshot files"""
+    histograms = {}
+    for path in paths:
+        with open(path) as file:
+            snapshot = json.load(file)
+        for name, data in snapshot['operations'].items():
+            histogram = Histogram.from_dict(data)
+            if name in histograms:
+                histograms[name].merge(histogram)
+            else:
+                histograms[name] = histogram
+    return histograms
+
+
+def report(histograms: dict, sort: str = 'name') -> str:
+    """One line per operation: calls, p50/p95/p99/max latency, rows and rows per second"""
+    keys = {
+        'name': lambda item: item[0],
+        'count': lambda item: -item[1].count,
+        'total': lambda item: -item[1].total,
+        'p99': lambda item: -(item[1].quantile(0.99) or 0),
+    }
+    lines = [f"{'operation':<36} {'calls':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+             f"{'total s':>9} {'rows':>10} {'rows/s':>10}"]
+    for name, histogram in sorted(histograms.items(), key=keys[sort]):
+        rows_per_second = f"{histogram.rows / histogram.total:10.0f}" if histogram.rows and histogram.total \
+            else f"{'-':>10}"
+        errors = f"  ({histogram.errors} errors)" if histogram.errors else ""
+        lines.append(f"{name:<36} {histogram.count:8d} {_ms(histogram.quantile(0.5))} "
+                     f"{_ms(histogram.quantile(0.95))} {_ms(histogram.quantile(0.99))} {_ms(histogram.max)} "
+                     f"{histogram.total:9.2f} {histogram.rows:10d} {rows_per_second}{errors}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show latency percentiles from metrics snapshots")
+    parser.add_argument('files', nargs='*', default=[METRICS_FILE] if METRICS_FILE else [],
+                        help="JSON snapshots (default: METRICS_FILE)")
+    parser.add_argument('--sort', choices=('name', 'count', 'total', 'p99'), default='name')
+    parser.add_argument('--prometheus', action='store_true', help="print the merged metrics in Prometheus format")
+    args = parser.parse_args()
+    if not args.files:
+        parser.error("no snapshot file given and METRICS_FILE is not set")
+
+    try:
+        histograms = load(args.files)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read metrics: {e}", file=sys.stderr)
+        return 1
+    if args.prometheus:
+        print(to_prometheus({'operations': {name: histogram.to_dict() for name, histogram in histograms.items()}}),
+              end='')
+    else:
+        print(report(histograms, args.sort))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
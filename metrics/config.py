@@ -0,0 +1,19 @@
+"""
+Configuration for latency and throughput metrics
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# File the metrics are written to, as JSON or, for a .prom name, in the Prometheus
+# text format (e.g. for the node_exporter textfile collector); setting it enables metrics
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+
+# Instrumentation is off by default; METRICS_ENABLED=1 records metrics without writing a file
+METRICS_ENABLED = bool(METRICS_FILE) or os.getenv('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+# Seconds between writes of METRICS_FILE
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '60'))
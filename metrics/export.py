@@ -0,0 +1,106 @@
+"""
+Export of metrics snapshots as JSON or Prometheus text
+
+A snapshot (MetricsRegistry.snapshot) is written atomically, so a reader
+such as the node_exporter textfile collector or `python -m metrics` never
+sees a partial file. start_exporter rewrites METRICS_FILE periodically from
+a daemon thread and once more at exit.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from .config import METRICS_FILE, METRICS_INTERVAL
+from .registry import BUCKET_BOUNDS, REGISTRY, Histogram, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metric name prefix
+PREFIX = 'plant'
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(snapshot: dict) -> str:
+    """Prometheus text exposition format: one latency histogram and a rows counter per operation"""
+    lines = [
+        f"# HELP {PREFIX}_operation_duration_seconds Latency of instrumented operations",
+        f"# TYPE {PREFIX}_operation_duration_seconds histogram",
+    ]
+    operations = snapshot['operations']
+    for name, data in operations.items():
+        histogram = Histogram.from_dict(data)
+        label = f'operation="{_label(name)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKET_BOUNDS, histogram.counts):
+            cumulative += count
+            lines.append(f'{PREFIX}_operation_duration_seconds_bucket{{{label},le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{PREFIX}_operation_duration_seconds_bucket{{{label},le="+Inf"}} {histogram.count}')
+        lines.append(f'{PREFIX}_operation_duration_seconds_sum{{{label}}} {histogram.total:.9g}')
+        lines.append(f'{PREFIX}_operation_duration_seconds_count{{{label}}} {histogram.count}')
+
+    for metric, key, help_text in (('operation_rows_total', 'rows', "Rows processed by instrumented operations"),
+                                   ('operation_errors_total', 'errors', "Instrumented calls that raised")):
+        lines.append(f"# HELP {PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{metric} counter")
+        for name, data in operations.items():
+            lines.append(f'{PREFIX}_{metric}{{operation="{_label(name)}"}} {data.get(key, 0)}')
+    return "\n".join(lines) + "\n"
+
+
+def to_json(snapshot: dict) -> str:
+    return json.dumps(snapshot, indent=1, sort_keys=True)
+
+
+def write_snapshot(path: str, registry: MetricsRegistry = REGISTRY):
+    """Writes the registry to path, in Prometheus format for a .prom file, otherwise as JSON"""
+    snapshot = registry.snapshot()
+    text = to_prometheus(snapshot) if path.endswith('.prom') else to_json(snapshot)
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def start_exporter(path: str = METRICS_FILE, interval: float = METRICS_INTERVAL,
+                   registry: MetricsRegistry = REGISTRY):
+    """Writes the registry to path every interval seconds and at exit (nothing to do without a path)"""
+    if not path:
+        return None
+    registry.enabled = True
+    stop = threading.Event()
+
+    def write():
+        try:
+            write_snapshot(path, registry)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+
+    def loop():
+        while not stop.wait(interval):
+            write()
+
+    def finish():
+        stop.set()
+        write()
+
+    thread = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+    thread.start()
+    atexit.register(finish)
+    logger.info(f"Writing metrics to {path} every {interval:.0f}s")
+    return stop
@@ -0,0 +1,219 @@
+"""
+Latency histograms and row counters for named operations
+
+Operations are instrumented with the timed decorator or the timer context
+manager. Both check a single flag first, so instrumentation left in hot
+paths costs one attribute lookup per call while metrics are disabled (the
+default, see metrics/config.py).
+
+Latencies go into fixed, logarithmically spaced buckets (eight per decade
+from 1 microsecond to 1000 seconds), which keeps recording O(log buckets),
+memory constant and histograms from different processes mergeable.
+Percentiles are interpolated within their bucket, so they are off by at most
+one bucket width (a third of the value).
+"""
+
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import METRICS_ENABLED
+
+# Upper bounds of the latency buckets in seconds; the last bucket is unbounded
+BUCKET_BOUNDS = [10 ** (exponent / 8) for exponent in range(-48, 25)]
+
+
+class Histogram:
+    """Latency distribution, call count and rows processed by one operation"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0    # seconds
+        self.min = None
+        self.max = None
+        self.rows = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, rows: Optional[int] = None, error: bool = False):
+        index = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+            if rows:
+                self.rows += rows
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated latency below which a fraction q of the calls fall"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = BUCKET_BOUNDS[index - 1] if index else 0.0
+                high = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                estimate = low + (high - low) * (rank - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def merge(self, other: 'Histogram'):
+        """Adds the observations of another histogram"""
+        with self._lock:
+            self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+            self.count += other.count
+            self.total += other.total
+            self.rows += other.rows
+            self.errors += other.errors
+            if other.min is not None and (self.min is None or other.min < self.min):
+                self.min = other.min
+            if other.max is not None and (self.max is None or other.max > self.max):
+                self.max = other.max
+
+    def to_dict(self) -> dict:
+        """JSON-friendly summary; sparse bucket counts keep it mergeable"""
+        with self._lock:
+            data = {
+                'count': self.count, 'sum': self.total, 'min': self.min, 'max': self.max,
+                'rows': self.rows, 'errors': self.errors,
+                'buckets': {str(index): count for index, count in enumerate(self.counts) if count},
+            }
+        for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            data[name] = self.quantile(q)
+        data['rows_per_second'] = self.rows / self.total if self.rows and self.total else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Histogram':
+        histogram = cls()
+        for index, count in data.get('buckets', {}).items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['sum']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        histogram.rows = data.get('rows', 0)
+        histogram.errors = data.get('errors', 0)
+        return histogram
+
+
+class MetricsRegistry:
+    """Histograms by operation name"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name: str, seconds: float, rows: Optional[int] = None, error: bool = False):
+        self.histogram(name).observe(seconds, rows, error)
+
+    def names(self) -> List[str]:
+        return sorted(self._histograms)
+
+    def snapshot(self) -> dict:
+        """All operations as {'started', 'taken', 'operations': {name: Histogram.to_dict()}}"""
+        return {
+            'started': self.started,
+            'taken': time.time(),
+            'operations': {name: self._histograms[name].to_dict() for name in self.names()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+        self.started = time.time()
+
+
+# Registry used by the instrumented modules
+REGISTRY = MetricsRegistry(METRICS_ENABLED)
+
+
+def timed(name: str, rows: Optional[Callable] = None, registry: MetricsRegistry = REGISTRY):
+    """Decorator recording the latency of every call as operation name
+
+    rows, if given, maps the return value to the number of rows processed
+    (e.g. len), from which rows per second are reported.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                registry.observe(name, time.perf_counter() - started, error=True)
+                raise
+            registry.observe(name, time.perf_counter() - started, rows(result) if rows is not None else None)
+            return result
+        return wrapper
+    return decorate
+
+
+class _Timer:
+    """Context manager timing a block; set rows inside the block to count them"""
+
+    __slots__ = ('name', 'registry', 'rows', 'started')
+
+    def __init__(self, name: str, registry: MetricsRegistry):
+        self.name = name
+        self.registry = registry
+        self.rows = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.registry.observe(self.name, time.perf_counter() - self.started, self.rows, exc_type is not None)
+
+
+class _NullTimer:
+    """Stand-in returned while metrics are disabled; rows set on it are discarded"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str, registry: MetricsRegistry = REGISTRY):
+    """Context manager recording the latency of a block as operation name:
+
+        with timer('weather.convert') as t:
+            rows = list(hourly_rows(hourly))
+            t.rows = len(rows)
+    """
+    if not registry.enabled:
+        return _NULL_TIMER
+    return _Timer(name, registry)
@@ -0,0 +1 @@
+# Sensors package - Arduino sensor data ingestion
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+Fixed-size binary sample frames
+
+A frame is 13 bytes, little-endian:
+
+    offset  size  field
+    0       2     sync word 0xA55A (bytes 5A A5)
+    2       1     device id
+    3       2     sequence number (wraps at 65536)
+    5       2     moisture    in 0.01 %  (uint16)
+    7       2     light       in 0.01 %  (uint16)
+    9       2     temperature in 0.01 °C (int16)
+    11      2     CRC-16/CCITT-FALSE of bytes 2..10
+
+A whole received buffer is decoded at once: numpy views it as an array of
+frames (zero-copy), and the sync words and CRCs of all frames are checked
+with array operations. A frame that fails is skipped by searching for the
+next sync word. Without numpy the same format is decoded with struct.
+"""
+
+import struct
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .line_parser import SEQUENCE_MODULUS, Sample, SequenceTracker
+
+SYNC_WORD = 0xA55A
+SYNC_BYTES = struct.pack('<H', SYNC_WORD)
+FRAME_SIZE = 13
+SCALE = 100  # fixed-point factor of the value fields
+
+_FRAME_STRUCT = struct.Struct('<HBHHHhH')
+_CRC_START, _CRC_END = 2, 11  # bytes covered by the CRC
+
+if np is not None:
+    FRAME_DTYPE = np.dtype([
+        ('sync', '<u2'),
+        ('device_id', 'u1'),
+        ('sequence', '<u2'),
+        ('moisture', '<u2'),
+        ('light', '<u2'),
+        ('temperature', '<i2'),
+        ('crc', '<u2'),
+    ])
+    assert FRAME_DTYPE.itemsize == FRAME_SIZE
+
+
+def _crc_table() -> List[int]:
+    """Byte-wise lookup table for CRC-16/CCITT (polynomial 0x1021)"""
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+_CRC_TABLE_ARRAY = np.array(_CRC_TABLE, dtype=np.uint16) if np is not None else None
+
+
+def crc16(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE of data"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def encode_frame(device_id: int, sequence: int, moisture: float, light: float, temperature: float) -> bytes:
+    """Packs one sample into a frame (simulator and test side)"""
+    body = struct.pack('<BHHHh', device_id, sequence % SEQUENCE_MODULUS, round(moisture * SCALE),
+                       round(light * SCALE), round(temperature * SCALE))
+    return SYNC_BYTES + body + struct.pack('<H', crc16(body))
+
+
+def encode_frames(device_ids, sequences, moisture, light, temperature) -> bytes:
+    """Packs equally long sequences of values into consecutive frames (requires numpy)"""
+    frames = np.zeros(len(device_ids), dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['device_id'] = device_ids
+    frames['sequence'] = np.asarray(sequences) % SEQUENCE_MODULUS
+    frames['moisture'] = np.round(np.asarray(moisture) * SCALE)
+    frames['light'] = np.round(np.asarray(light) * SCALE)
+    frames['temperature'] = np.round(np.asarray(temperature) * SCALE)
+    frames['crc'] = _crc16_rows(frames.view(np.uint8).reshape(-1, FRAME_SIZE))
+    return frames.tobytes()
+
+
+def _crc16_rows(rows) -> 'np.ndarray':
+    """CRC of the covered bytes of every row of a (frames x FRAME_SIZE) uint8 array at once"""
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for column in range(_CRC_START, _CRC_END):
+        crc = (crc << 8) ^ _CRC_TABLE_ARRAY[(crc >> 8) ^ rows[:, column]]
+    return crc
+
+
+class BinaryFrameParser:
+    """Decodes a stream of binary frames into Samples; same interface as LineParser"""
+
+    def __init__(self, use_numpy: bool = True):
+        self.use_numpy = use_numpy and np is not None
+        self.sequences = SequenceTracker()
+        self._partial = b''
+        self._resyncing = False  # skipping bytes until the next valid frame
+
+        # Counters
+        self.bytes = 0
+        self.samples = 0
+        self.corrupted = 0  # resynchronizations after a bad sync word or CRC
+
+    def feed(self, data: bytes, arrival: float) -> List[Sample]:
+        """Decodes a chunk of received bytes and returns the samples it completed"""
+        if not self.use_numpy:
+            return self._feed_struct(data, arrival)
+        frames = self.decode(data)
+        if frames is None:
+            return []
+        scaled = zip(frames['device_id'].tolist(), frames['sequence'].tolist(),
+                     (frames['moisture'] / SCALE).tolist(), (frames['light'] / SCALE).tolist(),
+                     (frames['temperature'] / SCALE).tolist())
+        return [Sample(arrival, device_id, sequence, moisture, light, temperature)
+                for device_id, sequence, moisture, light, temperature in scaled]
+
+    def decode(self, data: bytes) -> Optional['np.ndarray']:
+        """Decodes a chunk into a FRAME_DTYPE array of the valid frames it completed"""
+        self.bytes += len(data)
+        buffer = self._partial + data if self._partial else data
+        parts = []
+        position = 0
+        while True:
+            start = self._find_sync(buffer, position)
+            if start < 0:
+                position = self._keep_tail(buffer, position)
+                break
+            count = (len(buffer) - start) // FRAME_SIZE
+            if count == 0:
+                position = start
+                break
+
+            frames = np.frombuffer(buffer, dtype=FRAME_DTYPE, count=count, offset=start)
+            rows = np.frombuffer(buffer, dtype=np.uint8, count=count * FRAME_SIZE,
+                                 offset=start).reshape(count, FRAME_SIZE)
+            valid = (frames['sync'] == SYNC_WORD) & (_crc16_rows(rows) == frames['crc'])
+            if valid.all():
+                parts.append(frames)
+                self._resyncing = False
+                position = start + count * FRAME_SIZE
+                continue
+            bad = int(np.argmin(valid))
+            if bad:
+                parts.append(frames[:bad])
+                self._resyncing = False
+            self._skip()
+            position = start + bad * FRAME_SIZE + 1  # look for the next sync word after the bad frame
+
+        self._partial = buffer[position:]
+        if not parts:
+            return None
+        frames = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        frames = self._track_sequences(frames)
+        self.samples += len(frames)
+        return frames
+
+    def _track_sequences(self, frames) -> 'np.ndarray':
+        """Tracks sequence numbers per device and returns the frames without duplicates
+
+        A device's frames that all follow each other are recorded with array
+        operations; gaps, duplicates and late frames are checked one by one.
+        """
+        devices = frames['device_id']
+        keep = None
+        for device_id in np.unique(devices).tolist():
+            selected = devices == device_id
+            sequences = frames['sequence'][selected].astype(np.int64)
+            previous = self.sequences.last_sequence(device_id)
+            chained = sequences if previous is None else np.concatenate(([previous], sequences))
+            if (np.diff(chained) % SEQUENCE_MODULUS == 1).all():
+                if previous is None:
+                    self.sequences.check(device_id, int(sequences[0]))
+                self.sequences.advance(device_id, int(sequences[-1]))
+                continue
+            accepted = np.fromiter((self.sequences.check(device_id, sequence) for sequence in sequences.tolist()),
+                                   dtype=bool, count=len(sequences))
+            if not accepted.all():
+                if keep is None:
+                    keep = np.ones(len(frames), dtype=bool)
+                keep[np.flatnonzero(selected)[~accepted]] = False
+        return frames if keep is None else frames[keep]
+
+    def _feed_struct(self, data: bytes, arrival: float) -> List[Sample]:
+        """Frame-by-frame decoding with struct, used when numpy is not installed"""
+        self.bytes += len(data)
+        buffer = self._partial + data if self._partial else data
+        samples = []
+        position = 0
+        while True:
+            start = self._find_sync(buffer, position)
+            if start < 0:
+                position = self._keep_tail(buffer, position)
+                break
+            if start + FRAME_SIZE > len(buffer):
+                position = start
+                break
+            _, device_id, sequence, moisture, light, temperature, crc = _FRAME_STRUCT.unpack_from(buffer, start)
+            if crc16(buffer[start + _CRC_START:start + _CRC_END]) != crc:
+                self._skip()
+                position = start + 1
+                continue
+            self._resyncing = False
+            position = start + FRAME_SIZE
+            if not self.sequences.check(device_id, sequence):
+                continue  # duplicate
+            samples.append(Sample(arrival, device_id, sequence, moisture / SCALE, light / SCALE,
+                                  temperature / SCALE))
+        self._partial = buffer[position:]
+        self.samples += len(samples)
+        return samples
+
+    def _find_sync(self, buffer: bytes, position: int) -> int:
+        """Finds the next sync word; skipping bytes to reach it counts as corruption"""
+        start = buffer.find(SYNC_BYTES, position)
+        if start > position:
+            self._skip()
+        return start
+
+    def _keep_tail(self, buffer: bytes, position: int) -> int:
+        """Returns where to cut a buffer without sync word; a trailing first sync byte is kept"""
+        end = len(buffer) - 1 if buffer.endswith(SYNC_BYTES[:1]) else len(buffer)
+        if end > position:
+            self._skip()
+        return max(position, end)
+
+    def _skip(self):
+        """Counts one corruption per resynchronization, however many bytes it skips"""
+        if not self._resyncing:
+            self.corrupted += 1
+            self._resyncing = True
@@ -0,0 +1,19 @@
+"""
+Configuration for the Arduino sensor connection
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Serial port of the Arduino, e.g. /dev/ttyACM0 or COM3; readings are simulated when unset
+SERIAL_PORT = os.getenv('SERIAL_PORT')
+SERIAL_BAUDRATE = int(os.getenv('SERIAL_BAUDRATE', '115200'))
+
+# Wire format sent by the Arduino: 'line' (CSV text) or 'binary' (sensors/binary_frame.py)
+SERIAL_PROTOCOL = os.getenv('SERIAL_PROTOCOL', 'line')
+
+# How often the GUI shows the newest sample (milliseconds)
+DISPLAY_REFRESH_MS = 1000
@@ -0,0 +1,185 @@
+"""
+Incremental parser for the Arduino line protocol
+
+Each sample is one ASCII line, either
+
+    moisture,light,temperature
+    device_id,sequence,moisture,light,temperature
+
+terminated by \\n (a preceding \\r is ignored). Bytes are fed in whatever chunks
+the serial port delivers; complete lines are split off with bytes operations,
+so the cost is per line, not per byte. Lines that do not parse are counted and
+skipped, which resynchronizes the parser at the next newline.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Set
+
+# Longest valid line; longer unterminated input is line noise and is discarded
+MAX_LINE_LENGTH = 64
+
+# Accepted value ranges (inclusive); anything outside is treated as corruption
+VALUE_RANGES = {
+    'moisture': (0, 100),
+    'light': (0, 100),
+    'temperature': (-40, 85),
+}
+
+DEFAULT_DEVICE_ID = 1
+SEQUENCE_MODULUS = 1 << 16
+
+# Samples arriving at most this many sequence numbers behind a device's newest
+# one are late (reordered or duplicated); further behind, the device restarted.
+# Kept small, as a restart that lands inside the window looks like duplicates.
+REORDER_WINDOW = 32
+
+
+class Sample(NamedTuple):
+    """One sensor sample, timestamped when its bytes arrived"""
+    arrival: float           # time.time() of the read that completed the sample
+    device_id: int
+    sequence: Optional[int]  # None for lines without a sequence number
+    moisture: float
+    light: float
+    temperature: float
+
+
+class SequenceTracker:
+    """Counts samples lost, duplicated and reordered in transit from per-device 16-bit sequence numbers
+
+    Besides each device's newest sequence number, the numbers skipped within
+    the last `window` are kept. One of them arriving late was reordered, not
+    lost; a number that was already received is a duplicate, and check()
+    tells the parser to drop it.
+    """
+
+    def __init__(self, modulus: int = SEQUENCE_MODULUS, window: int = REORDER_WINDOW):
+        self.modulus = modulus
+        self.window = window
+        self._last: Dict[int, int] = {}
+        self._missing: Dict[int, Set[int]] = {}  # device id -> skipped numbers within the window
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+
+    def check(self, device_id: int, sequence: int) -> bool:
+        """Records a sequence number; returns False for a duplicate, which should be dropped"""
+        last = self._last.get(device_id)
+        if last is None:
+            self._last[device_id] = sequence
+            return True
+        behind = (last - sequence) % self.modulus
+        if behind == 0:
+            self.duplicates += 1
+            return False
+        if behind <= self.window:
+            missing = self._missing.get(device_id)
+            if missing is None or sequence not in missing:
+                self.duplicates += 1
+                return False
+            # Counted as lost when it was skipped
+            missing.discard(sequence)
+            self.lost -= 1
+            self.reordered += 1
+            return True
+
+        gap = (sequence - last - 1) % self.modulus
+        if gap >= self.modulus // 2:
+            # Far behind the last one: the device restarted
+            self._missing.pop(device_id, None)
+        elif gap:
+            self.lost += gap
+            missing = self._missing.setdefault(device_id, set())
+            missing.update((sequence - offset) % self.modulus for offset in range(1, min(gap, self.window) + 1))
+        self.advance(device_id, sequence)
+        return True
+
+    def last_sequence(self, device_id: int) -> Optional[int]:
+        """Returns the last sequence number seen from a device"""
+        return self._last.get(device_id)
+
+    def advance(self, device_id: int, sequence: int):
+        """Moves a device's newest sequence number forward (after consecutive ones, e.g. by the frame decoder)"""
+        self._last[device_id] = sequence
+        missing = self._missing.get(device_id)
+        if missing:
+            # Numbers that fell out of the window stay lost
+            missing.difference_update([number for number in missing
+                                       if (sequence - number) % self.modulus > self.window])
+
+    def reset(self, device_id: Optional[int] = None):
+        """Forgets the last sequence number (e.g. after reopening the port)"""
+        if device_id is None:
+            self._last.clear()
+            self._missing.clear()
+        else:
+            self._last.pop(device_id, None)
+            self._missing.pop(device_id, None)
+
+
+class LineParser:
+    """Turns a byte stream into Samples, counting corrupted lines"""
+
+    def __init__(self, default_device_id: int = DEFAULT_DEVICE_ID, max_line_length: int = MAX_LINE_LENGTH):
+        self.default_device_id = default_device_id
+        self.max_line_length = max_line_length
+        self.sequences = SequenceTracker()
+        self._partial = b''
+        self._discarding = False  # inside an overlong line, skipping up to the next newline
+
+        # Counters
+        self.bytes = 0
+        self.samples = 0
+        self.corrupted = 0
+
+    def feed(self, data: bytes, arrival: float) -> List[Sample]:
+        """Parses a chunk of received bytes and returns the samples it completed"""
+        self.bytes += len(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+
+        if self._discarding and lines:
+            # The first line is the tail of the overlong one
+            lines.pop(0)
+            self._discarding = False
+        if len(self._partial) > self.max_line_length:
+            self._partial = b''
+            if not self._discarding:
+                self.corrupted += 1
+                self._discarding = True
+
+        samples = []
+        for line in lines:
+            sample = self._parse_line(line, arrival)
+            if sample is not None:
+                samples.append(sample)
+        self.samples += len(samples)
+        return samples
+
+    def _parse_line(self, line: bytes, arrival: float) -> Optional[Sample]:
+        """Parses one line; returns None (and counts it) if it is corrupted"""
+        fields = line.rstrip(b'\r').split(b',')
+        try:
+            if len(fields) == 3:
+                device_id, sequence = self.default_device_id, None
+                moisture, light, temperature = float(fields[0]), float(fields[1]), float(fields[2])
+            elif len(fields) == 5:
+                device_id, sequence = int(fields[0]), int(fields[1])
+                moisture, light, temperature = float(fields[2]), float(fields[3]), float(fields[4])
+            elif fields == [b'']:
+                return None  # blank line, e.g. a bare \r\n
+            else:
+                raise ValueError(f"{len(fields)} fields")
+        except ValueError:
+            self.corrupted += 1
+            return None
+
+        if not (VALUE_RANGES['moisture'][0] <= moisture <= VALUE_RANGES['moisture'][1]
+                and VALUE_RANGES['light'][0] <= light <= VALUE_RANGES['light'][1]
+                and VALUE_RANGES['temperature'][0] <= temperature <= VALUE_RANGES['temperature'][1]
+                and 0 <= device_id and (sequence is None or 0 <= sequence < SEQUENCE_MODULUS)):
+            self.corrupted += 1
+            return None
+
+        if sequence is not None and not self.sequences.check(device_id, sequence):
+            return None  # duplicate
+        return Sample(arrival, device_id, sequence, moisture, light, temperature)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Synthetic multi-device load for soak testing the serial ingest path
+
+Emulates many Arduinos sending samples at a fixed rate, with plausible
+signals (a diurnal light cycle, soil drying out between watering events,
+temperature following the light, sensor noise) and the faults of a real
+link: dropouts, corrupted, duplicated and reordered frames. The bytes are
+written into ptys and go through the same path as real devices: a
+SerialIngestor per port, the write buffer and PlantDatabase.
+
+Every report shows the target and achieved rates (sent, parsed and
+committed), the backlog (rows waiting in the write buffer and bytes not yet
+read from the ptys) and the end-to-end latency from the write into the pty
+to the commit. With --ramp the rate is multiplied after every stage until
+the pipeline stops keeping up, which is the breaking point:
+
+    python -m sensors.load_generator --devices 50 --rate 10 --duration 30
+    python -m sensors.load_generator --devices 100 --rate 5 --ramp 2 --steps 6 --duration 15
+"""
+
+import argparse
+import collections
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tty
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from db.combined_database import PlantDatabase
+from db.write_buffer import Durability
+from metrics.registry import Histogram
+from .binary_frame import FRAME_SIZE, encode_frame
+from .line_parser import SEQUENCE_MODULUS
+from .serial_ingest import SerialIngestor, make_parser
+
+# Seconds between two passes of the sender
+TICK = 0.005
+
+# A device further behind its schedule than this skips the missed samples instead of bursting
+MAX_LAG = 1.0
+
+# Largest device id of a binary frame (uint8)
+MAX_BINARY_DEVICE_ID = 255
+
+# A stage keeps up when it sends at least this fraction of the target rate
+KEEP_UP_FRACTION = 0.95
+
+
+class Faults(NamedTuple):
+    """Link faults injected per device"""
+    dropout: float = 0.002          # dropouts started per second
+    dropout_seconds: float = 5.0    # mean dropout length
+    corrupt: float = 0.001          # fraction of frames with a damaged byte
+    duplicate: float = 0.001        # fraction of frames sent twice
+    reorder: float = 0.001          # fraction of frames swapped with the next one
+
+
+DEFAULT_FAULTS = Faults()
+
+
+class PlantSignal:
+    """Readings of one plant: light follows the sun, soil dries out until it is watered"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.moisture = rng.uniform(55, 85)
+        self.drying = rng.uniform(0.4, 1.2)       # % per hour
+        self.water_below = rng.uniform(25, 35)
+        self.peak_light = rng.uniform(60, 95)
+        self.cloudiness = 0.0
+        self._last = None
+
+    def sample(self, moment: float) -> Tuple[float, float, float]:
+        """moisture, light, temperature at a (simulated) time.time() moment"""
+        hours = 0.0 if self._last is None else max(0.0, moment - self._last) / 3600
+        self._last = moment
+        self.moisture -= self.drying * hours
+        if self.moisture < self.water_below:
+            self.moisture = self.rng.uniform(75, 90)  # watered
+        # Clouds drift slowly between clear and overcast
+        self.cloudiness = min(0.8, max(0.0, self.cloudiness + self.rng.gauss(0, 0.02)))
+
+        local = time.localtime(moment)
+        hour = local.tm_hour + local.tm_min / 60 + local.tm_sec / 3600
+        daylight = max(0.0, math.sin(math.pi * (hour - 6) / 14)) if 6 <= hour <= 20 else 0.0
+        light = self.peak_light * daylight * (1 - self.cloudiness) + self.rng.gauss(0, 1)
+        temperature = 18 + 7 * daylight * (1 - self.cloudiness / 2) + self.rng.gauss(0, 0.2)
+        moisture = self.moisture + self.rng.gauss(0, 0.3)
+        return (min(100.0, max(0.0, moisture)), min(100.0, max(0.0, light)), temperature)
+
+
+class SimulatedDevice:
+    """One Arduino: its signal, sequence counter, schedule and link faults"""
+
+    def __init__(self, device_id: int, port: int, rate: float, protocol: str, faults: Faults,
+                 rng: random.Random, time_scale: float, clock_start: Tuple[float, float]):
+        self.device_id = device_id
+        self.port = port
+        self.rate = rate
+        self.protocol = protocol
+        self.faults = faults
+        self.rng = rng
+        self.time_scale = time_scale
+        self.signal = PlantSignal(rng)
+        self.sequence = rng.randrange(SEQUENCE_MODULUS)
+        self._wall_start, self._perf_start = clock_start
+        self.next_due = self._perf_start + rng.uniform(0, 1 / rate)  # devices are not in step
+        self._dropout_until = 0.0
+        self._held: Optional[Tuple[Optional[int], bytes]] = None
+        self.injected = collections.Counter()
+
+    def due(self, now: float) -> List[Tuple[Optional[int], bytes]]:
+        """(sequence, bytes) of the frames due by perf_counter() time now; sequence None when corrupted"""
+        frames = []
+        if now - self.next_due > MAX_LAG:
+            skipped = int((now - self.next_due) * self.rate)
+            self.injected['skipped'] += skipped
+            self.sequence = (self.sequence + skipped) % SEQUENCE_MODULUS
+            self.next_due += skipped / self.rate
+        while self.next_due <= now:
+            interval = 1 / self.rate
+            moment = self._wall_start + (self.next_due - self._perf_start) * self.time_scale
+            sequence = self.sequence
+            self.sequence = (sequence + 1) % SEQUENCE_MODULUS
+            self.next_due += interval
+
+            # The link drops out now and then; the device keeps counting
+            if self.next_due < self._dropout_until:
+                self.injected['lost'] += 1
+                continue
+            if self.rng.random() < self.faults.dropout * interval:
+                self._dropout_until = self.next_due + self.rng.expovariate(1 / self.faults.dropout_seconds)
+                self.injected['dropouts'] += 1
+                self.injected['lost'] += 1
+                continue
+
+            frame = self.encode(sequence, *self.signal.sample(moment))
+            if self.rng.random() < self.faults.corrupt:
+                frames.append((None, self.corrupt(frame)))
+                self.injected['corrupted'] += 1
+            elif self._held is None and self.rng.random() < self.faults.reorder:
+                self._held = (sequence, frame)
+                self.injected['reordered'] += 1
+                continue
+            else:
+                frames.append((sequence, frame))
+                if self.rng.random() < self.faults.duplicate:
+                    frames.append((sequence, frame))
+                    self.injected['duplicated'] += 1
+            if self._held is not None:
+                frames.append(self._held)
+                self._held = None
+        return frames
+
+    def encode(self, sequence: int, moisture: float, light: float, temperature: float) -> bytes:
+        if self.protocol == 'binary':
+            return encode_frame(self.device_id, sequence, moisture, light, temperature)
+        return f"{self.device_id},{sequence},{moisture:.1f},{light:.1f},{temperature:.1f}\r\n".encode()
+
+    def corrupt(self, frame: bytes) -> bytes:
+        """Damages one byte in the middle of a frame (line noise)"""
+        position = self.rng.randrange(3, len(frame) - 3)
+        damaged = b'#' if self.protocol == 'line' else bytes([frame[position] ^ 0x5A])
+        return frame[:position] + damaged + frame[position + 1:]
+
+
+class _TimedDatabase(PlantDatabase):
+    """PlantDatabase reporting when each batch of readings is committed"""
+
+    def __init__(self, db_path: str, on_commit):
+        self.on_commit = on_commit
+        super().__init__(db_path)
+
+    def save_readings(self, rows) -> int:
+        count = super().save_readings(rows)
+        self.on_commit(count, time.time())
+        return count
+
+
+class _TrackedIngestor(SerialIngestor):
+    """SerialIngestor whose queued rows are recorded in queue order, across all ports"""
+
+    def __init__(self, database, stream, parser, tracker: 'LatencyTracker'):
+        super().__init__(database, stream, parser)
+        self.tracker = tracker
+
+    def ingest(self, data: bytes, arrival: Optional[float] = None) -> list:
+        with self.tracker.lock:
+            queued_before = self.queued
+            samples = super().ingest(data, arrival)
+            self.tracker.queued(samples, self.queued - queued_before)
+        return samples
+
+
+class LatencyTracker:
+    """Matches samples with the time their frame was written, and commits with queued samples
+
+    Rows are committed in the order they were queued, so each committed
+    batch of n rows is the n oldest queued samples.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent_at: Dict[Tuple[int, int], float] = {}
+        self.parse_latency = Histogram()
+        self.commit_latency = Histogram()
+        self._queued = collections.deque()    # write time of every queued row (None if unknown)
+        self._commits = collections.deque()   # (rows, commit time)
+        self._uncounted = 0                   # committed rows not matched yet
+
+    def sent(self, device_id: int, sequence: int, moment: float):
+        self.sent_at[(device_id, sequence)] = moment
+
+    def queued(self, samples, accepted: int):
+        """Called with the samples of one chunk; the first accepted of them were queued"""
+        for index, sample in enumerate(samples):
+            sent = self.sent_at.pop((sample.device_id, sample.sequence), None)
+            if sent is not None:
+                self.parse_latency.observe(max(0.0, sample.arrival - sent))
+            if index < accepted:
+                self._queued.append(sent)
+
+    def committed(self, rows: int, moment: float):
+        self._commits.append((rows, moment))
+
+    def match(self):
+        """Assigns commit times to queued rows (run periodically by the reporter)"""
+        while self._commits:
+            rows, moment = self._commits[0]
+            rows -= self._uncounted
+            while rows and self._queued:
+                sent = self._queued.popleft()
+                rows -= 1
+                self._uncounted += 1
+                if sent is not None:
+                    self.commit_latency.observe(max(0.0, moment - sent))
+            if rows:
+                return  # the rows were committed before the reader recorded them; next time
+            self._commits.popleft()
+            self._uncounted = 0
+
+
+class LoadGenerator:
+    """Devices written into ptys and ingested into a database, with rate and latency reporting"""
+
+    def __init__(self, database_path: str, devices: int, rate: float, ports: int = 1, protocol: str = 'binary',
+                 faults: Faults = DEFAULT_FAULTS, time_scale: float = 1.0, durability: Durability = Durability.GROUP,
+                 max_queue: int = 10000, seed: int = 1):
+        if protocol == 'binary' and devices > MAX_BINARY_DEVICE_ID:
+            raise ValueError(f"Binary frames carry at most {MAX_BINARY_DEVICE_ID} device ids")
+        self.protocol = protocol
+        self.tracker = LatencyTracker()
+        self.database = _TimedDatabase(database_path, self.tracker.committed)
+        self.database.enable_write_buffer(durability, max_queue=max_queue)
+
+        self.masters, self.ingestors = [], []
+        for _ in range(ports):
+            master, slave = os.openpty()
+            tty.setraw(slave)  # no echo or line editing, like a real serial device
+            self.masters.append(master)
+            self.ingestors.append(_TrackedIngestor(self.database, slave, make_parser(protocol), self.tracker))
+
+        rng = random.Random(seed)
+        clock_start = (time.time(), time.perf_counter())
+        self.devices = [SimulatedDevice(device_id, (device_id - 1) % ports, rate, protocol, faults,
+                                        random.Random(rng.random()), time_scale, clock_start)
+                        for device_id in range(1, devices + 1)]
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.totals: Optional[dict] = None  # counters at stop()
+        self._stop = threading.Event()
+        self._sender = threading.Thread(target=self._send, name="load-sender", daemon=True)
+
+    @property
+    def target_rate(self) -> float:
+        return sum(device.rate for device in self.devices)
+
+    def set_rate(self, rate: float):
+        """Samples per second of every device"""
+        for device in self.devices:
+            device.rate = rate
+
+    def start(self):
+        for ingestor in self.ingestors:
+            ingestor.start()
+        self._sender.start()
+
+    def stop(self):
+        """Stops sending, lets the ingestors drain the ptys and commits the write buffer"""
+        self._stop.set()
+        self._sender.join()
+        deadline = time.monotonic() + 10
+        while self.unread_bytes() > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.database.flush()
+        for ingestor in self.ingestors:
+            ingestor.stop()
+        self.tracker.match()
+        self.totals = self.counters()
+        self.database.close()
+        for ingestor in self.ingestors:
+            os.close(ingestor.stream)
+        for master in self.masters:
+            os.close(master)
+
+    def _send(self):
+        """Sender loop: writes every device's due frames into its port each tick"""
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            chunks = [[] for _ in self.masters]
+            moment = time.time()
+            for device in self.devices:
+                for sequence, frame in device.due(now):
+                    chunks[device.port].append(frame)
+                    if sequence is not None:
+                        self.tracker.sent(device.device_id, sequence, moment)
+                    self.frames_sent += 1
+            for master, frames in zip(self.masters, chunks):
+                data = b''.join(frames)
+                self.bytes_sent += len(data)
+                while data:
+                    # Blocks while the pty is full, like a saturated serial line
+                    written = os.write(master, data)
+                    data = data[written:]
+            delay = now + TICK - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def unread_bytes(self) -> int:
+        return self.bytes_sent - sum(ingestor.parser.bytes for ingestor in self.ingestors)
+
+    def counters(self) -> dict:
+        """Totals since the start"""
+        stats = collections.Counter()
+        for ingestor in self.ingestors:
+            stats.update(ingestor.stats())
+        injected = collections.Counter()
+        for device in self.devices:
+            injected.update(device.injected)
+        buffer = self.database._write_buffer
+        return {
+            'sent': self.frames_sent,
+            'parsed': stats['samples'],
+            'committed': buffer.written if buffer is not None else 0,
+            'dropped': stats['dropped'],
+            'corrupted': stats['corrupted'],
+            'lost_in_transit': stats['lost_in_transit'],
+            'duplicates': stats['duplicates'],
+            'reordered': stats['reordered'],
+            'backlog_rows': buffer.pending() if buffer is not None else 0,
+            'backlog_bytes': self.unread_bytes(),
+            'injected': dict(injected),
+        }
+
+
+def _rate(now: dict, before: dict, key: str, seconds: float) -> float:
+    return (now[key] - before[key]) / seconds if seconds > 0 else 0.0
+
+
+def _ms(histogram: Histogram, q: float) -> str:
+    value = histogram.quantile(q)
+    return f"{value * 1000:.0f}" if value is not None else "-"
+
+
+def run_stage(generator: LoadGenerator, duration: float, interval: float, max_latency: float) -> dict:
+    """Runs the generator at its current rate for duration seconds, printing a line every interval"""
+    generator.tracker.commit_latency = Histogram()
+    started = time.perf_counter()
+    first = last = generator.counters()
+    last_time = started
+    while True:
+        remaining = started + duration - time.perf_counter()
+        time.sleep(max(0.0, min(interval, remaining)))
+        generator.tracker.match()
+        now_time = time.perf_counter()
+        now = generator.counters()
+        seconds = now_time - last_time
+        latency = generator.tracker.commit_latency
+        print(f"  {now_time - started:5.0f}s  target {generator.target_rate:8.0f}/s  "
+              f"sent {_rate(now, last, 'sent', seconds):8.0f}/s  parsed {_rate(now, last, 'parsed', seconds):8.0f}/s  "
+              f"committed {_rate(now, last, 'committed', seconds):8.0f}/s  "
+              f"backlog {now['backlog_rows']:6d} rows {now['backlog_bytes'] / 1024:6.0f} KB  "
+              f"latency p50 {_ms(latency, 0.5)} p99 {_ms(latency, 0.99)} ms  dropped {now['dropped']}")
+        last, last_time = now, now_time
+        if remaining <= interval:
+            break
+
+    seconds = last_time - started
+    latency = generator.tracker.commit_latency
+    result = {
+        'target_rate': generator.target_rate,
+        'sent_rate': _rate(last, first, 'sent', seconds),
+        'parsed_rate': _rate(last, first, 'parsed', seconds),
+        'committed_rate': _rate(last, first, 'committed', seconds),
+        'dropped': last['dropped'] - first['dropped'],
+        'backlog_rows': last['backlog_rows'],
+        'backlog_bytes': last['backlog_bytes'],
+        'latency_ms': {name: (latency.quantile(q) or 0.0) * 1000
+                       for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+    }
+    # Samples lost to injected faults never reach the database, so rates are compared with what was sent
+    problems = []
+    if result['sent_rate'] < KEEP_UP_FRACTION * result['target_rate'] * _delivered_fraction(generator):
+        problems.append("the sender fell behind")
+    if result['backlog_rows'] > result['target_rate'] * max_latency:
+        problems.append(f"{result['backlog_rows']} rows waiting for a commit")
+    if result['dropped']:
+        problems.append(f"{result['dropped']} samples dropped (write buffer full)")
+    if result['latency_ms']['p99'] > max_latency * 1000:
+        problems.append(f"p99 latency above {max_latency:.1f}s")
+    result['problems'] = problems
+    return result
+
+
+def _delivered_fraction(generator: LoadGenerator) -> float:
+    """Fraction of generated samples not lost in injected dropouts"""
+    injected = collections.Counter()
+    for device in generator.devices:
+        injected.update(device.injected)
+    generated = generator.frames_sent + injected['lost']
+    return generator.frames_sent / generated if generated else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test the serial ingest path with simulated devices")
+    parser.add_argument('--devices', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=10, help="samples per second per device")
+    parser.add_argument('--ports', type=int, default=1, help="ptys (serial ports) the devices are spread over")
+    parser.add_argument('--protocol', choices=('binary', 'line'), default='binary')
+    parser.add_argument('--duration', type=float, default=30, help="seconds per stage")
+    parser.add_argument('--ramp', type=float, default=1.0, help="rate multiplier after every stage")
+    parser.add_argument('--steps', type=int, default=1, help="stages; the run ends at the first overloaded one")
+    parser.add_argument('--report-interval', type=float, default=5)
+    parser.add_argument('--max-latency', type=float, default=2.0, help="acceptable p99 latency in seconds")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="simulated seconds per real second (e.g. 3600 shows a day in 24 s)")
+    parser.add_argument('--dropout', type=float, default=DEFAULT_FAULTS.dropout, help="dropouts per device and second")
+    parser.add_argument('--corrupt', type=float, default=DEFAULT_FAULTS.corrupt)
+    parser.add_argument('--duplicate', type=float, default=DEFAULT_FAULTS.duplicate)
+    parser.add_argument('--reorder', type=float, default=DEFAULT_FAULTS.reorder)
+    parser.add_argument('--durability', choices=[d.value for d in Durability if d != Durability.IMMEDIATE],
+                        default=Durability.GROUP.value)
+    parser.add_argument('--max-queue', type=int, default=10000, help="write buffer size")
+    parser.add_argument('--database', help="database file (default: a temporary one)")
+    parser.add_argument('--json', help="write the stage results to this file")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    faults = Faults(args.dropout, DEFAULT_FAULTS.dropout_seconds, args.corrupt, args.duplicate, args.reorder)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.database or os.path.join(tmp_dir, "load.db")
+        generator = LoadGenerator(path, args.devices, args.rate, args.ports, args.protocol, faults,
+                                  args.time_scale, Durability(args.durability), args.max_queue, args.seed)
+        frame = f"{FRAME_SIZE}-byte frames" if args.protocol == 'binary' else "text lines"
+        print(f"{args.devices} devices on {args.ports} port(s), {frame}, writing to {path}")
+        generator.start()
+        stages = []
+        rate = args.rate
+        try:
+            for step in range(args.steps):
+                generator.set_rate(rate)
+                print(f"Stage {step + 1}: {rate:g} samples/s per device, {generator.target_rate:g} samples/s total")
+                result = run_stage(generator, args.duration, args.report_interval, args.max_latency)
+                stages.append(result)
+                if result['problems']:
+                    print(f"  Overloaded at {result['target_rate']:g} samples/s: {'; '.join(result['problems'])}")
+                    break
+                print(f"  Kept up with {result['target_rate']:g} samples/s")
+                rate *= args.ramp
+        except KeyboardInterrupt:
+            print("Interrupted")
+        finally:
+            generator.stop()
+
+    totals = generator.totals
+    injected = totals['injected']
+    print(f"Sent {totals['sent']}, parsed {totals['parsed']}, committed {totals['committed']}, "
+          f"dropped {totals['dropped']}")
+    print(f"Faults injected / detected: lost {injected.get('lost', 0)} / {totals['lost_in_transit']}, "
+          f"corrupted {injected.get('corrupted', 0)} / {totals['corrupted']}, "
+          f"duplicated {injected.get('duplicated', 0)} / {totals['duplicates']}, "
+          f"reordered {injected.get('reordered', 0)} / {totals['reordered']}")
+    print("  (corrupted frames and samples skipped by a lagging sender also leave gaps, counted as lost;"
+          " duplicates are not saved)")
+    latency = generator.tracker.parse_latency
+    print(f"pty -> parser latency: p50 {_ms(latency, 0.5)} ms, p99 {_ms(latency, 0.99)} ms")
+    sustained = [stage['target_rate'] for stage in stages if not stage['problems']]
+    if sustained:
+        print(f"Highest sustained rate: {max(sustained):g} samples/s")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'stages': stages, 'totals': totals}, file, indent=1)
+    return 1 if stages and stages[-1]['problems'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Serial ingestion: reads the Arduino byte stream on a background thread,
+parses it and queues the samples for batched writes to PlantDatabase
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from db.combined_database import PlantDatabase
+from .binary_frame import BinaryFrameParser
+from .line_parser import LineParser, Sample
+
+logger = logging.getLogger(__name__)
+
+# Seconds between "buffer full" warnings, so an overload does not flood the log
+DROP_WARNING_INTERVAL = 10.0
+
+
+def open_serial(port: str, baudrate: int = 115200):
+    """Opens a serial port with pyserial (optional dependency); returns a file-like object"""
+    try:
+        import serial
+    except ImportError:
+        raise Exception("pyserial is required to read from a serial port: pip install pyserial")
+    # A short timeout makes read() return what has arrived instead of waiting for a full chunk
+    return serial.Serial(port, baudrate, timeout=0.02)
+
+
+def make_parser(protocol: str = 'line'):
+    """Returns the parser for a wire format: 'line' or 'binary'"""
+    if protocol == 'line':
+        return LineParser()
+    if protocol == 'binary':
+        return BinaryFrameParser()
+    raise ValueError(f"Unknown serial protocol: {protocol}")
+
+
+class SerialIngestor:
+    """Background reader turning a serial-style stream into database rows
+
+    The stream can be a file descriptor (e.g. a pty or an os.open()ed tty), a
+    file-like object with read1()/read(), or a pyserial port. The parser is a
+    LineParser (default) or a BinaryFrameParser. Samples are
+    timestamped on arrival and queued on the database write buffer without
+    blocking; samples that do not fit are dropped and counted, so a slow disk
+    never stalls the serial port.
+    """
+
+    def __init__(self, database: PlantDatabase, stream, parser=None,
+                 chunk_size: int = 4096, on_samples: Optional[Callable[[List[Sample]], None]] = None):
+        self.database = database
+        self.stream = stream
+        self.parser = parser if parser is not None else LineParser()
+        self.chunk_size = chunk_size
+        self.on_samples = on_samples  # called on the reader thread with the samples of each chunk
+
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._second = None  # cached timestamp text of the current second
+        self._second_text = ''
+        self._second_hour = 0
+        self._last_drop_warning = float('-inf')
+
+        # Counters
+        self.queued = 0
+        self.dropped = 0
+
+    def start(self):
+        """Starts the reader thread"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="serial-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stops the reader thread after its current read"""
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self) -> dict:
+        """Returns the ingestion counters"""
+        return {
+            'bytes': self.parser.bytes,
+            'samples': self.parser.samples,
+            'corrupted': self.parser.corrupted,
+            'lost_in_transit': self.parser.sequences.lost,
+            'duplicates': self.parser.sequences.duplicates,
+            'reordered': self.parser.sequences.reordered,
+            'queued': self.queued,
+            'dropped': self.dropped,
+        }
+
+    def ingest(self, data: bytes, arrival: Optional[float] = None) -> List[Sample]:
+        """Parses one received chunk and queues its samples (the reader thread calls this)"""
+        if arrival is None:
+            arrival = time.time()
+        samples = self.parser.feed(data, arrival)
+        if samples:
+            rows = [self._to_row(sample) for sample in samples]
+            queued = self.database.queue_readings(rows, timeout=0)
+            self.queued += queued
+            if queued < len(rows):
+                self.dropped += len(rows) - queued
+                now = time.monotonic()
+                if now - self._last_drop_warning >= DROP_WARNING_INTERVAL:
+                    self._last_drop_warning = now
+                    logger.warning(f"Write buffer full, {self.dropped} samples dropped so far")
+            if self.on_samples is not None:
+                self.on_samples(samples)
+        return samples
+
+    def _run(self):
+        """Reader loop: blocks on the stream and hands every chunk to ingest()"""
+        read = self._reader()
+        while not self._stopping:
+            try:
+                data = read(self.chunk_size)
+            except OSError as e:
+                # EIO: the other end of a pty was closed
+                logger.error(f"Serial read failed: {e}")
+                break
+            if data is None:
+                continue  # non-blocking stream with nothing to read
+            if not data:
+                if isinstance(self.stream, int) or not hasattr(self.stream, 'in_waiting'):
+                    break  # end of stream
+                continue  # pyserial read timeout
+            self.ingest(data)
+
+    def _reader(self) -> Callable[[int], Optional[bytes]]:
+        """Returns a read(n) function returning the bytes available now (at most n)"""
+        if isinstance(self.stream, int):
+            if os.name != 'posix':
+                return lambda n: os.read(self.stream, n)
+
+            def read_fd(n):
+                # Waiting in select() keeps stop() responsive while the line is quiet
+                ready, _, _ = select.select([self.stream], [], [], 0.2)
+                return os.read(self.stream, n) if ready else None
+            return read_fd
+        if hasattr(self.stream, 'read1'):
+            return self.stream.read1
+        return self.stream.read
+
+    def _to_row(self, sample: Sample) -> tuple:
+        """Builds a sensor_readings row; the timestamp text is formatted once per second"""
+        second = int(sample.arrival)
+        if second != self._second:
+            moment = datetime.fromtimestamp(second)
+            self._second = second
+            self._second_text = moment.strftime("%Y-%m-%d %H:%M:%S")
+            self._second_hour = moment.hour
+        return (self._second_text, sample.moisture, sample.light, sample.temperature, self._second_hour,
+                sample.device_id)
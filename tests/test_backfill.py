@@ -0,0 +1,105 @@
+"""
+Backfill and FetchPlanner against the Open-Meteo stub server
+
+Run with: python -m pytest
+"""
+
+import threading
+from datetime import date, datetime, time
+
+import pytest
+
+from db.combined_database import PlantDatabase
+from meteo_data.backfill import Backfill
+from meteo_data.fetch_planner import FetchPlanner
+from meteo_data.locations import Location
+from meteo_data.open_meteo_client import OpenMeteoClient
+from meteo_data.stub_server import StubOpenMeteoServer
+
+TODAY = date(2026, 6, 1)
+
+
+@pytest.fixture
+def server():
+    with StubOpenMeteoServer(today=TODAY) as server:
+        yield server
+
+
+@pytest.fixture
+def database(tmp_path):
+    with PlantDatabase(str(tmp_path / 'plant_data.db')) as database:
+        yield database
+
+
+def add_locations(database, *locations):
+    return [location._replace(id=database.ensure_location(location.name, location.latitude,
+                                                          location.longitude, location.timezone))
+            for location in locations]
+
+
+def collect(database, server, locations, start_date, end_date):
+    """Fetches what the planner reports missing, like WeatherCollector; returns the number of requests"""
+    start_time = datetime.combine(start_date, time.min)
+    end_time = datetime.combine(end_date, time(23))
+    plan = FetchPlanner(database, chunk_days=31).plan(
+        [(location, start_time, end_time) for location in locations], TODAY)
+    client = OpenMeteoClient(server.forecast_url, server.archive_url, backoff=0.05)
+    try:
+        result = Backfill(database, client, locations, chunk_days=31).run(start_time, end_time,
+                                                                          chunks=plan.requests)
+    finally:
+        client.close()
+    assert not result.failed_chunks
+    return client.requests
+
+
+def test_cold_run_fetches_and_warm_run_is_free(database, server):
+    locations = add_locations(database, Location('Bydgoszcz', 53.12, 18.01))
+
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 2, 15)) == 2
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 2, 15)) == 0
+    assert server.stats()['requests'] == 2
+
+
+def test_warm_run_fetches_only_the_extension(database, server):
+    locations = add_locations(database, Location('Bydgoszcz', 53.12, 18.01))
+
+    collect(database, server, locations, date(2026, 1, 1), date(2026, 1, 31))
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 2, 10)) == 1
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 2, 10)) == 0
+
+
+def test_locations_in_one_time_zone_share_requests(database, server):
+    locations = add_locations(database, Location('Bydgoszcz', 53.12, 18.01), Location('Torun', 53.01, 18.60),
+                              Location('Gdansk', 54.35, 18.65))
+
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 1, 20)) == 1
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 1, 20)) == 0
+
+
+@pytest.mark.parametrize('location, dst_start', [
+    (Location('Bydgoszcz', 53.12, 18.01, 'Europe/Warsaw'), date(2026, 3, 29)),
+    (Location('New York', 40.71, -74.01, 'America/New_York'), date(2026, 3, 8)),
+])
+def test_daylight_saving_gap_is_not_refetched(database, server, location, dst_start):
+    # The hour skipped by the clock change never arrives, so it must not count as missing
+    locations = add_locations(database, location)
+
+    assert collect(database, server, locations, dst_start, dst_start) == 1
+    assert collect(database, server, locations, dst_start, dst_start) == 0
+
+
+def test_stop_sends_no_further_requests(database, server):
+    locations = add_locations(database, Location('Bydgoszcz', 53.12, 18.01))
+    client = OpenMeteoClient(server.forecast_url, server.archive_url, backoff=0.05)
+    stop = threading.Event()
+    try:
+        result = Backfill(database, client, locations, chunk_days=10, max_workers=1).run(
+            datetime(2026, 1, 1), datetime(2026, 3, 31, 23), progress=lambda done, total: stop.set(), stop=stop)
+    finally:
+        client.close()
+
+    # The request submitted with the first result is the last one
+    assert result.requests == client.requests == 2
+    # Only the 70 days after the two stored chunks are planned again
+    assert collect(database, server, locations, date(2026, 1, 1), date(2026, 3, 31)) == 3
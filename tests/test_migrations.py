@@ -0,0 +1,100 @@
+"""
+Schema migrations of the database file shipped in data/
+
+Run with: python -m pytest
+"""
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from db.combined_database import PlantDatabase
+from db.migrations import get_schema_version, latest_version, migrate
+
+BASELINE = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'plant_data.db')
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    """Copy of the unmigrated (user_version 0) database, so the original is never upgraded"""
+    path = str(tmp_path / 'plant_data.db')
+    shutil.copyfile(BASELINE, path)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def count(conn, table):
+    return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def derived_tables(conn):
+    """Contents of the tables the migrations compute from the readings and weather rows"""
+    return [conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+            for table in ('sensor_stats', 'sensor_rollups', 'weather_rollups', 'weather_coverage')]
+
+
+def test_upgrades_baseline_to_latest_version(baseline):
+    assert get_schema_version(baseline) == 0
+    readings, weather = count(baseline, 'sensor_readings'), count(baseline, 'weather_data')
+
+    assert migrate(baseline) == latest_version() == 9
+    assert get_schema_version(baseline) == 9
+
+    # No rows are lost, and every row gets its epoch column, device and location
+    assert count(baseline, 'sensor_readings') == readings
+    assert count(baseline, 'weather_data') == weather
+    assert baseline.execute('SELECT COUNT(*) FROM sensor_readings WHERE ts IS NULL').fetchone()[0] == 0
+    assert baseline.execute('SELECT COUNT(*) FROM weather_data WHERE ts IS NULL').fetchone()[0] == 0
+    assert baseline.execute('SELECT DISTINCT device_id FROM sensor_readings').fetchall() == [(1,)]
+    assert baseline.execute('SELECT DISTINCT location_id FROM weather_data').fetchall() == [(1,)]
+    assert baseline.execute('SELECT id FROM devices').fetchall() == [(1,)]
+    assert baseline.execute('SELECT id FROM locations').fetchall() == [(1,)]
+
+
+def test_upgrade_fills_stats_rollups_and_coverage(baseline):
+    migrate(baseline)
+
+    stats = baseline.execute('''
+        SELECT record_count, sum_moisture, sum_light, sum_temperature, min_ts, max_ts
+        FROM sensor_stats WHERE device_id = 1
+    ''').fetchone()
+    assert stats == baseline.execute('''
+        SELECT COUNT(*), SUM(moisture), SUM(light), SUM(temperature), MIN(ts), MAX(ts)
+        FROM sensor_readings
+    ''').fetchone()
+    # The daily rollups count every reading and every weather hour once
+    assert baseline.execute('''
+        SELECT SUM(record_count) FROM sensor_rollups WHERE resolution = 86400
+    ''').fetchone()[0] == count(baseline, 'sensor_readings')
+    assert baseline.execute('''
+        SELECT SUM(record_count) FROM weather_rollups WHERE resolution = 86400
+    ''').fetchone()[0] == count(baseline, 'weather_data')
+    # Coverage ends after the last stored hour
+    assert baseline.execute('SELECT location_id, start_ts, end_ts FROM weather_coverage').fetchall() == \
+        [baseline.execute('SELECT 1, MIN(ts), MAX(ts) + 3600 FROM weather_data').fetchone()]
+
+
+def test_step_by_step_upgrade_matches_single_upgrade(baseline, tmp_path):
+    once = str(tmp_path / 'once.db')
+    shutil.copyfile(BASELINE, once)
+    conn = sqlite3.connect(once)
+    migrate(conn)
+    expected = derived_tables(conn)
+    conn.close()
+
+    for version in range(1, latest_version() + 1):
+        assert migrate(baseline, version) == version
+    assert derived_tables(baseline) == expected
+
+
+def test_opening_migrates_once(tmp_path):
+    path = str(tmp_path / 'plant_data.db')
+    shutil.copyfile(BASELINE, path)
+    with PlantDatabase(path) as database:
+        assert database.get_database_stats()['total_records'] == 21
+    with PlantDatabase(path) as database:
+        assert database.get_database_stats()['total_records'] == 21
+        assert migrate(database._connections.get_connection()) == 9
@@ -0,0 +1,121 @@
+"""
+LineParser and BinaryFrameParser: resynchronization, duplicates and reordering
+
+Run with: python -m pytest
+"""
+
+import pytest
+
+from sensors.binary_frame import FRAME_SIZE, BinaryFrameParser, encode_frame, encode_frames
+from sensors.line_parser import LineParser
+
+
+def line(device_id, sequence, moisture=50.0, light=60.0, temperature=21.5):
+    return f'{device_id},{sequence},{moisture},{light},{temperature}\n'.encode()
+
+
+def feed_bytewise(parser, data):
+    samples = []
+    for i in range(len(data)):
+        samples.extend(parser.feed(data[i:i + 1], arrival=float(i)))
+    return samples
+
+
+def sequences(samples):
+    return [(sample.device_id, sample.sequence) for sample in samples]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'struct'])
+def frame_parser(request):
+    return BinaryFrameParser(use_numpy=request.param)
+
+
+def test_line_parser_resyncs_after_corrupted_lines():
+    parser = LineParser()
+    data = (b'12,34,56\r\n' + b'garbage\n' + b'\x00\xff7,8\n' + b'101,5,5\n' + b'9' * 100
+            + b'\n' + b'1,2,3\n')
+
+    samples = feed_bytewise(parser, data)
+
+    assert [(s.moisture, s.light, s.temperature) for s in samples] == [(12, 34, 56), (1, 2, 3)]
+    assert all(s.device_id == 1 and s.sequence is None for s in samples)
+    # Unparsable, wrong field count, moisture out of range and the overlong line
+    assert parser.corrupted == 4
+    assert parser.samples == 2
+    assert parser.bytes == len(data)
+
+
+def test_line_parser_drops_duplicates_and_counts_reordered():
+    parser = LineParser()
+    data = b''.join(line(7, sequence) for sequence in (0, 1, 1, 3, 2, 2, 4))
+
+    samples = parser.feed(data, arrival=0.0)
+
+    assert sequences(samples) == [(7, 0), (7, 1), (7, 3), (7, 2), (7, 4)]
+    assert parser.sequences.duplicates == 2
+    assert parser.sequences.reordered == 1
+    assert parser.sequences.lost == 0
+
+
+def test_line_parser_tracks_devices_separately_and_across_wraparound():
+    parser = LineParser()
+    data = line(1, 65534) + line(2, 65534) + line(1, 65535) + line(1, 1) + line(2, 65535) + line(1, 0)
+
+    samples = parser.feed(data, arrival=0.0)
+
+    assert sequences(samples) == [(1, 65534), (2, 65534), (1, 65535), (1, 1), (2, 65535), (1, 0)]
+    assert parser.sequences.lost == 0
+    assert parser.sequences.reordered == 1
+
+
+def test_line_parser_treats_large_jump_back_as_restart():
+    parser = LineParser()
+    samples = parser.feed(line(1, 500) + line(1, 3) + line(1, 4), arrival=0.0)
+
+    assert sequences(samples) == [(1, 500), (1, 3), (1, 4)]
+    assert parser.sequences.duplicates == 0
+
+
+def test_frame_parser_resyncs_after_garbage_and_bad_crc(frame_parser):
+    good = [encode_frame(3, sequence, 40.5, 70.25, -3.5) for sequence in range(5)]
+    bad_crc = bytearray(good[2])
+    bad_crc[6] ^= 0xFF
+    data = b'\x5a\x00noise' + good[0] + good[1] + bytes(bad_crc) + b'\xa5\x5a' + good[3] + good[4]
+
+    samples = feed_bytewise(frame_parser, data)
+
+    assert sequences(samples) == [(3, 0), (3, 1), (3, 3), (3, 4)]
+    assert (samples[0].moisture, samples[0].light, samples[0].temperature) == (40.5, 70.25, -3.5)
+    # One resynchronization per stretch of skipped bytes
+    assert frame_parser.corrupted == 2
+    assert frame_parser.sequences.lost == 1
+
+
+def test_frame_parser_decodes_whole_buffers(frame_parser):
+    count = 200
+    data = encode_frames([1, 2] * (count // 2), [i // 2 for i in range(count)], [10.0] * count,
+                         [20.0] * count, [30.0] * count)
+    # Cut in the middle of a frame
+    cut = 7 * FRAME_SIZE + 5
+
+    samples = frame_parser.feed(data[:cut], arrival=1.0) + frame_parser.feed(data[cut:], arrival=2.0)
+
+    assert len(samples) == count
+    assert [sample.arrival for sample in samples[6:8]] == [1.0, 2.0]
+    assert sequences(samples) == [(1 + i % 2, i // 2) for i in range(count)]
+    assert frame_parser.corrupted == 0
+
+
+def test_frame_parser_drops_duplicates_and_counts_reordered(frame_parser):
+    data = b''.join(encode_frame(9, sequence, 1.0, 2.0, 3.0) for sequence in (10, 11, 11, 13, 12, 12, 14))
+
+    samples = frame_parser.feed(data, arrival=0.0)
+
+    assert sequences(samples) == [(9, 10), (9, 11), (9, 13), (9, 12), (9, 14)]
+    assert frame_parser.sequences.duplicates == 2
+    assert frame_parser.sequences.reordered == 1
+    assert frame_parser.sequences.lost == 0
+
+    # A repeated batch after the first one is dropped as a whole
+    assert frame_parser.feed(data[-3 * FRAME_SIZE:], arrival=1.0) == []
+    assert frame_parser.sequences.duplicates == 5
@@ -0,0 +1,119 @@
+"""
+ReadingsPager keyset paging against the full ordered table
+
+Run with: python -m pytest
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.combined_database import PlantDatabase
+from Plant.readings_pager import ReadingsPager
+
+ROWS = 500
+VISIBLE = 10
+PREFETCH = 20
+
+
+@pytest.fixture
+def database(tmp_path):
+    with PlantDatabase(str(tmp_path / 'plant_data.db')) as database:
+        start = datetime(2026, 6, 1)
+        # Two readings per second, so ts has ties as well as the values
+        database.save_readings([((start + timedelta(seconds=i // 2)).strftime('%Y-%m-%d %H:%M:%S'),
+                                 i * 37 % 11, i % 100, 20, 12, 1) for i in range(ROWS)])
+        # Another device's readings never show up
+        database.save_readings([('2026-06-01 00:00:00', 1, 1, 1, 1, 2)] * 50)
+        yield database
+
+
+def table(database, order_by='ts', descending=True):
+    """Every row of device 1 in display order, in one query"""
+    return database.get_readings_page(ROWS + 1, None, descending, order_by)
+
+
+def make_pager(database, order_by='ts', descending=True):
+    pager = ReadingsPager(database, visible_rows=VISIBLE, prefetch=PREFETCH)
+    pager.order_by, pager.descending = order_by, descending
+    pager.reload()
+    return pager
+
+
+def assert_at(pager, rows, position):
+    assert pager.position == position
+    assert pager.visible() == rows[position:position + VISIBLE]
+
+
+@pytest.mark.parametrize('order_by, descending', [('ts', True), ('ts', False), ('moisture', False),
+                                                  ('moisture', True), ('light', True)])
+def test_scrolling_walks_the_table_in_order(database, order_by, descending):
+    rows = table(database, order_by, descending)
+    pager = make_pager(database, order_by, descending)
+    assert pager.total == ROWS
+    assert_at(pager, rows, 0)
+
+    while pager.position + VISIBLE < ROWS:
+        pager.scroll(VISIBLE)
+        assert pager.visible() == rows[pager.position:pager.position + VISIBLE]
+        # Only a bounded window stays in memory
+        assert len(pager._rows) <= VISIBLE + 4 * PREFETCH
+    assert pager.position == ROWS - VISIBLE
+
+    # And back to the start, fetching the rows before the window
+    while pager.position > 0:
+        pager.scroll(-7)
+        assert pager.visible() == rows[pager.position:pager.position + VISIBLE]
+    assert_at(pager, rows, 0)
+
+
+def test_ties_are_ordered_by_id(database):
+    rows = table(database, 'moisture', False)
+    keys = [(row[3], row[0]) for row in rows]
+    assert keys == sorted(keys)
+    assert len({row[0] for row in rows}) == ROWS
+
+
+def test_scroll_is_clamped_and_served_from_the_window(database):
+    rows = table(database)
+    pager = make_pager(database)
+
+    pager.scroll(-5)
+    assert_at(pager, rows, 0)
+    pager.scroll(3)
+    assert_at(pager, rows, 3)
+    # The first load holds one prefetch margin after the visible rows
+    assert pager.cached(PREFETCH - 3) and pager.cached(-3)
+    assert not pager.cached(PREFETCH) and not pager.cached(ROWS)
+
+
+def test_seek_to_the_ends(database):
+    rows = table(database)
+    pager = make_pager(database)
+
+    pager.seek(1.0)
+    assert_at(pager, rows, ROWS - VISIBLE)
+    pager.scroll(VISIBLE)
+    assert_at(pager, rows, ROWS - VISIBLE)
+    pager.seek(0.0)
+    assert_at(pager, rows, 0)
+
+
+@pytest.mark.parametrize('order_by, descending', [('ts', True), ('ts', False), ('light', True)])
+def test_far_seek_lands_on_consecutive_rows(database, order_by, descending):
+    rows = table(database, order_by, descending)
+    pager = make_pager(database, order_by, descending)
+
+    pager.seek(0.5)
+
+    # The position is estimated from the values, but the rows are a slice of the table
+    visible = pager.visible()
+    start = rows.index(visible[0])
+    assert visible == rows[start:start + VISIBLE]
+    assert abs(start - ROWS // 2) < ROWS // 5
+
+    # Scrolling on from there continues the slice
+    pager.scroll(VISIBLE)
+    assert pager.visible() == rows[start + VISIBLE:start + 2 * VISIBLE]
+    pager.scroll(-2 * VISIBLE)
+    assert pager.visible() == rows[start - VISIBLE:start]
@@ -0,0 +1,124 @@
+"""
+ResponseCache freshness, expiry and sweeps
+
+Run with: python -m pytest
+"""
+
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from meteo_data import response_cache
+from meteo_data.response_cache import ResponseCache
+
+URL = 'https://api.open-meteo.com/v1/forecast'
+TTL = 900
+FORECAST = {'latitude': 53.12, 'longitude': 18.01, 'hourly': 'temperature_2m,relative_humidity_2m',
+            'forecast_days': 2}
+ARCHIVE = {'latitude': 53.12, 'longitude': 18.01, 'hourly': 'temperature_2m',
+           'start_date': '2026-01-01', 'end_date': '2026-01-31'}
+DATA = {'hourly': {'time': ['2026-01-01T00:00'], 'temperature_2m': [-3.5]}}
+
+
+class Clock:
+    """Stands in for the time module of response_cache, so tests can move time forward"""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / 'cache'), forecast_ttl=TTL, settle_hours=48, offline=False)
+
+
+def files(cache):
+    return sorted(name for _, _, names in os.walk(cache.directory) for name in names)
+
+
+def test_equivalent_requests_share_an_entry(cache):
+    cache.put(URL, FORECAST, DATA)
+    reordered = dict(FORECAST, hourly='relative_humidity_2m,temperature_2m', latitude=53.120001)
+
+    assert cache.get(URL + '/', reordered) == DATA
+    assert cache.get(URL, dict(FORECAST, forecast_days=3)) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_forecast_entries_expire_after_ttl(cache, clock):
+    cache.put(URL, FORECAST, DATA)
+
+    clock.offset = TTL - 1
+    assert cache.get(URL, FORECAST) == DATA
+    clock.offset = TTL
+    assert cache.get(URL, FORECAST) is None
+
+    # The expired entry was deleted when looked up
+    assert files(cache) == []
+    stats = cache.stats()
+    assert (stats['expired'], stats['evicted'], stats['misses']) == (1, 1, 1)
+
+
+def test_settled_entries_never_expire(cache, clock):
+    cache.put(URL, ARCHIVE, DATA)
+    clock.offset = 365 * 86400
+    assert cache.get(URL, ARCHIVE) == DATA
+
+    # Hours within the settling period still change, so such entries expire like forecasts
+    recent = dict(ARCHIVE, end_date=(date.today() - timedelta(days=1)).isoformat())
+    clock.offset = 0
+    cache.put(URL, recent, DATA)
+    clock.offset = TTL
+    assert cache.get(URL, recent) is None
+
+
+def test_sweep_removes_expired_entries_and_stale_temporary_files(cache, clock):
+    cache.put(URL, FORECAST, DATA)
+    cache.put(URL, ARCHIVE, DATA)
+    entry = cache.path(URL, FORECAST)
+    leftover = os.path.join(os.path.dirname(entry), 'interrupted.tmp')
+    with open(leftover, 'wb') as file:
+        file.write(b'partial')
+
+    # Nothing is old enough to have expired yet
+    assert cache.sweep() == 0
+    assert len(files(cache)) == 3
+
+    clock.offset = TTL + 1
+    assert cache.sweep() == 2
+    assert files(cache) == [os.path.basename(cache.path(URL, ARCHIVE))]
+    assert cache.get(URL, ARCHIVE) == DATA
+    assert cache.stats()['evicted'] == 2
+
+
+def test_sweep_removes_unreadable_entries(cache, clock):
+    cache.put(URL, ARCHIVE, DATA)
+    with open(cache.path(URL, ARCHIVE), 'wb') as file:
+        file.write(b'not gzip')
+
+    clock.offset = TTL
+    assert cache.sweep() == 1
+    assert files(cache) == []
+
+
+def test_offline_cache_keeps_everything(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'cache'), forecast_ttl=TTL, offline=True)
+    cache.put(URL, FORECAST, DATA)
+
+    clock.offset = 30 * 86400
+    assert cache.get(URL, FORECAST) == DATA
+    assert cache.sweep() == 0
+    assert len(files(cache)) == 1
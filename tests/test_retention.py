@@ -0,0 +1,103 @@
+"""
+Retention keeps the running sensor_stats aggregates equal to the kept readings
+
+Run with: python -m pytest
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import retention
+from db.combined_database import PlantDatabase
+from db.retention import apply_retention
+from db.timestamps import to_epoch
+
+NOW = datetime(2026, 6, 11, 12, 30)
+FIRST_DAY = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def database(tmp_path):
+    with PlantDatabase(str(tmp_path / 'plant_data.db')) as database:
+        yield database
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    # Several batches per device, and a batch size that does not divide the readings of one second
+    monkeypatch.setattr(retention, 'BATCH_ROWS', 5)
+
+
+def add_readings(database, device_id, hours):
+    """Three readings with the same timestamp every hour from FIRST_DAY on"""
+    rows = []
+    for hour in range(hours):
+        timestamp = (FIRST_DAY + timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M:%S')
+        for i in range(3):
+            rows.append((timestamp, (hour * 7 + i) % 101, (hour * 13 + i) % 101, hour % 30 - 5, hour % 24, device_id))
+    database.save_readings(rows)
+
+
+def stats(database):
+    conn = database._connections.get_connection()
+    return conn.execute('SELECT * FROM sensor_stats ORDER BY device_id').fetchall()
+
+
+def rebuilt_stats(database):
+    """sensor_stats recomputed from the remaining readings"""
+    database.rebuild_stats()
+    return stats(database)
+
+
+def run(database, policy, stop=None):
+    return apply_retention(database._connections.get_connection(), policy, now=NOW, stop=stop, pause=0)
+
+
+def test_stats_match_kept_readings(database):
+    add_readings(database, 1, 10 * 24 + 12)
+    add_readings(database, 2, 5 * 24)
+
+    deleted = run(database, {'sensor_readings': 3})
+
+    # The cutoff is rounded down to the start of its day
+    cutoff = to_epoch(datetime(2026, 6, 8))
+    conn = database._connections.get_connection()
+    assert conn.execute('SELECT MIN(ts) FROM sensor_readings WHERE device_id = 1').fetchone()[0] == cutoff
+    assert deleted == {'sensor_readings': 7 * 24 * 3 + 5 * 24 * 3}
+
+    kept = stats(database)
+    assert [row[0] for row in kept] == [1]  # device 2 has no readings left
+    assert kept == rebuilt_stats(database)
+    assert database.get_database_stats(1)['date_range'] == ('2026-06-08 00:00:00', '2026-06-11 11:00:00')
+    assert database.get_database_stats(2)['total_records'] == 0
+
+
+def test_stopped_run_leaves_consistent_stats(database):
+    add_readings(database, 1, 10 * 24)
+    stop = threading.Event()
+    stop.set()
+
+    deleted = run(database, {'sensor_readings': 3}, stop=stop)
+
+    # Only the first batch ran; it ends where the timestamp changes, so it holds the oldest hour
+    assert deleted == {'sensor_readings': 3}
+    assert stats(database)[0][1] == 10 * 24 * 3 - 3
+    assert stats(database) == rebuilt_stats(database)
+
+    # The next run finishes the job
+    run(database, {'sensor_readings': 3})
+    assert stats(database) == rebuilt_stats(database)
+    assert stats(database)[0][1] == 3 * 24 * 3
+
+
+def test_policy_without_sensor_readings_keeps_stats(database):
+    add_readings(database, 1, 10 * 24)
+    before = stats(database)
+
+    deleted = run(database, {'sensor_readings': None, 'sensor_rollups': 3})
+
+    # Minute and hour buckets before 12:30 and 12:00 three days ago, day buckets before that day
+    assert deleted == {'sensor_rollups': (7 * 24 + 13) + (7 * 24 + 12) + 7}
+    assert stats(database) == before
@@ -0,0 +1,78 @@
+"""
+RecentReadings windows before and after the ring buffer wraps around
+
+Run with: python -m pytest
+"""
+
+import pytest
+
+from Plant.ring_buffer import RecentReadings
+
+
+def fill(readings, start, stop):
+    for t in range(start, stop):
+        readings.append(float(t), t + 0.25, t + 0.5, t + 0.75)
+
+
+def columns(window):
+    return [list(column) for column in window]
+
+
+def expected(start, stop):
+    times = range(start, stop)
+    return [[float(t) for t in times], [t + 0.25 for t in times], [t + 0.5 for t in times],
+            [t + 0.75 for t in times]]
+
+
+def test_windows_before_wraparound():
+    readings = RecentReadings(capacity=8)
+    fill(readings, 0, 5)
+
+    assert len(readings) == 5
+    assert columns(readings.last(3)) == expected(2, 5)
+    assert columns(readings.last(100)) == expected(0, 5)
+    assert columns(readings.since(1.5)) == expected(2, 5)
+    assert columns(readings.since(-1)) == expected(0, 5)
+    assert readings.latest() == (4.0, 4.25, 4.5, 4.75)
+
+
+@pytest.mark.parametrize('count', [8, 9, 13, 16, 21])
+def test_windows_across_wraparound(count):
+    readings = RecentReadings(capacity=8)
+    fill(readings, 0, count)
+
+    assert len(readings) == 8
+    # Always one contiguous slice, oldest first, whatever slot the newest reading is in
+    assert columns(readings.last(8)) == expected(count - 8, count)
+    assert columns(readings.last(3)) == expected(count - 3, count)
+    assert columns(readings.since(count - 5)) == expected(count - 5, count)
+    assert columns(readings.since(count - 5.5)) == expected(count - 5, count)
+    # Overwritten readings are gone
+    assert columns(readings.since(0)) == expected(count - 8, count)
+    assert columns(readings.since(count)) == expected(count, count)
+    assert readings.latest()[0] == count - 1
+
+
+def test_empty_and_zero_windows():
+    readings = RecentReadings(capacity=4)
+    assert readings.latest() is None
+    assert columns(readings.last(5)) == expected(0, 0)
+    assert columns(readings.since(0)) == expected(0, 0)
+
+    fill(readings, 0, 6)
+    assert columns(readings.last(0)) == expected(0, 0)
+    readings.clear()
+    assert len(readings) == 0
+    assert columns(readings.since(0)) == expected(0, 0)
+
+
+def test_copy_outlives_later_appends():
+    readings = RecentReadings(capacity=4)
+    fill(readings, 0, 6)
+    live = readings.last(4)
+    copied = live.copy()
+
+    fill(readings, 6, 9)
+
+    assert columns(copied) == expected(2, 6)
+    assert columns(live) != expected(2, 6)
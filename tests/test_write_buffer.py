@@ -0,0 +1,145 @@
+"""
+ReadingWriteBuffer batching, flushing and durability levels
+
+Run with: python -m pytest
+"""
+
+import time
+
+import pytest
+
+from db.combined_database import PlantDatabase
+from db.write_buffer import Durability, ReadingWriteBuffer, WriteBufferFull
+
+# PRAGMA synchronous values
+SYNCHRONOUS_OFF = 0
+SYNCHRONOUS_NORMAL = 1
+SYNCHRONOUS_FULL = 2
+
+
+class RecordingDatabase(PlantDatabase):
+    """Records the batch sizes and the synchronous setting each batch is committed with"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.commits = []
+
+    def save_readings(self, rows) -> int:
+        rows = list(rows)
+        synchronous = self._connections.get_connection().execute('PRAGMA synchronous').fetchone()[0]
+        count = super().save_readings(rows)
+        self.commits.append((len(rows), synchronous))
+        return count
+
+
+@pytest.fixture
+def database(tmp_path):
+    with RecordingDatabase(str(tmp_path / 'plant_data.db')) as database:
+        yield database
+
+
+def rows(count):
+    return [(f'2026-06-01 12:{i // 60:02d}:{i % 60:02d}', 50, 60, 20, 12, 1) for i in range(count)]
+
+
+def stored(database):
+    return database.get_database_stats()['total_records']
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_flush_commits_everything_queued(database):
+    buffer = ReadingWriteBuffer(database, batch_size=1000, flush_interval=60)
+    buffer.start()
+    try:
+        for row in rows(25):
+            buffer.put(row)
+        assert buffer.flush(timeout=5)
+        assert stored(database) == buffer.written == 25
+        assert buffer.pending() == 0
+        assert database.commits == [(25, SYNCHRONOUS_FULL)]
+    finally:
+        buffer.close()
+
+
+def test_full_batches_are_committed_without_flush(database):
+    buffer = ReadingWriteBuffer(database, batch_size=10, flush_interval=60)
+    buffer.start()
+    try:
+        for row in rows(25):
+            buffer.put(row)
+        wait_for(lambda: buffer.written == 20)
+        assert stored(database) == 20
+        buffer.flush(timeout=5)
+        assert [size for size, _ in database.commits] == [10, 10, 5]
+    finally:
+        buffer.close()
+
+
+def test_partial_batch_is_committed_after_flush_interval(database):
+    buffer = ReadingWriteBuffer(database, batch_size=1000, flush_interval=0.05)
+    buffer.start()
+    try:
+        for row in rows(3):
+            buffer.put(row)
+        wait_for(lambda: buffer.written == 3)
+        assert stored(database) == 3
+        assert buffer.batches == 1
+    finally:
+        buffer.close()
+
+
+@pytest.mark.parametrize('durability, synchronous', [
+    (Durability.GROUP, SYNCHRONOUS_FULL),
+    (Durability.RELAXED, SYNCHRONOUS_OFF),
+])
+def test_durability_sets_synchronous_of_batch_commits(database, durability, synchronous):
+    database.enable_write_buffer(durability, batch_size=1000, flush_interval=60)
+    for moisture in range(5):
+        database.save_reading(moisture, 60, 20, 12)
+    assert database.flush(timeout=5)
+    assert database.commits == [(5, synchronous)]
+
+
+def test_immediate_durability_commits_each_reading_directly(database):
+    with pytest.raises(ValueError):
+        ReadingWriteBuffer(database, Durability.IMMEDIATE)
+
+    database.enable_write_buffer(Durability.IMMEDIATE)
+    database.save_reading(40, 60, 20, 12)
+    database.save_reading(41, 60, 20, 12)
+    # Committed before save_reading returned, one transaction each
+    assert stored(database) == 2
+    assert [size for size, _ in database.commits] == [1, 1]
+    # Only those commits are fsync'd; the connection's own setting is restored after each
+    connection = database._connections.get_connection()
+    assert connection.execute('PRAGMA synchronous').fetchone()[0] == SYNCHRONOUS_NORMAL
+
+
+def test_close_writes_queued_readings_and_rejects_new_ones(tmp_path):
+    path = str(tmp_path / 'plant_data.db')
+    with PlantDatabase(path) as database:
+        buffer = ReadingWriteBuffer(database, batch_size=1000, flush_interval=60)
+        buffer.start()
+        for row in rows(7):
+            buffer.put(row)
+        buffer.close()
+        with pytest.raises(WriteBufferFull):
+            buffer.put(rows(1)[0])
+
+    with PlantDatabase(path) as database:
+        assert stored(database) == 7
+
+
+def test_put_fails_when_queue_stays_full(database):
+    # Not started, so nothing drains the queue
+    buffer = ReadingWriteBuffer(database, max_queue=2)
+    buffer.put(rows(1)[0], timeout=0)
+    buffer.put(rows(1)[0], timeout=0)
+    with pytest.raises(WriteBufferFull):
+        buffer.put(rows(1)[0], timeout=0)